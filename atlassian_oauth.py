@@ -34,9 +34,9 @@ class AtlassianOAuthClient:
         self.cloud_id = os.getenv('ATLASSIAN_CLOUD_ID')
         self.site_url = os.getenv('ATLASSIAN_SITE_URL')
         
-        # Atlassian OAuth 2.1 endpoints
-        self.auth_url = 'https://auth.atlassian.com/authorize'
-        self.token_url = 'https://auth.atlassian.com/oauth/token'
+        # Atlassian OAuth 2.1 endpoints (overridable to point at a local stand-in)
+        self.auth_url = os.getenv('ATLASSIAN_AUTH_URL', 'https://auth.atlassian.com/authorize')
+        self.token_url = os.getenv('ATLASSIAN_TOKEN_URL', 'https://auth.atlassian.com/oauth/token')
         
         # Use SERVER_IP from environment for team access
         server_ip = os.getenv('SERVER_IP', 'localhost')
@@ -69,6 +69,15 @@ class AtlassianOAuthClient:
         
         return authorization_url, state, oauth
     
+    def restore_session(self, state):
+        """Rebuild the OAuth session for a login started elsewhere (e.g. another worker)"""
+        return OAuth2Session(
+            client_id=self.client_id,
+            scope=self.scope,
+            redirect_uri=self.redirect_uri,
+            state=state
+        )
+    
     async def get_access_token(self, authorization_code, oauth_session):
         """Exchange authorization code for access token (async)"""
         import asyncio
@@ -127,7 +136,7 @@ class AtlassianOAuthClient:
         except FileNotFoundError:
             return None
     
-    def refresh_token(self, token):
+    def refresh_token(self, token, persist=True):
         """Refresh an expired token"""
         oauth = OAuth2Session(
             client_id=self.client_id,
@@ -140,9 +149,11 @@ class AtlassianOAuthClient:
             client_secret=self.client_secret
         )
         
-        # Save refreshed token
-        with open('atlassian_token.json', 'w') as f:
-            json.dump(refreshed_token, f, indent=2)
+        # Save refreshed token (the CLI flow reuses it; the web server keeps
+        # tokens per user in the shared state store and passes persist=False)
+        if persist:
+            with open('atlassian_token.json', 'w') as f:
+                json.dump(refreshed_token, f, indent=2)
         
         return refreshed_token
     
@@ -2,13 +2,23 @@ from crewai import Agent, Task, Crew, Process, LLM
 from crewai_tools.adapters.mcp_adapter import MCPServerAdapter
 from mcp import StdioServerParameters
 import os
+import sys
 import json
+import time
+import asyncio
+import argparse
 from dotenv import load_dotenv
 from atlassian_oauth import AtlassianOAuthClient
 
 # Load environment variables
 load_dotenv()
 
+parser = argparse.ArgumentParser(description="Query Jira/Confluence through the Atlassian MCP server")
+parser.add_argument("--batch", metavar="FILE", help="answer every question in a JSONL file (e.g. requests.jsonl) and write NDJSON results")
+parser.add_argument("--concurrency", type=int, default=None, help="batch questions run at once (default and cap: BATCH_CONCURRENCY, at most CREW_MAX_CONCURRENCY)")
+parser.add_argument("--output", metavar="FILE", help="write batch results to FILE instead of stdout")
+args = parser.parse_args()
+
 llm = LLM(
 model= "azure/gpt4o-qa-agentic-framework-dev",
 base_url="https://eastus2.api.cognitive.microsoft.com",
@@ -26,6 +36,38 @@ with open('atlassian_token.json', 'r') as f:
 
 print(f"Using OAuth token: {token_data['access_token'][:20]}...")
 
+async def run_batch(path, access_token, concurrency=None, output=None):
+    """Answer every question in a JSONL file over one MCP session, writing one NDJSON line each"""
+    from services.batch import read_jsonl, format_ndjson, summarize
+    from services.crew_service import CrewService
+    from services.atlassian_api import close_atlassian_api
+    
+    items = read_jsonl(path)
+    crew_service = CrewService(llm=llm)
+    out = open(output, "w", encoding="utf-8") if output else sys.stdout
+    started = time.perf_counter()
+    results = []
+    try:
+        async for result in crew_service.execute_batch("cli", items, access_token, concurrency):
+            results.append(result)
+            out.write(format_ndjson(result))
+            out.flush()
+            status = "ok" if result.get("success") else "failed"
+            print(f"[{len(results)}/{len(items)}] {result['id'] or result['index']}: {status} in {result['duration_ms']:.0f} ms", file=sys.stderr)
+        out.write(format_ndjson(summarize(results, (time.perf_counter() - started) * 1000)))
+    finally:
+        if output:
+            out.close()
+        try:
+            await crew_service.shutdown()
+        finally:
+            # The fast path's pooled httpx client, so its connections are closed before the loop exits
+            await close_atlassian_api()
+
+if args.batch:
+    asyncio.run(run_batch(args.batch, token_data['access_token'], args.concurrency, args.output))
+    sys.exit(0)
+
 # Alternative approach: Use the MCP remote with authentication headers
 # You might need to check if the MCP server supports OAuth in headers
 server_params = StdioServerParameters(
@@ -0,0 +1,63 @@
+"""Stand-in for the Atlassian MCP server, launched over stdio.
+
+Point the app at it with
+MCP_SERVER_COMMAND="python benchmarks/fake_mcp_server.py". Behaviour is
+set through the environment so the pool can launch it unchanged:
+
+FAKE_MCP_LATENCY_MS     delay added to every tool call (default 50)
+FAKE_MCP_PAYLOAD_BYTES  size of each tool result (default 2048)
+FAKE_MCP_EXTRA_TOOLS    filler tools to inflate the catalog (default 0)
+"""
+import os
+import json
+import asyncio
+from mcp.server.fastmcp import FastMCP
+
+LATENCY = float(os.getenv("FAKE_MCP_LATENCY_MS", "50")) / 1000
+PAYLOAD_BYTES = int(os.getenv("FAKE_MCP_PAYLOAD_BYTES", "2048"))
+EXTRA_TOOLS = int(os.getenv("FAKE_MCP_EXTRA_TOOLS", "0"))
+
+server = FastMCP("fake-atlassian")
+
+def _payload(kind: str, key: str) -> str:
+    """Deterministic JSON body of roughly PAYLOAD_BYTES"""
+    body = {"kind": kind, "key": key, "summary": f"Fake {kind} {key}", "description": ""}
+    filler = PAYLOAD_BYTES - len(json.dumps(body))
+    body["description"] = ("lorem ipsum " * (filler // 12 + 1))[:max(filler, 0)]
+    return json.dumps(body)
+
+@server.tool()
+async def getJiraIssue(issueIdOrKey: str) -> str:
+    """Get a Jira issue by key"""
+    await asyncio.sleep(LATENCY)
+    return _payload("issue", issueIdOrKey)
+
+@server.tool()
+async def searchJiraIssuesUsingJql(jql: str, maxResults: int = 10) -> str:
+    """Search Jira issues with JQL"""
+    await asyncio.sleep(LATENCY)
+    return json.dumps({"jql": jql, "issues": [json.loads(_payload("issue", f"FAKE-{i}")) for i in range(min(maxResults, 5))]})
+
+@server.tool()
+async def getConfluencePage(pageId: str) -> str:
+    """Get a Confluence page by id"""
+    await asyncio.sleep(LATENCY)
+    return _payload("page", pageId)
+
+@server.tool()
+async def createJiraIssue(projectKey: str, summary: str) -> str:
+    """Create a Jira issue"""
+    await asyncio.sleep(LATENCY)
+    return json.dumps({"key": f"{projectKey}-1", "summary": summary})
+
+def _filler(index: int):
+    async def tool(query: str) -> str:
+        await asyncio.sleep(LATENCY)
+        return _payload("filler", f"{index}:{query}")
+    return tool
+
+for index in range(EXTRA_TOOLS):
+    server.add_tool(_filler(index), name=f"fillerTool{index}", description=f"Filler tool {index}")
+
+if __name__ == "__main__":
+    server.run()
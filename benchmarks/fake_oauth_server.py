@@ -0,0 +1,58 @@
+"""Stand-in for the Atlassian OAuth token endpoint.
+
+Answers POST /oauth/token with a fresh token (and a rotated refresh
+token) after FAKE_OAUTH_LATENCY_MS. Run it standalone or start it in a
+thread with start_fake_oauth_server().
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Tuple
+
+LATENCY = float(os.getenv("FAKE_OAUTH_LATENCY_MS", "30")) / 1000
+
+def fake_token(expires_in: int = 3600) -> dict:
+    return {
+        "access_token": f"fake-access-{uuid.uuid4().hex}",
+        "refresh_token": f"fake-refresh-{uuid.uuid4().hex}",
+        "token_type": "Bearer",
+        "expires_in": expires_in,
+        "scope": "read:jira-work write:jira-work read:confluence-content.all offline_access",
+    }
+
+class FakeTokenHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if self.path.split("?")[0] != "/oauth/token":
+            self.send_response(404)
+            self.end_headers()
+            return
+        time.sleep(LATENCY)
+        body = json.dumps(fake_token()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def start_fake_oauth_server(port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve in a daemon thread; returns the server and its token URL"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeTokenHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/oauth/token"
+
+if __name__ == "__main__":
+    server, url = start_fake_oauth_server(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"Fake OAuth token endpoint at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,99 @@
+"""Import-time budget for the web tier.
+
+Imports main in a fresh interpreter under -X importtime and fails when the
+agent stack (crewai, crewai_tools, mcp) gets pulled in at import time, or when
+importing main takes longer than the budget.
+    
+    python -m benchmarks.import_budget                 # default 1500 ms budget
+    python -m benchmarks.import_budget --budget-ms 800 --top 20
+
+The fastest of --runs imports is compared with the budget, so the first run
+can warm the bytecode cache. Exits with status 1 when the budget is broken.
+"""
+import os
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+# Top-level packages that only the worker running crews may load
+FORBIDDEN = ("crewai", "crewai_tools", "mcp", "litellm", "services.local_tools")
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, depth, self_us, cumulative_us) for each line of -X importtime output"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        imports.append((stripped.rstrip(), depth, int(self_us), int(cumulative_us)))
+    return imports
+
+def forbidden_imports(imports: List[Tuple[str, int, int, int]]) -> List[str]:
+    return sorted({
+        module for module, _, _, _ in imports
+        if any(module == name or module.startswith(name + ".") for name in FORBIDDEN)
+    })
+
+def direct_imports(imports: List[Tuple[str, int, int, int]], module: str) -> Dict[str, int]:
+    """Cumulative time of each import made directly by module"""
+    # -X importtime lists a module's imports just before the module itself
+    position = next((i for i, (name, depth, _, _) in enumerate(imports) if name == module and depth == 0), None)
+    children: Dict[str, int] = {}
+    if position is None:
+        return children
+    for name, depth, _, cumulative in reversed(imports[:position]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children[name] = cumulative
+    return children
+
+def measure(module: str) -> List[Tuple[str, int, int, int]]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        print(completed.stderr[-2000:])
+        raise SystemExit(f"import {module} failed")
+    return parse_importtime(completed.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    args = parser.parse_args()
+    
+    runs = [measure(args.module) for _ in range(max(1, args.runs))]
+    totals = [next((cumulative for name, _, _, cumulative in imports if name == args.module), 0) for imports in runs]
+    best = min(range(len(runs)), key=lambda i: totals[i])
+    imports = runs[best]
+    total_ms = totals[best] / 1000
+    
+    top = direct_imports(imports, args.module)
+    print(f"import {args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms, "
+          f"{len(imports)} modules, best of {len(runs)})")
+    for name, cumulative in sorted(top.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    
+    failed = False
+    loaded = forbidden_imports(imports)
+    if loaded:
+        print(f"FAIL: import {args.module} loads the agent stack: {', '.join(loaded[:10])}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import {args.module} took {total_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
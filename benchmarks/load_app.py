@@ -0,0 +1,16 @@
+"""main:app wired to the local stand-ins, for load tests.
+    
+    uvicorn benchmarks.load_app:app
+
+Expects the environment from benchmarks.run.configure_environment (the
+load test sets it up). The crew uses StubLLM instead of Azure OpenAI.
+"""
+import os
+import main
+from benchmarks.stub_llm import StubLLM
+from services.crew_service import CrewService
+
+# Crew workers (CREW_BACKEND=process) build their own LLM from this
+os.environ.setdefault("CREW_WORKER_LLM", "benchmarks.stub_llm:StubLLM")
+main._crew_service = CrewService(llm=StubLLM())
+app = main.app
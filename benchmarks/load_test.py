@@ -0,0 +1,287 @@
+"""Multi-user load test of the whole app against local stand-ins.
+
+Each simulated user logs in through /auth/login and /auth/callback (the
+token comes from fake_oauth_server.py), then loops over dashboard loads,
+query submissions and history reads until the duration is up. The app
+runs in-process over ASGI, or under uvicorn so the server's RSS and child
+processes (mcp servers) can be watched from outside.
+    
+    python -m benchmarks.load_test --users 20 --duration 60
+    python -m benchmarks.load_test --mode uvicorn --users 50 --slo-p95-ms 5000
+
+Reports throughput, p50/p95/p99 latency and error rate per action, and RSS
+over time. Exits with status 1 if an --slo-* threshold is missed.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import httpx
+from benchmarks.fake_oauth_server import start_fake_oauth_server
+from benchmarks.run import configure_environment
+
+ACTIONS = ("dashboard", "query", "history")
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+def read_rss_kb(pid: int) -> Optional[int]:
+    """Resident set size from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+def child_pids(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+def process_tree(pid: int) -> List[int]:
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        pending.extend(child_pids(current))
+    return pids
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[Tuple[float, bool, int]]] = {action: [] for action in ACTIONS}
+        self.rss: List[Dict[str, Any]] = []
+    
+    def add(self, action: str, seconds: float, ok: bool, status: int):
+        self.samples[action].append((seconds, ok, status))
+    
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        actions = {}
+        for action, samples in self.samples.items():
+            ordered = sorted(s for s, _, _ in samples)
+            errors = sum(1 for _, ok, _ in samples if not ok)
+            actions[action] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 1),
+                "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+                "rejected_429": sum(1 for _, _, status in samples if status == 429),
+            }
+        every = [sample for samples in self.samples.values() for sample in samples]
+        ordered = sorted(s for s, _, _ in every)
+        rss = [point["rss_kb"] for point in self.rss if point["rss_kb"] is not None]
+        return {
+            "duration_seconds": round(elapsed, 1),
+            "total": {
+                "requests": len(every),
+                "throughput_rps": round(len(every) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 1),
+                "error_rate": round(sum(1 for _, ok, _ in every if not ok) / len(every), 4) if every else 0.0,
+            },
+            "actions": actions,
+            "rss": {
+                "start_kb": rss[0] if rss else None,
+                "end_kb": rss[-1] if rss else None,
+                "max_kb": max(rss) if rss else None,
+                "growth_kb": rss[-1] - rss[0] if rss else None,
+                "samples": self.rss,
+            },
+        }
+
+async def login(client: httpx.AsyncClient):
+    """Log in through the real OAuth routes; the fake endpoint issues the token"""
+    response = await client.get("/auth/login")
+    location = response.headers.get("location", "")
+    state = parse_qs(urlparse(location).query).get("state", [""])[0]
+    if not state:
+        raise RuntimeError(f"Login did not redirect to the authorize URL ({response.status_code})")
+    response = await client.get("/auth/callback", params={"code": "load-test", "state": state})
+    if response.status_code != 303:
+        raise RuntimeError(f"OAuth callback failed: {response.status_code} {response.text[:200]}")
+
+async def dashboard(client: httpx.AsyncClient) -> Tuple[bool, int]:
+    # The page plus the calls its script makes on load
+    responses = await asyncio.gather(
+        client.get("/"),
+        client.get("/auth/status"),
+        client.get("/atlassian/tools"),
+        client.get("/atlassian/history", params={"limit": 10}),
+    )
+    worst = max(responses, key=lambda r: r.status_code)
+    return all(r.status_code < 400 for r in responses), worst.status_code
+
+async def query(client: httpx.AsyncClient) -> Tuple[bool, int]:
+    response = await client.post("/atlassian/query", data={"query": f"Summarize FAKE-{random.randint(1, 500)}"})
+    ok = response.status_code == 200 and response.json().get("success", False)
+    return ok, response.status_code
+
+async def history(client: httpx.AsyncClient) -> Tuple[bool, int]:
+    response = await client.get("/atlassian/history", params={"limit": 20})
+    return response.status_code == 200, response.status_code
+
+async def simulate_user(client: httpx.AsyncClient, deadline: float, weights: List[float], think: float, recorder: Recorder):
+    await login(client)
+    handlers = {"dashboard": dashboard, "query": query, "history": history}
+    while time.monotonic() < deadline:
+        action = random.choices(ACTIONS, weights)[0]
+        started = time.perf_counter()
+        try:
+            ok, status = await handlers[action](client)
+        except Exception:
+            ok, status = False, 0
+        recorder.add(action, time.perf_counter() - started, ok, status)
+        if think:
+            await asyncio.sleep(random.uniform(0, 2 * think))
+
+async def sample_rss(pid: int, started: float, interval: float, recorder: Recorder):
+    while True:
+        tree = process_tree(pid)
+        sizes = [read_rss_kb(p) for p in tree]
+        recorder.rss.append({
+            "t": round(time.monotonic() - started, 1),
+            "rss_kb": sum(s for s in sizes if s) if any(sizes) else None,
+            "processes": len(tree),
+        })
+        await asyncio.sleep(interval)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def wait_until_up(base_url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"Server at {base_url} did not come up")
+
+async def run_load(args) -> Dict[str, Any]:
+    oauth_server, token_url = start_fake_oauth_server()
+    configure_environment(token_url)
+    recorder = Recorder()
+    weights = [float(w) for w in args.mix.split(":")]
+    server: Optional[subprocess.Popen] = None
+    lifespan = None
+    
+    if args.mode == "uvicorn":
+        port = free_port()
+        # Run from the repo root so templates/ and static/ resolve
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "benchmarks.load_app:app", "--port", str(port), "--log-level", "warning"],
+            cwd=Path(__file__).resolve().parent.parent
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        await wait_until_up(base_url)
+        pid = server.pid
+        
+        def make_client():
+            return httpx.AsyncClient(base_url=base_url, timeout=args.timeout)
+    else:
+        from benchmarks.load_app import app
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        transport = httpx.ASGITransport(app=app)
+        pid = os.getpid()
+        
+        def make_client():
+            return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout)
+    
+    started = time.monotonic()
+    sampler = asyncio.create_task(sample_rss(pid, started, args.rss_interval, recorder))
+    clients = [make_client() for _ in range(args.users)]
+    try:
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            simulate_user(client, deadline, weights, args.think_time, recorder) for client in clients
+        ))
+        elapsed = time.monotonic() - started
+    finally:
+        sampler.cancel()
+        for client in clients:
+            await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=90)
+        oauth_server.shutdown()
+    return recorder.report(elapsed)
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'action':<10} {'requests':>9} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    rows = list(report["actions"].items()) + [("total", report["total"])]
+    for name, row in rows:
+        print(
+            f"{name:<10} {row['requests']:>9} {row['throughput_rps']:>8.2f} {row['p50_ms']:>9.1f} "
+            f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['error_rate']:>8.2%}"
+        )
+    rss = report["rss"]
+    if rss["start_kb"] is not None:
+        print(
+            f"\nRSS {rss['start_kb'] / 1024:.1f} MB -> {rss['end_kb'] / 1024:.1f} MB "
+            f"(max {rss['max_kb'] / 1024:.1f} MB, growth {rss['growth_kb'] / 1024:+.1f} MB), "
+            f"{rss['samples'][-1]['processes']} processes at the end"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--mix", default="5:1:4", help="dashboard:query:history weights")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean pause between actions, seconds")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--rss-interval", type=float, default=1.0)
+    parser.add_argument("--output", type=Path, help="write the full report as JSON")
+    parser.add_argument("--slo-p95-ms", type=float, help="fail if overall p95 exceeds this")
+    parser.add_argument("--slo-error-rate", type=float, help="fail if overall error rate exceeds this (0.01 = 1%%)")
+    parser.add_argument("--slo-rss-growth-mb", type=float, help="fail if RSS grows by more than this")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run_load(args))
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    
+    failures = []
+    total = report["total"]
+    if args.slo_p95_ms is not None and total["p95_ms"] > args.slo_p95_ms:
+        failures.append(f"p95 {total['p95_ms']} ms > {args.slo_p95_ms} ms")
+    if args.slo_error_rate is not None and total["error_rate"] > args.slo_error_rate:
+        failures.append(f"error rate {total['error_rate']:.2%} > {args.slo_error_rate:.2%}")
+    growth = report["rss"]["growth_kb"]
+    if args.slo_rss_growth_mb is not None and growth is not None and growth / 1024 > args.slo_rss_growth_mb:
+        failures.append(f"RSS growth {growth / 1024:.1f} MB > {args.slo_rss_growth_mb} MB")
+    if failures:
+        print("\nSLO missed: " + "; ".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Offline benchmarks for the query, MCP and OAuth paths.
+
+Everything runs against local stand-ins: fake_mcp_server.py launched over
+stdio, StubLLM in place of Azure OpenAI and fake_oauth_server.py as the
+token endpoint, so no network is needed.
+    
+    python -m benchmarks.run                  # compare with baseline.json
+    python -m benchmarks.run --save-baseline  # record this machine's baseline
+
+Exits with status 1 when a benchmark's median is slower than the baseline
+by more than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import asyncio
+import argparse
+import platform
+import statistics
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+HERE = Path(__file__).resolve().parent
+BASELINE = HERE / "baseline.json"
+USER_ID = "bench-user"
+
+def configure_environment(token_url: str):
+    """Point the services at the stand-ins; must run before they are imported"""
+    os.environ.setdefault("MCP_SERVER_COMMAND", shlex.join([sys.executable, str(HERE / "fake_mcp_server.py")]))
+    os.environ["ATLASSIAN_TOKEN_URL"] = token_url
+    # The fake token endpoint is plain http
+    os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
+    os.environ.setdefault("ATLASSIAN_CLIENT_ID", "bench-client")
+    os.environ.setdefault("ATLASSIAN_CLIENT_SECRET", "bench-secret")
+    os.environ["STATE_STORE_URL"] = "memory://"
+    os.environ["HISTORY_STORE_URL"] = "memory://"
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "median_ms": round(statistics.median(ordered) * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+    }
+
+async def timed(iterations: int, body: Callable[[int], Awaitable[Any]]) -> List[float]:
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        await body(i)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def store_session(oauth_service, token: Dict[str, Any], expires_in: float):
+    oauth_service.store.set(f"oauth:{USER_ID}", {
+        "state": "bench",
+        "token": token,
+        "token_timestamp": time.time(),
+        "expires_at": time.time() + expires_in
+    })
+
+async def run_benchmarks(iterations: int, only: List[str]) -> Dict[str, Dict[str, Any]]:
+    from benchmarks.fake_oauth_server import start_fake_oauth_server, fake_token
+    oauth_server, token_url = start_fake_oauth_server()
+    configure_environment(token_url)
+    
+    from benchmarks.stub_llm import StubLLM
+    from services.oauth_service import OAuthService
+    from services.crew_service import CrewService
+    
+    oauth_service = OAuthService()
+    crew_service = CrewService(llm=StubLLM())
+    token = fake_token()
+    access_token = token["access_token"]
+    # Spawning is slow; cold MCP runs use a handful of iterations
+    cold_iterations = max(1, min(iterations, 5))
+    
+    async def token_cached(i):
+        await oauth_service.get_valid_token(USER_ID)
+    
+    async def token_refresh(i):
+        # Expired already, so every call goes to the token endpoint
+        store_session(oauth_service, fake_token(), expires_in=0)
+        if not await oauth_service.get_valid_token(USER_ID):
+            raise RuntimeError("refresh against the fake token endpoint failed")
+    
+    async def mcp_tools_cold(i):
+        # A user without a pooled session forces a new mcp server process
+        if not await crew_service.get_mcp_tools(access_token, f"{USER_ID}-cold-{i}"):
+            raise RuntimeError("fake MCP server returned no tools")
+    
+    async def mcp_tools_warm(i):
+        await crew_service.get_mcp_tools(access_token, USER_ID)
+    
+    async def execute_query(i):
+        # Skip the answer caches, or every timed run after the warm-up is a hit
+        result = await crew_service.execute_query(USER_ID, "Summarize FAKE-1", access_token, use_cache=False)
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+    
+    benchmarks = [
+        ("oauth_token_cached", iterations, token_cached),
+        ("oauth_token_refresh", iterations, token_refresh),
+        ("mcp_get_tools_cold", cold_iterations, mcp_tools_cold),
+        ("mcp_get_tools_warm", iterations, mcp_tools_warm),
+        ("execute_query", iterations, execute_query),
+    ]
+    
+    results = {}
+    try:
+        store_session(oauth_service, token, expires_in=3600)
+        for name, count, body in benchmarks:
+            if only and name not in only:
+                continue
+            # One untimed run warms imports, pooled sessions and cached agents
+            await body(-1)
+            results[name] = summarize(await timed(count, body))
+            print(f"{name:<24} median {results[name]['median_ms']:>9.2f} ms  p95 {results[name]['p95_ms']:>9.2f} ms")
+            if name == "oauth_token_refresh":
+                store_session(oauth_service, token, expires_in=3600)
+    finally:
+        await crew_service.shutdown()
+        oauth_server.shutdown()
+    return results
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> bool:
+    """Print the comparison; False if anything regressed"""
+    ok = True
+    print(f"\n{'benchmark':<24} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before:
+            print(f"{name:<24} {'-':>10} {current['median_ms']:>10.2f}     new")
+            continue
+        change = current["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        regressed = change > tolerance
+        ok = ok and not regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<24} {before['median_ms']:>10.2f} {current['median_ms']:>10.2f} {change:>+7.0%}{flag}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown of the median (0.25 = 25%%)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--only", nargs="*", default=[], help="benchmark names to run")
+    args = parser.parse_args()
+    
+    results = asyncio.run(run_benchmarks(args.iterations, args.only))
+    
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({
+            "machine": {"python": platform.python_version(), "platform": platform.platform()},
+            "results": results
+        }, indent=2) + "\n")
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline first")
+        return
+    baseline = json.loads(args.baseline.read_text())
+    if not compare(results, baseline["results"], args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
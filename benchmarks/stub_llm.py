@@ -0,0 +1,53 @@
+"""Deterministic LLM for crewai runs without Azure OpenAI.
+
+The first call asks for one tool call in crewai's ReAct format; once the
+conversation holds an observation it returns a final answer. Latency per
+call is STUB_LLM_LATENCY_MS.
+"""
+import os
+import json
+import time
+from typing import Any, Dict, List, Optional, Union
+from crewai.llms.base_llm import BaseLLM
+
+class StubLLM(BaseLLM):
+    def __init__(
+        self,
+        tool: str = "getJiraIssue",
+        tool_input: Optional[Dict[str, Any]] = None,
+        latency_ms: Optional[float] = None
+    ):
+        super().__init__(model="stub/deterministic")
+        self.tool = tool
+        self.tool_input = tool_input or {"issueIdOrKey": "FAKE-1"}
+        self.latency = (latency_ms if latency_ms is not None else float(os.getenv("STUB_LLM_LATENCY_MS", "20"))) / 1000
+        self.calls = 0
+    
+    @staticmethod
+    def _text(messages: Union[str, List[Dict[str, str]]]) -> str:
+        if isinstance(messages, str):
+            return messages
+        return messages[-1].get("content", "") if messages else ""
+    
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        if "Observation:" in self._text(messages):
+            return (
+                "Thought: I now know the final answer\n"
+                f"Final Answer: Stub answer after calling {self.tool}."
+            )
+        return (
+            f"Thought: I should look this up with {self.tool}\n"
+            f"Action: {self.tool}\n"
+            f"Action Input: {json.dumps(self.tool_input)}"
+        )
+    
+    def supports_function_calling(self) -> bool:
+        return False
+    
+    def supports_stop_words(self) -> bool:
+        return True
+    
+    def get_context_window_size(self) -> int:
+        return 128000
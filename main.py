@@ -1,20 +1,65 @@
-from fastapi import FastAPI, Request, Depends, HTTPException, Form
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse
 from starlette.middleware.sessions import SessionMiddleware
-import uuid
+from contextlib import asynccontextmanager
+import asyncio
+import threading
 import os
 from dotenv import load_dotenv
+from services.sweeper import get_sweeper
+from services.history_store import get_history_store
+from services.metrics import REGISTRY
+from services.atlassian_api import close_atlassian_api
+from services.warmup import WarmUp, WarmUpStep, run_command
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown"""
+    oauth_service = get_oauth_service()
+    oauth_service.start()
+    # One sweeper expires pending logins, sessions, histories, job results and idle MCP sessions
+    sweeper = get_sweeper()
+    sweeper.add_purger(oauth_service.cleanup_expired_sessions)
+    sweeper.add_purger(get_history_store().purge_expired)
+    sweeper.add_purger(_purge_expired_jobs)
+    sweeper.start()
+    # Create the index and mirror files only when there is something to sync
+    if os.getenv("CONFLUENCE_SYNC_SPACES", "").strip():
+        get_confluence_sync().start()
+    if os.getenv("JIRA_SYNC_PROJECTS", "").strip():
+        get_jira_sync().start()
+    # Load the agent stack in the background; /ready reports when it's done
+    warmup = get_warmup()
+    warmup.start()
+    yield
+    await warmup.stop()
+    # Let in-flight crew runs and background jobs finish before tearing down
+    drain_timeout = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "60"))
+    if _job_service is not None:
+        await _job_service.shutdown(drain_timeout)
+    # Close pooled MCP subprocesses so they don't outlive the server
+    if _crew_service is not None:
+        await _crew_service.drain(drain_timeout)
+        await _crew_service.shutdown()
+    if _confluence_sync is not None:
+        await _confluence_sync.stop()
+    if _jira_sync is not None:
+        await _jira_sync.stop()
+    await close_atlassian_api()
+    await sweeper.stop()
+    await oauth_service.stop()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Atlassian MCP Team Server",
     description="OAuth 2.1 enabled Atlassian MCP server for team collaboration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add session middleware
@@ -34,6 +79,12 @@ templates = Jinja2Templates(directory="templates")
 # Global services - lazy loaded to avoid circular imports
 _oauth_service = None
 _crew_service = None
+_job_service = None
+_confluence_sync = None
+_jira_sync = None
+_warmup = None
+# The warm-up builds the crew service on a worker thread
+_crew_service_lock = threading.Lock()
 
 # Make oauth_service available globally for routers
 oauth_service = None
@@ -48,13 +99,74 @@ def get_oauth_service():
 def get_crew_service():
     global _crew_service
     if _crew_service is None:
-        try:
-            from services.crew_service import CrewService
-            _crew_service = CrewService()
-        except ImportError as e:
-            raise HTTPException(status_code=503, detail=f"CrewAI service unavailable: {str(e)}")
+        with _crew_service_lock:
+            if _crew_service is None:
+                try:
+                    from services.crew_service import CrewService
+                    _crew_service = CrewService()
+                except ImportError as e:
+                    raise HTTPException(status_code=503, detail=f"CrewAI service unavailable: {str(e)}")
     return _crew_service
 
+def get_job_service():
+    global _job_service
+    if _job_service is None:
+        from services.job_service import JobService
+        _job_service = JobService(get_crew_service())
+    return _job_service
+
+def _purge_expired_jobs() -> int:
+    # The job service is built with the first job; until then there is nothing to purge
+    return _job_service.purge_expired() if _job_service is not None else 0
+
+def get_confluence_sync():
+    global _confluence_sync
+    if _confluence_sync is None:
+        from services.atlassian_api import get_atlassian_api
+        from services.confluence_index import ConfluenceSync, get_confluence_index
+        _confluence_sync = ConfluenceSync(get_confluence_index(), get_atlassian_api(), get_oauth_service())
+    return _confluence_sync
+
+def get_jira_sync():
+    global _jira_sync
+    if _jira_sync is None:
+        from services.atlassian_api import get_atlassian_api
+        from services.jira_mirror import JiraSync, get_jira_mirror
+        _jira_sync = JiraSync(get_jira_mirror(), get_atlassian_api(), get_oauth_service())
+    return _jira_sync
+
+def _load_agent_stack():
+    from services.crew_service import load_agent_stack
+    load_agent_stack()
+
+async def _start_crew_workers():
+    crew_service = await asyncio.to_thread(get_crew_service)
+    await crew_service.crew_pool.start()
+
+async def _prefetch_mcp_remote():
+    from services.mcp_pool import mcp_remote_prefetch_args
+    args = mcp_remote_prefetch_args()
+    if args is not None:
+        await run_command(args, timeout=float(os.getenv("WARMUP_MCP_TIMEOUT", "180")))
+
+def get_warmup():
+    global _warmup
+    if _warmup is None:
+        if os.getenv("CREW_BACKEND", "thread").lower() == "process":
+            # The crew workers load the agent stack; this process never does
+            steps = [WarmUpStep("crew_workers", _start_crew_workers)]
+        else:
+            steps = [
+                # crewai, crewai_tools and mcp take seconds to import
+                WarmUpStep("agent_imports", lambda: asyncio.to_thread(_load_agent_stack)),
+                # Builds the LLM client, local tools, MCP pool and scheduler
+                WarmUpStep("crew_service", lambda: asyncio.to_thread(lambda: get_crew_service().warm_up())),
+            ]
+        # Resolve mcp-remote so the first MCP spawn doesn't download it
+        steps.append(WarmUpStep("mcp_runtime", _prefetch_mcp_remote, required=False))
+        _warmup = WarmUp(steps)
+    return _warmup
+
 # Dependency to get current user session
 def get_current_user(request: Request):
     user_id = request.session.get("user_id")
@@ -62,98 +174,6 @@ def get_current_user(request: Request):
         raise HTTPException(status_code=401, detail="Not authenticated")
     return user_id
 
-@app.post("/atlassian/query")
-async def execute_query(request: Request, query: str = Form(...)):
-    """Execute Atlassian query"""
-    try:
-        user_id = request.session.get("user_id")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Not authenticated")
-            
-        oauth_service = get_oauth_service()
-        crew_service = get_crew_service()
-        
-        # Check if user is authenticated
-        is_authenticated = await oauth_service.is_user_authenticated(user_id)
-        if not is_authenticated:
-            raise HTTPException(status_code=401, detail="User not authenticated with Atlassian")
-        
-        # Get valid token
-        token = await oauth_service.get_valid_token(user_id)
-        if not token:
-            raise HTTPException(status_code=401, detail="Invalid or expired token")
-        
-        # Execute query
-        result = await crew_service.execute_query(
-            user_id=user_id,
-            query=query,
-            access_token=token['access_token']
-        )
-        
-        return JSONResponse(content=result)
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "error": f"Query execution failed: {str(e)}",
-                "query": query
-            }
-        )
-
-@app.get("/atlassian/tools")
-async def get_available_tools(request: Request):
-    """Get available MCP tools for authenticated user"""
-    try:
-        user_id = request.session.get("user_id")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Not authenticated")
-            
-        oauth_service = get_oauth_service()
-        crew_service = get_crew_service()
-        
-        # Check authentication
-        is_authenticated = await oauth_service.is_user_authenticated(user_id)
-        if not is_authenticated:
-            raise HTTPException(status_code=401, detail="User not authenticated")
-        
-        # Get token
-        token = await oauth_service.get_valid_token(user_id)
-        if not token:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        # Get tools
-        tools = await crew_service.get_mcp_tools(token['access_token'])
-        tool_names = [tool.name for tool in tools] if tools else []
-        
-        return {
-            "tools": tool_names,
-            "count": len(tool_names)
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get tools: {str(e)}")
-
-@app.get("/atlassian/history")
-async def get_query_history(request: Request, limit: int = 20):
-    """Get user's query history"""
-    try:
-        user_id = request.session.get("user_id")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Not authenticated")
-            
-        crew_service = get_crew_service()
-        history = crew_service.get_user_history(user_id, limit)
-        return {"history": history}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get history: {str(e)}")
-
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Home page - shows login or dashboard based on auth status"""
@@ -172,7 +192,26 @@ async def home(request: Request):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "atlassian-mcp-server"}
+    health = {"status": "healthy", "service": "atlassian-mcp-server"}
+    if _crew_service is not None:
+        # Report a backed-up crew queue instead of claiming to be healthy
+        scheduler = _crew_service.scheduler.get_stats()
+        health["queue_depth"] = scheduler["queue_depth"]
+        health["oldest_wait_seconds"] = scheduler["oldest_wait_seconds"]
+        if scheduler["queue_depth"] >= scheduler["max_queue_depth"]:
+            health["status"] = "overloaded"
+    return health
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the agent stack has warmed up"""
+    stats = get_warmup().get_stats()
+    return JSONResponse(status_code=200 if stats["ready"] else 503, content=stats)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics for this worker"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/logout")
 async def logout(request: Request):
@@ -181,17 +220,58 @@ async def logout(request: Request):
     return RedirectResponse(url="/", status_code=303)
 
 # Include routers after services are defined
-from routers import auth
-# from routers import atlassian  # Temporarily disabled due to CrewAI import issue
+# None of these import the agent stack; it loads on the first crew run
+from routers import auth, atlassian, jobs, confluence, jira
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
-# app.include_router(atlassian.router, prefix="/atlassian", tags=["atlassian"])  # Temporarily disabled
+app.include_router(atlassian.router, prefix="/atlassian", tags=["atlassian"])
+app.include_router(jobs.router, prefix="/atlassian/jobs", tags=["jobs"])
+app.include_router(confluence.router, prefix="/atlassian/confluence", tags=["confluence"])
+app.include_router(jira.router, prefix="/atlassian/jira", tags=["jira"])
 
-if __name__ == "__main__":
+def run_production():
+    """Serve with multiple workers, fast event loop/HTTP parser and no reloader"""
+    import importlib.util
     import uvicorn
+    
+    workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+    state_store = os.getenv("STATE_STORE_URL", "memory://")
+    history_store = os.getenv("HISTORY_STORE_URL") or state_store
+    if workers > 1 and (state_store.startswith("memory") or history_store.startswith("memory")):
+        # Logins, jobs and history would only be visible to the worker that handled them
+        print("STATE_STORE_URL (or HISTORY_STORE_URL) is process-local; set it to "
+              "sqlite:///state.db to run multiple workers. Falling back to 1 worker.")
+        workers = 1
+    
+    # uvloop isn't available on Windows; httptools usually is
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    
     uvicorn.run(
-        "main:app", 
-        host="0.0.0.0", 
-        port=8080, 
-        reload=True,
+        "main:app",
+        host=os.getenv("SERVER_HOST", "0.0.0.0"),
+        port=int(os.getenv("SERVER_PORT", "8080")),
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=int(os.getenv("SERVER_BACKLOG", "2048")),
+        timeout_keep_alive=int(os.getenv("SERVER_KEEPALIVE_TIMEOUT", "30")),
+        timeout_graceful_shutdown=int(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "60")),
+        proxy_headers=True,
+        access_log=os.getenv("SERVER_ACCESS_LOG", "false").lower() == "true",
         log_level="info"
     )
+
+if __name__ == "__main__":
+    import sys
+    
+    if "--production" in sys.argv or os.getenv("SERVER_MODE") == "production":
+        run_production()
+    else:
+        import uvicorn
+        uvicorn.run(
+            "main:app", 
+            host="0.0.0.0", 
+            port=8080, 
+            reload=True,
+            log_level="info"
+        )
@@ -1,8 +1,14 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response, FileResponse
+from contextlib import nullcontext
 from typing import Optional
+import time
+import asyncio
 from services.oauth_service import OAuthService
 from services.crew_service import CrewService
+from services.scheduler import SchedulerOverloaded
+from services import events, profiling, batch
+from services.timing import RequestTimings
 
 router = APIRouter()
 
@@ -24,33 +30,69 @@ def get_current_user(request: Request):
 async def execute_query(
     request: Request,
     query: str = Form(...),
+    timings: bool = False,
+    no_cache: bool = False,
+    profile: bool = False,
     user_id: str = Depends(get_current_user),
     oauth_service: OAuthService = Depends(get_oauth_service),
     crew_service: CrewService = Depends(get_crew_service)
 ):
-    """Execute Atlassian query"""
+    """Execute Atlassian query (timings=true adds stage timings, profile=true profiles the run
+    for admins, no_cache=true skips cached answers)"""
     try:
-        # Check if user is authenticated
-        is_authenticated = await oauth_service.is_user_authenticated(user_id)
-        if not is_authenticated:
-            raise HTTPException(status_code=401, detail="User not authenticated with Atlassian")
+        stage_timings = RequestTimings()
         
-        # Get valid token
-        token = await oauth_service.get_valid_token(user_id)
-        if not token:
-            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        with stage_timings.measure("auth"):
+            # Check if user is authenticated
+            is_authenticated = await oauth_service.is_user_authenticated(user_id)
+            if not is_authenticated:
+                raise HTTPException(status_code=401, detail="User not authenticated with Atlassian")
+            
+            # Get valid token
+            token = await oauth_service.get_valid_token(user_id)
+            if not token:
+                raise HTTPException(status_code=401, detail="Invalid or expired token")
+        
+        profiled = profile and profiling.is_admin(request.headers.get("X-Admin-Token"))
         
         # Execute query
-        result = await crew_service.execute_query(
-            user_id=user_id,
-            query=query,
-            access_token=token['access_token']
-        )
+        with events.observing(stage_timings.listener), \
+                (profiling.capturing() if profiled else nullcontext()) as captured:
+            run = crew_service.execute_query(
+                user_id=user_id,
+                query=query,
+                access_token=token['access_token'],
+                use_cache=not no_cache
+            )
+            if crew_service.crew_pool is not None:
+                # Worker runs can be killed, so stop the crew if the client leaves
+                run = events.until_disconnected(run, request.is_disconnected)
+            result = await run
         
-        return JSONResponse(content=result)
+        if captured is not None:
+            profile_id = await asyncio.to_thread(profiling.get_profile_store().save, captured)
+            result["profile_url"] = f"/atlassian/profiles/{profile_id}"
+        with stage_timings.measure("serialize"):
+            body = JSONResponse(content=result).body
+        if timings:
+            # Spliced into the measured body, so the timings list serialize
+            # like Server-Timing does without rendering the result twice
+            body = body[:-1] + b',"timings":' + JSONResponse(content=stage_timings.stages).body + b"}"
+        response = Response(content=body, media_type="application/json")
+        response.headers["Server-Timing"] = stage_timings.header()
+        return response
         
     except HTTPException:
         raise
+    except SchedulerOverloaded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except events.ClientDisconnected:
+        # Nobody is left to read this
+        raise HTTPException(status_code=499, detail="Client closed request")
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -61,17 +103,76 @@ async def execute_query(
             }
         )
 
+@router.post("/query/stream")
+async def stream_query(
+    request: Request,
+    query: str = Form(...),
+    no_cache: bool = False,
+    user_id: str = Depends(get_current_user),
+    oauth_service: OAuthService = Depends(get_oauth_service),
+    crew_service: CrewService = Depends(get_crew_service)
+):
+    """Execute Atlassian query, streaming progress as Server-Sent Events"""
+    token = await oauth_service.get_valid_token(user_id)
+    if not token:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    
+    return StreamingResponse(
+        events.stream_query(crew_service, user_id, query, token['access_token'], use_cache=not no_cache),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/query/batch")
+async def batch_query(
+    request: Request,
+    no_cache: bool = False,
+    concurrency: Optional[int] = None,
+    user_id: str = Depends(get_current_user),
+    oauth_service: OAuthService = Depends(get_oauth_service),
+    crew_service: CrewService = Depends(get_crew_service)
+):
+    """Run many queries over one MCP session, streaming one NDJSON line per result as it finishes.
+    
+    Body: {"queries": ["...", {"id": "...", "query": "..."}, ...]}; the last line summarises the batch.
+    concurrency items (default and cap BATCH_CONCURRENCY) run at once, past
+    CREW_PER_USER_CONCURRENCY but within CREW_MAX_CONCURRENCY.
+    """
+    try:
+        body = await request.json()
+        items = batch.items_from_body(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    token = await oauth_service.get_valid_token(user_id)
+    if not token:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    
+    return StreamingResponse(
+        _batch_lines(crew_service, user_id, items, token['access_token'], concurrency, not no_cache),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _batch_lines(crew_service, user_id: str, items, access_token: str, concurrency: Optional[int], use_cache: bool):
+    started = time.perf_counter()
+    results = []
+    async for result in crew_service.execute_batch(user_id, items, access_token, concurrency, use_cache):
+        results.append(result)
+        yield batch.format_ndjson(result)
+    yield batch.format_ndjson(batch.summarize(results, (time.perf_counter() - started) * 1000))
+
 @router.get("/history")
 async def get_query_history(
     request: Request,
     limit: int = 20,
+    cursor: Optional[int] = None,
     user_id: str = Depends(get_current_user),
     crew_service: CrewService = Depends(get_crew_service)
 ):
-    """Get user's query history"""
+    """Get user's query history (pass next_cursor back as cursor for older entries)"""
     try:
-        history = crew_service.get_user_history(user_id, limit)
-        return {"history": history}
+        return crew_service.get_history_page(user_id, limit, cursor)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get history: {str(e)}")
@@ -90,6 +191,16 @@ async def clear_query_history(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear history: {str(e)}")
 
+def _tools_response(request: Request, catalog) -> Response:
+    """Render a tool catalog, honouring If-None-Match"""
+    headers = {"ETag": catalog.etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == catalog.etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(
+        content={"tools": catalog.names, "count": len(catalog.tools)},
+        headers=headers
+    )
+
 @router.get("/tools")
 async def get_available_tools(
     request: Request,
@@ -99,30 +210,41 @@ async def get_available_tools(
 ):
     """Get available MCP tools for authenticated user"""
     try:
-        # Check authentication
-        is_authenticated = await oauth_service.is_user_authenticated(user_id)
-        if not is_authenticated:
-            raise HTTPException(status_code=401, detail="User not authenticated")
-        
         # Get token
         token = await oauth_service.get_valid_token(user_id)
         if not token:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        # Get tools
-        tools = await crew_service.get_mcp_tools(token['access_token'])
-        tool_names = [tool.name for tool in tools] if tools else []
+            raise HTTPException(status_code=401, detail="User not authenticated")
         
-        return {
-            "tools": tool_names,
-            "count": len(tool_names)
-        }
+        # Served from the catalog cache; only a miss starts an MCP session
+        catalog = await crew_service.get_tool_catalog(user_id, token)
+        return _tools_response(request, catalog)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get tools: {str(e)}")
 
+@router.post("/tools/refresh")
+async def refresh_available_tools(
+    request: Request,
+    user_id: str = Depends(get_current_user),
+    oauth_service: OAuthService = Depends(get_oauth_service),
+    crew_service: CrewService = Depends(get_crew_service)
+):
+    """Reload the MCP tool catalog, bypassing the cache"""
+    try:
+        token = await oauth_service.get_valid_token(user_id)
+        if not token:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+        
+        catalog = await crew_service.get_tool_catalog(user_id, token, refresh=True)
+        return _tools_response(request, catalog)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to refresh tools: {str(e)}")
+
 @router.get("/user-info")
 async def get_atlassian_user_info(
     request: Request,
@@ -142,6 +264,16 @@ async def get_atlassian_user_info(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get user info: {str(e)}")
 
+@router.get("/profiles/{profile_id}")
+async def download_profile(request: Request, profile_id: str):
+    """Download a crew run profile (pstats format, e.g. for snakeviz)"""
+    if not profiling.is_admin(request.headers.get("X-Admin-Token")):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    path = profiling.get_profile_store().path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+
 @router.get("/stats")
 async def get_service_stats(
     request: Request,
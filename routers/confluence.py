@@ -0,0 +1,66 @@
+import os
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from services.oauth_service import OAuthService
+from services import profiling
+
+router = APIRouter()
+
+def get_oauth_service():
+    import main
+    return main.get_oauth_service()
+
+def get_confluence_sync():
+    import main
+    return main.get_confluence_sync()
+
+def get_existing_sync():
+    """The sync, or a 404 if nothing is synced and there is no Confluence index yet
+    (opening it would create an empty database)"""
+    if not os.getenv("CONFLUENCE_SYNC_SPACES", "").strip() and not os.path.exists(os.getenv("CONFLUENCE_INDEX_PATH", "confluence_index.db")):
+        raise HTTPException(status_code=404, detail="No local Confluence index; set CONFLUENCE_SYNC_SPACES to sync one")
+    return get_confluence_sync()
+
+def get_current_user(request: Request):
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user_id
+
+@router.get("/search")
+async def search_pages(
+    q: str,
+    space: Optional[str] = None,
+    limit: int = 10,
+    user_id: str = Depends(get_current_user)
+):
+    """Full-text search over the locally synced Confluence spaces"""
+    index = get_existing_sync().index
+    results = await asyncio.to_thread(index.search, q, space, max(1, min(limit, 50)))
+    return {"query": q, "results": results, "count": len(results)}
+
+@router.post("/sync")
+async def sync_spaces(
+    request: Request,
+    full: bool = False,
+    user_id: str = Depends(get_current_user),
+    oauth_service: OAuthService = Depends(get_oauth_service)
+):
+    """Sync the configured spaces now with the service account's token
+    (admin or service account only; full=true re-indexes them and drops deleted ones)"""
+    if user_id != oauth_service.sync_user_id and not profiling.is_admin(request.headers.get("X-Admin-Token")):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    if not os.getenv("CONFLUENCE_SYNC_SPACES", "").strip():
+        raise HTTPException(status_code=400, detail="No spaces configured in CONFLUENCE_SYNC_SPACES")
+    sync = get_confluence_sync()
+    if not await oauth_service.get_sync_token():
+        raise HTTPException(status_code=503, detail="SYNC_USER_ID is not set or has no valid token")
+    sync.sync_soon(full=full)
+    return JSONResponse(status_code=202, content={"spaces": sync.spaces, "status_url": "/atlassian/confluence/status"})
+
+@router.get("/status")
+async def sync_status(user_id: str = Depends(get_current_user)):
+    """Indexed pages and sync cursors per space"""
+    return get_existing_sync().get_stats()
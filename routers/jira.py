@@ -0,0 +1,75 @@
+import os
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from services.oauth_service import OAuthService
+from services import profiling
+from services.jira_mirror import JQLError
+
+router = APIRouter()
+
+def get_oauth_service():
+    import main
+    return main.get_oauth_service()
+
+def get_jira_sync():
+    import main
+    return main.get_jira_sync()
+
+def get_existing_sync():
+    """The sync, or a 404 if nothing is synced and there is no Jira mirror yet
+    (opening it would create an empty database)"""
+    if not os.getenv("JIRA_SYNC_PROJECTS", "").strip() and not os.path.exists(os.getenv("JIRA_MIRROR_PATH", "jira_mirror.db")):
+        raise HTTPException(status_code=404, detail="No local Jira mirror; set JIRA_SYNC_PROJECTS to sync one")
+    return get_jira_sync()
+
+def get_current_user(request: Request):
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user_id
+
+@router.get("/search")
+async def search_issues(jql: str = "", limit: int = 50, user_id: str = Depends(get_current_user)):
+    """Issues in the local mirror matching a JQL subset"""
+    mirror = get_existing_sync().mirror
+    try:
+        result = await asyncio.to_thread(mirror.search, jql, max(1, min(limit, 500)))
+    except JQLError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"jql": jql, **result}
+
+@router.get("/count")
+async def count_issues(jql: str = "", group_by: Optional[str] = None, user_id: str = Depends(get_current_user)):
+    """Number of matching issues, optionally per status, assignee, labels, sprint, ..."""
+    mirror = get_existing_sync().mirror
+    try:
+        result = await asyncio.to_thread(mirror.count, jql, group_by)
+    except JQLError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"jql": jql, **result}
+
+@router.post("/sync")
+async def sync_projects(
+    request: Request,
+    full: bool = False,
+    user_id: str = Depends(get_current_user),
+    oauth_service: OAuthService = Depends(get_oauth_service)
+):
+    """Sync the configured projects now with the service account's token
+    (admin or service account only; full=true re-mirrors them and drops deleted ones)"""
+    if user_id != oauth_service.sync_user_id and not profiling.is_admin(request.headers.get("X-Admin-Token")):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    if not os.getenv("JIRA_SYNC_PROJECTS", "").strip():
+        raise HTTPException(status_code=400, detail="No projects configured in JIRA_SYNC_PROJECTS")
+    sync = get_jira_sync()
+    if not await oauth_service.get_sync_token():
+        raise HTTPException(status_code=503, detail="SYNC_USER_ID is not set or has no valid token")
+    sync.sync_soon(full=full)
+    return JSONResponse(status_code=202, content={"projects": sync.projects, "status_url": "/atlassian/jira/status"})
+
+@router.get("/status")
+async def sync_status(user_id: str = Depends(get_current_user)):
+    """Mirrored issues and sync cursors per project"""
+    return get_existing_sync().get_stats()
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Request, Depends, HTTPException, Form
+from fastapi.responses import JSONResponse
+from services.oauth_service import OAuthService
+from services.scheduler import SchedulerOverloaded
+
+router = APIRouter()
+
+def get_oauth_service():
+    import main
+    return main.get_oauth_service()
+
+def get_job_service():
+    import main
+    return main.get_job_service()
+
+def get_current_user(request: Request):
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user_id
+
+@router.post("")
+async def submit_job(
+    request: Request,
+    query: str = Form(...),
+    user_id: str = Depends(get_current_user),
+    oauth_service: OAuthService = Depends(get_oauth_service)
+):
+    """Submit a query for background execution"""
+    token = await oauth_service.get_valid_token(user_id)
+    if not token:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    
+    job_service = get_job_service()
+    try:
+        job = await job_service.submit(user_id, query, token['access_token'])
+    except SchedulerOverloaded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    return JSONResponse(
+        status_code=202,
+        content={
+            **job.to_dict(),
+            "status_url": f"/atlassian/jobs/{job.job_id}",
+            "result_url": f"/atlassian/jobs/{job.job_id}/result"
+        }
+    )
+
+@router.get("")
+async def list_jobs(request: Request, user_id: str = Depends(get_current_user)):
+    """List the current user's jobs"""
+    jobs = get_job_service().list_jobs(user_id)
+    return {"jobs": [job.to_dict() for job in jobs]}
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str, request: Request, user_id: str = Depends(get_current_user)):
+    """Get job status"""
+    job = get_job_service().get_job(user_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str, request: Request, user_id: str = Depends(get_current_user)):
+    """Get the result of a finished job"""
+    job = get_job_service().get_job(user_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.result is None:
+        # Still queued/running, or cancelled before producing anything
+        return JSONResponse(status_code=409 if job.status == "cancelled" else 202, content=job.to_dict())
+    return {**job.to_dict(), "result": job.result}
+
+@router.delete("/{job_id}")
+async def cancel_job(job_id: str, request: Request, user_id: str = Depends(get_current_user)):
+    """Cancel a queued or running job"""
+    job = get_job_service().cancel(user_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -0,0 +1,73 @@
+import os
+import asyncio
+from typing import Dict, Any, Optional
+import httpx
+
+class AtlassianAPIError(Exception):
+    """A Jira or Confluence REST call failed"""
+    
+    def __init__(self, message: str, status_code: int = 0):
+        super().__init__(message)
+        self.status_code = status_code
+
+class AtlassianAPI:
+    """Shared async client for the Jira and Confluence REST APIs.
+    
+    One connection pool serves every user; each call carries the caller's
+    OAuth access token.
+    """
+    
+    def __init__(self, base_url: Optional[str] = None, cloud_id: Optional[str] = None):
+        self.base_url = (base_url or os.getenv("ATLASSIAN_API_BASE", "https://api.atlassian.com")).rstrip("/")
+        self.cloud_id = cloud_id or os.getenv("ATLASSIAN_CLOUD_ID")
+        self.max_retries = int(os.getenv("ATLASSIAN_HTTP_RETRIES", "3"))
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(float(os.getenv("ATLASSIAN_HTTP_TIMEOUT", "30")), connect=10),
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("ATLASSIAN_HTTP_MAX_CONNECTIONS", "50")),
+                max_keepalive_connections=20
+            )
+        )
+    
+    def jira_url(self, path: str) -> str:
+        return f"{self.base_url}/ex/jira/{self.cloud_id}{path}"
+    
+    def confluence_url(self, path: str) -> str:
+        return f"{self.base_url}/ex/confluence/{self.cloud_id}{path}"
+    
+    async def get_json(self, url: str, access_token: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """GET a JSON resource, backing off when Atlassian rate-limits us"""
+        if not self.cloud_id:
+            raise AtlassianAPIError("ATLASSIAN_CLOUD_ID is not configured")
+        headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
+        for attempt in range(self.max_retries + 1):
+            response = await self.client.get(url, params=params, headers=headers)
+            if response.status_code in (429, 503) and attempt < self.max_retries:
+                retry_after = response.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+                await asyncio.sleep(min(delay, 30))
+                continue
+            if response.status_code >= 400:
+                raise AtlassianAPIError(
+                    f"{response.status_code} from {url}: {response.text[:200]}",
+                    response.status_code
+                )
+            return response.json()
+    
+    async def aclose(self):
+        await self.client.aclose()
+
+_api: Optional[AtlassianAPI] = None
+
+def get_atlassian_api() -> AtlassianAPI:
+    """Process-wide client, closed from the app lifespan"""
+    global _api
+    if _api is None:
+        _api = AtlassianAPI()
+    return _api
+
+async def close_atlassian_api():
+    global _api
+    if _api is not None:
+        await _api.aclose()
+        _api = None
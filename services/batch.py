@@ -0,0 +1,62 @@
+import os
+import json
+from typing import Dict, Any, List, Iterable, Optional
+
+# Largest batch accepted by the endpoint and the CLI
+MAX_BATCH_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+class BatchItem:
+    """One question of a batch"""
+    
+    __slots__ = ("index", "id", "query")
+    
+    def __init__(self, index: int, id: Optional[str], query: str):
+        self.index = index
+        self.id = id
+        self.query = query
+
+def parse_item(value: Any, index: int) -> BatchItem:
+    """A batch item from a string or an object with query/question/body and an optional id/request_id"""
+    if isinstance(value, str):
+        query, item_id = value, None
+    elif isinstance(value, dict):
+        query = value.get("query") or value.get("question") or value.get("body")
+        item_id = value.get("id") or value.get("request_id")
+    else:
+        query, item_id = None, None
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError(f"Item {index} has no query")
+    return BatchItem(index, str(item_id) if item_id is not None else None, query.strip())
+
+def parse_items(values: Iterable[Any]) -> List[BatchItem]:
+    items = [parse_item(value, index) for index, value in enumerate(values)]
+    if not items:
+        raise ValueError("The batch is empty")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ValueError(f"Batches are limited to {MAX_BATCH_ITEMS} queries, got {len(items)}")
+    return items
+
+def items_from_body(body: Any) -> List[BatchItem]:
+    """Batch items from a request body: {"queries": [...]} or a bare list"""
+    values = body.get("queries") if isinstance(body, dict) else body
+    if not isinstance(values, list):
+        raise ValueError('Expected {"queries": [...]}')
+    return parse_items(values)
+
+def read_jsonl(path: str) -> List[BatchItem]:
+    """Batch items from a JSON Lines file such as requests.jsonl; blank lines are skipped"""
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_items(json.loads(line) for line in f if line.strip())
+
+def format_ndjson(data: Dict[str, Any]) -> str:
+    """Encode one NDJSON line"""
+    return json.dumps(data, default=str) + "\n"
+
+def summarize(results: List[Dict[str, Any]], duration_ms: float) -> Dict[str, Any]:
+    """Closing line of a batch stream"""
+    return {
+        "done": True,
+        "count": len(results),
+        "succeeded": sum(1 for result in results if result.get("success")),
+        "duration_ms": round(duration_ms, 1),
+    }
@@ -0,0 +1,290 @@
+import os
+import re
+import html
+import time
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Set
+from services.atlassian_api import AtlassianAPI
+from services.store import KeyValueStore, get_store
+
+# CQL compares dates in minutes and in the syncing user's time zone, so each
+# sync re-reads a day before the cursor; re-indexing a page is idempotent
+SYNC_OVERLAP = timedelta(days=1)
+
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def strip_html(markup: str) -> str:
+    """Plain text of Confluence storage format"""
+    return " ".join(html.unescape(_TAG.sub(" ", markup or "")).split())
+
+def fts_query(text: str, any_word: bool = False) -> str:
+    """Quote each word so user input can't break FTS5 query syntax"""
+    words = [f'"{word}"' for word in _WORD.findall(text)]
+    return (" OR " if any_word else " ").join(words)
+
+class ConfluenceIndex:
+    """SQLite FTS5 index of Confluence pages"""
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("CONFLUENCE_INDEX_PATH", "confluence_index.db")
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "id TEXT PRIMARY KEY, space_key TEXT NOT NULL, title TEXT NOT NULL, "
+            "url TEXT, version INTEGER, last_modified TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS pages_space ON pages (space_key)")
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5("
+            "id UNINDEXED, title, body, tokenize='porter unicode61')"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_state ("
+            "space_key TEXT PRIMARY KEY, cursor TEXT, synced_at REAL)"
+        )
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def upsert(self, pages: List[Dict[str, Any]]):
+        """Add or replace pages: dicts of id, space_key, title, body, url, version, last_modified"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for page in pages:
+                conn.execute("DELETE FROM pages_fts WHERE id = ?", (page["id"],))
+                conn.execute(
+                    "INSERT OR REPLACE INTO pages (id, space_key, title, url, version, last_modified) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (page["id"], page["space_key"], page["title"], page.get("url"),
+                     page.get("version"), page.get("last_modified"))
+                )
+                conn.execute(
+                    "INSERT INTO pages_fts (id, title, body) VALUES (?, ?, ?)",
+                    (page["id"], page["title"], page.get("body", ""))
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def remove_missing(self, space_key: str, keep: Set[str]) -> int:
+        """Drop the space's pages whose ids a full sync didn't see; returns how many"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            gone = [
+                (page_id,) for (page_id,) in conn.execute("SELECT id FROM pages WHERE space_key = ?", (space_key,))
+                if page_id not in keep
+            ]
+            conn.executemany("DELETE FROM pages_fts WHERE id = ?", gone)
+            conn.executemany("DELETE FROM pages WHERE id = ?", gone)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(gone)
+    
+    def _search(self, match: str, space: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        sql = (
+            "SELECT p.id, p.space_key, p.title, p.url, p.last_modified, "
+            "snippet(pages_fts, 2, '[', ']', ' ... ', 16), bm25(pages_fts, 10.0, 1.0) AS rank "
+            "FROM pages_fts JOIN pages p ON p.id = pages_fts.id "
+            "WHERE pages_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        if space:
+            sql += " AND p.space_key = ?"
+            params.append(space)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        return [
+            {
+                "id": row[0], "space": row[1], "title": row[2], "url": row[3],
+                "last_modified": row[4], "snippet": row[5], "score": round(-row[6], 3)
+            }
+            for row in self._connect().execute(sql, params).fetchall()
+        ]
+    
+    def search(self, query: str, space: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Best-matching pages; every word must match, else any word may"""
+        if not fts_query(query):
+            return []
+        return self._search(fts_query(query), space, limit) or self._search(fts_query(query, any_word=True), space, limit)
+    
+    def get_cursor(self, space_key: str) -> Optional[str]:
+        row = self._connect().execute("SELECT cursor FROM sync_state WHERE space_key = ?", (space_key,)).fetchone()
+        return row[0] if row else None
+    
+    def set_cursor(self, space_key: str, cursor: Optional[str]):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO sync_state (space_key, cursor, synced_at) VALUES (?, ?, ?)",
+            (space_key, cursor, time.time())
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        spaces = {
+            row[0]: {"pages": row[1]}
+            for row in conn.execute("SELECT space_key, COUNT(*) FROM pages GROUP BY space_key")
+        }
+        for space_key, cursor, synced_at in conn.execute("SELECT space_key, cursor, synced_at FROM sync_state"):
+            spaces.setdefault(space_key, {"pages": 0}).update({
+                "cursor": cursor,
+                "synced_at": datetime.fromtimestamp(synced_at).isoformat() if synced_at else None
+            })
+        return {"pages": sum(s["pages"] for s in spaces.values()), "spaces": spaces}
+
+class ConfluenceSync:
+    """Keeps the index up to date with the configured spaces.
+    
+    Uses the OAuth token of the SYNC_USER_ID service account; only give it
+    spaces every team member may read, since anyone signed in can search the
+    index. Incremental syncs can't see deletions, so a full sync every
+    CONFLUENCE_FULL_SYNC_INTERVAL seconds drops pages that are gone upstream.
+    """
+    
+    def __init__(self, index: ConfluenceIndex, api: AtlassianAPI, oauth_service, spaces: Optional[List[str]] = None,
+                 store: Optional[KeyValueStore] = None):
+        self.index = index
+        self.api = api
+        self.oauth_service = oauth_service
+        self.store = store or get_store()
+        configured = os.getenv("CONFLUENCE_SYNC_SPACES", "")
+        self.spaces = spaces if spaces is not None else [s.strip() for s in configured.split(",") if s.strip()]
+        self.interval = float(os.getenv("CONFLUENCE_SYNC_INTERVAL", "900"))
+        self.full_interval = float(os.getenv("CONFLUENCE_FULL_SYNC_INTERVAL", "86400"))
+        self.page_size = 50
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._manual: set = set()
+        self.last_error: Optional[str] = None
+    
+    @staticmethod
+    def _page(result: Dict[str, Any], base: str) -> Dict[str, Any]:
+        return {
+            "id": result["id"],
+            "space_key": result.get("space", {}).get("key", ""),
+            "title": result.get("title", ""),
+            "body": strip_html(result.get("body", {}).get("storage", {}).get("value", "")),
+            "url": base + result.get("_links", {}).get("webui", ""),
+            "version": result.get("version", {}).get("number"),
+            "last_modified": result.get("version", {}).get("when"),
+        }
+    
+    async def sync_space(self, space_key: str, access_token: str, full: bool = False) -> int:
+        """Index pages changed since the space's cursor; returns how many.
+        
+        A full sync re-reads every page and then removes the ones it didn't see.
+        """
+        cursor = None if full else self.index.get_cursor(space_key)
+        seen: Set[str] = set()
+        cql = f'space = "{space_key}" AND type = page'
+        if cursor:
+            since = datetime.fromisoformat(cursor.replace("Z", "+00:00")) - SYNC_OVERLAP
+            cql += f' AND lastmodified >= "{since.strftime("%Y-%m-%d %H:%M")}"'
+        cql += " ORDER BY lastmodified ASC"
+        
+        url = self.api.confluence_url("/wiki/rest/api/content/search")
+        start, synced, newest = 0, 0, cursor
+        while True:
+            data = await self.api.get_json(url, access_token, {
+                "cql": cql, "start": start, "limit": self.page_size,
+                "expand": "body.storage,version,space"
+            })
+            base = data.get("_links", {}).get("base", "")
+            pages = [self._page(result, base) for result in data.get("results", [])]
+            if pages:
+                await asyncio.to_thread(self.index.upsert, pages)
+                synced += len(pages)
+                seen.update(page["id"] for page in pages)
+                modified = [p["last_modified"] for p in pages if p["last_modified"]]
+                if modified:
+                    newest = max([newest or ""] + modified)
+            if not data.get("_links", {}).get("next") or not pages:
+                break
+            start += len(pages)
+        if full:
+            removed = await asyncio.to_thread(self.index.remove_missing, space_key, seen)
+            if removed:
+                print(f"Removed {removed} pages no longer in Confluence space {space_key}")
+        self.index.set_cursor(space_key, newest)
+        return synced
+    
+    async def sync(self, full: bool = False) -> Dict[str, int]:
+        """Sync every configured space with the service account's token"""
+        async with self._lock:
+            token = await self.oauth_service.get_sync_token()
+            if token is None:
+                self.last_error = "SYNC_USER_ID is not set or has no valid token"
+                return {}
+            access_token = token["access_token"]
+            synced = {}
+            for space_key in self.spaces:
+                try:
+                    synced[space_key] = await self.sync_space(space_key, access_token, full)
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = f"{space_key}: {e}"
+                    print(f"Confluence sync of {space_key} failed: {e}")
+            return synced
+    
+    def sync_soon(self, full: bool = False):
+        """Start a sync without waiting for it"""
+        task = asyncio.create_task(self.sync(full))
+        # The loop only keeps weak references to tasks
+        self._manual.add(task)
+        task.add_done_callback(self._manual.discard)
+    
+    async def _sync_forever(self):
+        while True:
+            # Every server worker runs this loop; the lease lets one of them sync per interval
+            if self.store.add("confluence-sync", os.getpid(), ttl=self.interval):
+                # ...and a second lease makes one sync per full interval a full one
+                full = self.store.add("confluence-full-sync", os.getpid(), ttl=self.full_interval)
+                try:
+                    await self.sync(full=full)
+                except Exception as e:
+                    print(f"Background Confluence sync failed: {e}")
+            await asyncio.sleep(self.interval)
+    
+    def start(self):
+        """Sync in the background every CONFLUENCE_SYNC_INTERVAL seconds"""
+        if self.spaces and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._sync_forever())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "configured_spaces": self.spaces,
+            "interval": self.interval,
+            "last_error": self.last_error,
+            **self.index.get_stats()
+        }
+
+_index: Optional[ConfluenceIndex] = None
+
+def get_confluence_index() -> ConfluenceIndex:
+    global _index
+    if _index is None:
+        _index = ConfluenceIndex()
+    return _index
@@ -0,0 +1,486 @@
+import os
+import time
+import signal
+import asyncio
+import importlib
+import threading
+import subprocess
+import multiprocessing
+from contextlib import nullcontext
+from types import SimpleNamespace
+from typing import Dict, Any, Optional, List, Tuple, Set
+from services.events import emit, observing
+from services.profiling import capturing, active
+from services.mcp_pool import token_fingerprint
+from services.metrics import REGISTRY
+
+CREW_WORKER_EXITS = REGISTRY.counter(
+    "atlas_crew_worker_exits_total", "Crew worker processes stopped, by reason", ("reason",)
+)
+
+class CrewWorkerError(Exception):
+    """A crew run failed inside a worker process, or the worker died"""
+
+class CrewTimeout(CrewWorkerError):
+    """A crew run went past its wall-clock limit. A worker is killed; a crew
+    thread can't be, and keeps its leases until it finishes"""
+
+def read_rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process, where /proc is available"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def descendant_pids(pid: int) -> List[int]:
+    """Every process started under pid, children first"""
+    parents: Dict[int, List[int]] = {}
+    for child, parent in _parent_pids():
+        parents.setdefault(parent, []).append(child)
+    found = []
+    pending = [pid]
+    while pending:
+        children = parents.get(pending.pop(), [])
+        found.extend(children)
+        pending.extend(children)
+    return found
+
+def _parent_pids() -> List[Tuple[int, int]]:
+    """(pid, parent pid) of every process, from /proc or else ps"""
+    if os.path.isdir("/proc"):
+        pairs = []
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as stat:
+                    # The command name may contain spaces; fields resume after ")"
+                    pairs.append((int(entry), int(stat.read().rsplit(")", 1)[1].split()[1])))
+            except (OSError, ValueError, IndexError):
+                pass
+        return pairs
+    try:
+        listing = subprocess.run(["ps", "-A", "-o", "pid=", "-o", "ppid="], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+    return [tuple(int(field) for field in line.split()) for line in listing.splitlines() if len(line.split()) == 2]
+
+def kill_process_tree(process):
+    """Kill a worker and the processes it started (npx, mcp-remote, node).
+    
+    The MCP client starts each server in a session of its own, so killing the
+    worker's process group would miss them; their pids are collected instead.
+    """
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+        process.kill()
+        return
+    # A stopped worker can't start more processes while the tree is read
+    try:
+        os.kill(process.pid, signal.SIGSTOP)
+    except OSError:
+        pass
+    descendants = descendant_pids(process.pid)
+    process.kill()
+    for pid in descendants:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+def _load_factory(path: str):
+    """Callable named by "package.module:attribute" """
+    module, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module), attribute)
+
+def _worker_main(conn, mcp_pool_size: int):
+    """Entry point of a crew worker process"""
+    # The worker runs crews itself instead of starting a pool of its own
+    os.environ["CREW_BACKEND"] = "thread"
+    os.environ["MCP_POOL_MAX_SIZE"] = str(mcp_pool_size)
+    asyncio.run(_serve(conn))
+
+async def _serve(conn):
+    from services.crew_service import CrewService
+    from services.sweeper import get_sweeper
+    
+    # Events come from the crew thread as well as the loop
+    send_lock = threading.Lock()
+    
+    def send(message: Tuple):
+        with send_lock:
+            conn.send(message)
+    
+    def relay(name: str, method: str, value: float, labels: Dict[str, Any]):
+        try:
+            send(("metric", name, method, value, labels))
+        except Exception as e:
+            print(f"Could not relay metric {name}: {e}")
+    
+    # Tool, LLM, MCP and agent timings are recorded here but scraped from the server
+    REGISTRY.relay_to(relay)
+    
+    try:
+        factory = os.getenv("CREW_WORKER_LLM")
+        service = CrewService(llm=_load_factory(factory)() if factory else None)
+        await asyncio.to_thread(service.warm_up)
+    except Exception as e:
+        send(("failed", str(e) or type(e).__name__))
+        return
+    # Closes this worker's idle MCP sessions
+    sweeper = get_sweeper()
+    sweeper.start()
+    
+    def session_closed(session):
+        # Tells the server to stop routing the user here for this session
+        try:
+            send(("closed", session.key))
+        except Exception as e:
+            print(f"Could not report closed MCP session: {e}")
+    
+    service.mcp_pool.on_close.append(session_closed)
+    send(("ready", os.getpid()))
+    
+    def forward(event: str, data: Dict[str, Any]):
+        try:
+            send(("event", event, data))
+        except Exception as e:
+            print(f"Could not forward run event {event}: {e}")
+    
+    try:
+        while True:
+            message = await asyncio.to_thread(conn.recv)
+            if message is None:
+                break
+            kind, user_id, access_token = message[:3]
+            try:
+                if kind == "run":
+                    with observing(forward), (capturing() if message[4] else nullcontext()) as captured:
+                        result = await service.run_crew(user_id, message[3], access_token)
+                    if captured is not None:
+                        # The server saves the profile; send it the raw stats
+                        captured.create_stats()
+                        send(("event", "profile", captured.stats))
+                    reply = ("result", None if result is None else str(result))
+                else:
+                    tools = await service.get_mcp_tools(access_token, user_id)
+                    session = service.mcp_pool.sessions.get((user_id, token_fingerprint(access_token)))
+                    if session is not None:
+                        # Lets the server route the user's queries to this worker
+                        send(("event", "mcp_ready", {"tools": len(session.tools), "catalog_version": session.catalog_version}))
+                    reply = ("result", [
+                        {"name": tool.name, "description": getattr(tool, "description", "") or ""}
+                        for tool in tools
+                    ])
+            except Exception as e:
+                reply = ("error", str(e) or type(e).__name__)
+            send(reply)
+    except (EOFError, OSError):
+        # The server went away
+        pass
+    finally:
+        await service.shutdown()
+        await sweeper.stop()
+
+class CrewWorker:
+    """A crew worker process and the pipe to it"""
+    
+    def __init__(self, process, conn, loop: asyncio.AbstractEventLoop):
+        self.process = process
+        self.conn = conn
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.busy = False
+        self.jobs = 0
+        self.started_at = time.monotonic()
+        # MCP sessions this worker has open, with their catalog versions;
+        # the worker reports each one it closes
+        self.sessions: Dict[Tuple[str, str], Optional[str]] = {}
+        # Replies are read on a thread so the loop never blocks on the pipe
+        self._reader = threading.Thread(target=self._read, args=(loop,), name=f"crew-worker-{process.pid}", daemon=True)
+        self._reader.start()
+    
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+    
+    def _read(self, loop: asyncio.AbstractEventLoop):
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                # None tells the waiting run that the worker is gone
+                message = None
+            try:
+                if message is not None and message[0] == "closed":
+                    # Sent whenever the worker closes a session, even between runs
+                    loop.call_soon_threadsafe(self.sessions.pop, tuple(message[1]), None)
+                    continue
+                if message is not None and message[0] == "metric":
+                    # Metrics are thread-safe, so no need to go through the loop
+                    REGISTRY.record(*message[1:])
+                    continue
+                loop.call_soon_threadsafe(self.messages.put_nowait, message)
+            except RuntimeError:
+                # Event loop closed
+                return
+            if message is None:
+                return
+    
+    def rss(self) -> Optional[int]:
+        return read_rss_bytes(self.pid)
+
+class CrewProcessPool:
+    """Runs crews in worker processes that keep their own warm MCP sessions.
+    
+    Each worker runs one crew at a time. A run that times out, or whose caller
+    is cancelled (e.g. the client disconnected), kills its worker together
+    with the MCP server processes it started; a fresh worker takes its place.
+    """
+    
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_jobs: Optional[int] = None,
+        max_rss_mb: Optional[float] = None,
+    ):
+        self.size = size or int(os.getenv("CREW_POOL_WORKERS", os.getenv("CREW_MAX_CONCURRENCY", "4")))
+        self.timeout = timeout or float(os.getenv("CREW_TIMEOUT", "300"))
+        self.max_jobs = max_jobs or int(os.getenv("CREW_WORKER_MAX_JOBS", "200"))
+        self.max_rss = (max_rss_mb or float(os.getenv("CREW_WORKER_MAX_RSS_MB", "1024"))) * 1024 * 1024
+        self.start_timeout = float(os.getenv("CREW_WORKER_START_TIMEOUT", "120"))
+        # Split the MCP session budget between the workers
+        self.mcp_pool_size = max(1, int(os.getenv("MCP_POOL_MAX_SIZE", "20")) // self.size)
+        # Workers don't inherit the server's threads, locks or sockets
+        self._context = multiprocessing.get_context("spawn")
+        self.workers: List[CrewWorker] = []
+        self._starting = 0
+        self._changed: Optional[asyncio.Condition] = None
+        self._replacing: Set[asyncio.Task] = set()
+        self._closed = False
+        self.spawned = 0
+        self.jobs = 0
+        self.timeouts = 0
+        self.cancelled = 0
+    
+    def _condition(self) -> asyncio.Condition:
+        # Created lazily so the pool can be constructed outside a running loop
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+    
+    async def _notify(self):
+        async with self._condition():
+            self._condition().notify_all()
+    
+    async def _spawn(self) -> CrewWorker:
+        """Start a worker and wait until it has loaded the agent stack"""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self.mcp_pool_size), name="crew-worker", daemon=True
+        )
+        starting = asyncio.ensure_future(asyncio.to_thread(process.start))
+        try:
+            await asyncio.shield(starting)
+        except asyncio.CancelledError:
+            # process.start() can't be interrupted; stop the process once it is up
+            await starting
+            await asyncio.to_thread(kill_process_tree, process)
+            child_conn.close()
+            parent_conn.close()
+            raise
+        child_conn.close()
+        worker = CrewWorker(process, parent_conn, asyncio.get_running_loop())
+        try:
+            reply = await asyncio.wait_for(worker.messages.get(), self.start_timeout)
+        except asyncio.TimeoutError:
+            reply = ("failed", f"no reply within {self.start_timeout:.0f}s")
+        except BaseException:
+            # Cancelled, e.g. by shutdown(): don't leave the process running
+            await asyncio.shield(self._stop(worker, graceful=False))
+            raise
+        if reply is None or reply[0] != "ready":
+            await self._stop(worker, graceful=False)
+            reason = reply[1] if reply else f"exited with code {process.exitcode}"
+            raise CrewWorkerError(f"Crew worker failed to start: {reason}")
+        self.spawned += 1
+        return worker
+    
+    async def _add_worker(self):
+        self._starting += 1
+        try:
+            worker = await self._spawn()
+            if self._closed:
+                await self._stop(worker, graceful=True)
+                return
+            self.workers.append(worker)
+        finally:
+            self._starting -= 1
+            await self._notify()
+    
+    async def start(self):
+        """Start every worker up front (the warm-up calls this)"""
+        missing = self.size - len(self.workers) - self._starting
+        results = await asyncio.gather(*(self._add_worker() for _ in range(missing)), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors and not self.workers:
+            raise errors[0]
+    
+    def _replace(self):
+        """Start a replacement worker in the background"""
+        if self._closed:
+            return
+        task = asyncio.create_task(self._add_worker())
+        self._replacing.add(task)
+        task.add_done_callback(self._replaced)
+    
+    def _replaced(self, task: asyncio.Task):
+        self._replacing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Could not replace crew worker: {task.exception()}")
+    
+    async def _acquire(self, key: Tuple[str, str]) -> CrewWorker:
+        """Lease an idle worker, preferring one that has the user's MCP session"""
+        if self._closed:
+            raise RuntimeError("Crew worker pool is shut down")
+        changed = self._condition()
+        while True:
+            idle = [w for w in self.workers if not w.busy]
+            if idle:
+                worker = next((w for w in idle if key in w.sessions), None) or min(idle, key=lambda w: len(w.sessions))
+                worker.busy = True
+                return worker
+            if len(self.workers) + self._starting < self.size:
+                # Not started yet, or a worker died and its replacement failed
+                await self._add_worker()
+                continue
+            async with changed:
+                try:
+                    # Re-check now and then in case a wake-up was missed
+                    await asyncio.wait_for(changed.wait(), timeout=1)
+                except asyncio.TimeoutError:
+                    pass
+    
+    async def _stop(self, worker: CrewWorker, graceful: bool):
+        if graceful:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            await asyncio.to_thread(worker.process.join, 10)
+        if worker.process.is_alive():
+            await asyncio.to_thread(kill_process_tree, worker.process)
+            await asyncio.to_thread(worker.process.join, 5)
+        worker.conn.close()
+    
+    async def _release(self, worker: CrewWorker, killed: bool):
+        worker.busy = False
+        worker.jobs += 1
+        reason = None
+        if killed:
+            reason = "killed"
+        elif worker.jobs >= self.max_jobs:
+            reason = "max_jobs"
+        else:
+            rss = worker.rss()
+            if rss is not None and rss > self.max_rss:
+                reason = "max_rss"
+        if reason is not None and worker in self.workers:
+            self.workers.remove(worker)
+            CREW_WORKER_EXITS.inc(reason=reason)
+            await self._stop(worker, graceful=not killed)
+            self._replace()
+        await self._notify()
+    
+    async def _call(self, worker: CrewWorker, key: Tuple[str, str], message: Tuple) -> Tuple[str, Any]:
+        """Send a request and relay the worker's run events until it replies"""
+        worker.conn.send(message)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            reply = await asyncio.wait_for(worker.messages.get(), max(deadline - time.monotonic(), 0))
+            if reply is None:
+                raise CrewWorkerError(f"Crew worker {worker.pid} exited with code {worker.process.exitcode}")
+            if reply[0] != "event":
+                return reply
+            _, event, data = reply
+            if event == "profile":
+                profile = active()
+                if profile is not None:
+                    profile.worker_stats = data
+                continue
+            if event == "mcp_ready":
+                worker.sessions[key] = data.get("catalog_version")
+            emit(event, data)
+    
+    async def _request(self, user_id: str, access_token: str, message: Tuple) -> Any:
+        key = (user_id, token_fingerprint(access_token))
+        worker = await self._acquire(key)
+        self.jobs += 1
+        killed = True
+        try:
+            kind, payload = await self._call(worker, key, message)
+            killed = False
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise CrewTimeout(f"Timed out after {self.timeout:.0f}s")
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            # A worker that didn't answer may still be running the crew
+            await self._release(worker, killed)
+        if kind == "error":
+            raise CrewWorkerError(payload)
+        return payload
+    
+    async def run(self, user_id: str, query: str, access_token: str) -> Optional[str]:
+        """Run a crew in a worker; the result text, or None if no agent could be built"""
+        profiled = active() is not None
+        return await self._request(user_id, access_token, ("run", user_id, access_token, query, profiled))
+    
+    async def list_tools(self, user_id: str, access_token: str) -> List[Any]:
+        """The user's MCP tools, listed by a worker"""
+        tools = await self._request(user_id, access_token, ("tools", user_id, access_token))
+        return [SimpleNamespace(**tool) for tool in tools]
+    
+    def catalog_version(self, user_id: str, access_token: str) -> Optional[str]:
+        """Tool catalog version of the user's MCP session in any worker"""
+        key = (user_id, token_fingerprint(access_token))
+        for worker in self.workers:
+            if key in worker.sessions:
+                return worker.sessions[key]
+        return None
+    
+    async def shutdown(self):
+        """Stop every worker, letting idle ones close their MCP sessions"""
+        self._closed = True
+        for task in list(self._replacing):
+            task.cancel()
+        workers = list(self.workers)
+        self.workers.clear()
+        await asyncio.gather(*(self._stop(w, graceful=not w.busy) for w in workers), return_exceptions=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get worker pool statistics"""
+        return {
+            "size": len(self.workers),
+            "max_size": self.size,
+            "busy": sum(1 for w in self.workers if w.busy),
+            "starting": self._starting,
+            "spawned": self.spawned,
+            "jobs": self.jobs,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "exits": {
+                reason: int(CREW_WORKER_EXITS.value(reason=reason)) for reason in ("killed", "max_jobs", "max_rss")
+            },
+            "timeout_seconds": self.timeout,
+            "workers": [
+                {"pid": w.pid, "busy": w.busy, "jobs": w.jobs, "mcp_sessions": len(w.sessions), "rss_bytes": w.rss()}
+                for w in self.workers
+            ],
+        }
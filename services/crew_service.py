@@ -1,69 +1,196 @@
 import os
 import json
+import time
 import asyncio
-from typing import Dict, Any, Optional, List
+import functools
+import importlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, AsyncExitStack
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, Tuple, AsyncIterator
 from datetime import datetime
-from crewai import Agent, Task, Crew, LLM
-from crewai_tools.adapters.mcp_adapter import MCPServerAdapter
-from mcp import StdioServerParameters
 from dotenv import load_dotenv
+from services.mcp_pool import MCPSessionPool, PooledSession, token_fingerprint
+from services.crew_pool import CrewProcessPool, CrewTimeout
+from services.scheduler import CrewScheduler, SchedulerOverloaded
+from services.events import emit, observing, stage, step_callback, instrument_tools
+from services.profiling import run_profiled
+from services.tool_catalog import ToolCatalog, CatalogEntry, catalog_key, is_write_tool, asks_to_write
+from services.result_cache import ResultCache, normalize_query
+from services.semantic_cache import SemanticCache
+from services.tool_cache import TOOL_CACHE_LOOKUPS
+from services.history_store import HistoryStore, get_history_store
+from services.confluence_index import get_confluence_index
+from services.jira_mirror import get_jira_mirror
+from services.fast_path import FastPathRouter, FastPathRoute, FAST_PATH_QUERIES
+from services.batch import BatchItem
+from services.timing import RequestTimings
+from services.metrics import (
+    REGISTRY, STAGES, QUERIES, QUERY_SECONDS, AGENT_BUILD_SECONDS, LLM_SECONDS
+)
+
+if TYPE_CHECKING:
+    from crewai import Agent
 
 load_dotenv()
 
+# Imported on first use (or by the warm-up), never when this module loads, so
+# the web tier can serve auth, UI, history and stats without the agent stack
+AGENT_STACK_MODULES = ("crewai", "crewai_tools.adapters.mcp_adapter", "mcp", "services.local_tools")
+
+def load_agent_stack():
+    """Import crewai, crewai_tools and mcp (blocking; takes seconds)"""
+    for module in AGENT_STACK_MODULES:
+        importlib.import_module(module)
+
+# Agents owned by the current batch lane, by MCP session key; a lane runs its
+# items one after another, so they can share one agent
+_lane_agents: ContextVar[Optional[Dict[Tuple[str, str], "CachedAgent"]]] = ContextVar(
+    "batch_lane_agents", default=None
+)
+
+# Crew slots the current batch may hold at once, one per lane
+_batch_lanes: ContextVar[Optional[int]] = ContextVar("batch_lanes", default=None)
+
+class CachedAgent:
+    """An agent built over one pooled MCP session"""
+    
+    def __init__(self, agent: "Agent", session: PooledSession):
+        self.agent = agent
+        self.session = session
+        self.in_use = False
+
 class CrewService:
-    def __init__(self):
-        self.llm = LLM(
-            model="azure/gpt4o-qa-agentic-framework-dev",
-            base_url="https://eastus2.api.cognitive.microsoft.com",
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        )
-        self.active_crews: Dict[str, Any] = {}
-        self.user_histories: Dict[str, List[Dict[str, Any]]] = {}
+    def __init__(self, history: Optional[HistoryStore] = None, llm: Optional[Any] = None):
+        # The LLM client and local tools need crewai; both are built on first use
+        self._llm = self._time_llm_calls(llm) if llm is not None else None
+        self._local_tools: Optional[List[Any]] = None
+        self._agent_stack_lock = threading.Lock()
+        # Agents cached per MCP session, least recently used first
+        self.active_crews: "OrderedDict[Tuple[str, str], CachedAgent]" = OrderedDict()
+        self.agent_cache_size = int(os.getenv("AGENT_CACHE_MAX_ENTRIES", "20"))
+        self.history = history or get_history_store()
+        self.mcp_pool = MCPSessionPool()
+        self.mcp_pool.on_close.append(self._drop_agent)
+        self.scheduler = CrewScheduler()
+        # CREW_BACKEND=process runs crews in worker processes that can be
+        # killed on timeout or disconnect; "thread" runs them in this process
+        backend = os.getenv("CREW_BACKEND", "thread").lower()
+        self.crew_pool = CrewProcessPool() if backend == "process" else None
+        # Wall-clock limit of a run; the process pool enforces its own
+        self.crew_timeout = float(os.getenv("CREW_TIMEOUT", "300"))
+        self.tool_catalog = ToolCatalog()
+        self.result_cache = ResultCache()
+        self.semantic_cache = SemanticCache()
+        self.fast_path = FastPathRouter()
+        # Default and upper bound for the number of batch items run at once
+        self.batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "4"))
+        # Background re-runs of queries answered from the semantic cache
+        self._refreshing: Dict[Tuple[str, str], asyncio.Task] = {}
+        # Lease releases of cancelled runs whose crew threads just finished
+        self._releasing: set = set()
+        self._register_gauges()
+    
+    @staticmethod
+    def _time_llm_calls(llm: Any) -> Any:
+        """Record every completion the crew makes in the LLM histogram"""
+        call = llm.call
+        
+        @functools.wraps(call)
+        def timed_call(*args, **kwargs):
+            with LLM_SECONDS.time():
+                return call(*args, **kwargs)
+        
+        object.__setattr__(llm, "call", timed_call)
+        return llm
+    
+    @property
+    def llm(self) -> Any:
+        """The crew's LLM client, built on first use"""
+        if self._llm is None:
+            with self._agent_stack_lock:
+                if self._llm is None:
+                    from crewai import LLM
+                    self._llm = self._time_llm_calls(LLM(
+                        model="azure/gpt4o-qa-agentic-framework-dev",
+                        base_url="https://eastus2.api.cognitive.microsoft.com",
+                        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                    ))
+        return self._llm
+    
+    @property
+    def local_tools(self) -> List[Any]:
+        """Tools answered from local indexes, given to every agent"""
+        if self._local_tools is None:
+            with self._agent_stack_lock:
+                if self._local_tools is None:
+                    from services.local_tools import build_local_tools
+                    spaces = os.getenv("CONFLUENCE_SYNC_SPACES", "").strip()
+                    projects = os.getenv("JIRA_SYNC_PROJECTS", "").strip()
+                    self._local_tools = instrument_tools(build_local_tools(
+                        get_confluence_index() if spaces else None,
+                        get_jira_mirror() if projects else None
+                    ))
+        return self._local_tools
     
-    async def get_mcp_tools(self, access_token: str) -> List[Any]:
+    def warm_up(self):
+        """Load the agent stack and build the LLM client ahead of the first run (blocking)"""
+        load_agent_stack()
+        self.llm
+        self.local_tools
+    
+    def _register_gauges(self):
+        REGISTRY.gauge("atlas_mcp_sessions", "Pooled MCP sessions", lambda: len(self.mcp_pool.sessions))
+        REGISTRY.gauge("atlas_cached_agents", "Agents cached per MCP session", lambda: len(self.active_crews))
+        REGISTRY.gauge("atlas_crews_active", "Crew runs in progress", lambda: self.scheduler.get_stats()["active"])
+        REGISTRY.gauge("atlas_crew_queue_depth", "Crew runs waiting for a slot", lambda: self.scheduler.get_stats()["queue_depth"])
+        if self.crew_pool is not None:
+            REGISTRY.gauge("atlas_crew_workers", "Crew worker processes", lambda: len(self.crew_pool.workers))
+    
+    async def get_mcp_tools(self, access_token: str, user_id: str = "anonymous") -> List[Any]:
         """Get MCP tools with OAuth token"""
         try:
-            server_params = StdioServerParameters(
-                command="npx.cmd",
-                args=[
-                    "-y", "mcp-remote", 
-                    "https://mcp.atlassian.com/v1/sse",
-                    "-v",
-                    "--header", f"Authorization=Bearer {access_token}"
-                ],
-                env={
-                    "UV_PYTHON": "3.12", 
-                    "ATLASSIAN_ACCESS_TOKEN": access_token,
-                    **os.environ
-                },
-                timeout_seconds=120
-            )
-            
-            # This would normally be in an async context manager
-            # For now, we'll return a mock or handle synchronously
-            adapter = MCPServerAdapter(server_params)
-            tools = list(adapter.__enter__())
-            return tools
-            
+            if self.crew_pool is not None:
+                return await self.crew_pool.list_tools(user_id, access_token)
+            async with self.mcp_pool.session(user_id, access_token) as session:
+                return list(session.tools)
+        
         except Exception as e:
             print(f"Error getting MCP tools: {e}")
             return []
     
-    async def create_atlassian_agent(self, user_id: str, access_token: str) -> Optional[Agent]:
+    def catalog_key_for(self, token: Dict[str, Any]):
+        """Tool catalog key for a token: the site plus the scopes it grants"""
+        return catalog_key(os.getenv("ATLASSIAN_CLOUD_ID"), token.get("scope"))
+    
+    async def get_tool_catalog(self, user_id: str, token: Dict[str, Any], refresh: bool = False) -> CatalogEntry:
+        """Get the cached tool catalog for a token, loading it if needed"""
+        return await self.tool_catalog.get(
+            self.catalog_key_for(token),
+            lambda: self.get_mcp_tools(token['access_token'], user_id),
+            refresh=refresh
+        )
+    
+    async def create_atlassian_agent(self, user_id: str, tools: List[Any]) -> Optional["Agent"]:
         """Create Atlassian agent for user"""
         try:
-            tools = await self.get_mcp_tools(access_token)
-            
             if not tools:
                 return None
             
-            agent = Agent(
-                role="Atlassian helper",
-                goal="Interact with Jira/Confluence using OAuth 2.1 authentication",
-                backstory=f"A helpful assistant for Atlassian documentation with proper OAuth authentication for user {user_id}.",
-                llm=self.llm,
-                tools=tools
-            )
+            if self._llm is None or self._local_tools is None:
+                # First agent of a cold worker; keep the imports off the event loop
+                await asyncio.to_thread(self.warm_up)
+            from crewai import Agent
+            with AGENT_BUILD_SECONDS.time(), stage("agent_build"):
+                agent = Agent(
+                    role="Atlassian helper",
+                    goal="Interact with Jira/Confluence using OAuth 2.1 authentication",
+                    backstory=f"A helpful assistant for Atlassian documentation with proper OAuth authentication for user {user_id}.",
+                    llm=self.llm,
+                    tools=list(tools) + self.local_tools
+                )
             
             return agent
             
@@ -71,25 +198,76 @@ class CrewService:
             print(f"Error creating agent for user {user_id}: {e}")
             return None
     
-    async def execute_query(
-        self, 
-        user_id: str, 
-        query: str, 
-        access_token: str
-    ) -> Dict[str, Any]:
-        """Execute Atlassian query for user"""
+    def _drop_agent(self, session: PooledSession):
+        """Forget the agent built over a session that is being closed"""
+        cached = self.active_crews.get(session.key)
+        if cached is not None and cached.session is session:
+            del self.active_crews[session.key]
+    
+    @asynccontextmanager
+    async def _lease_agent(self, user_id: str, session: PooledSession):
+        """Reuse the session's cached agent, or build one"""
+        lane = _lane_agents.get()
+        if lane is not None:
+            cached = lane.get(session.key)
+            if cached is None or cached.session is not session:
+                agent = await self.create_atlassian_agent(user_id, session.tools)
+                if agent is None:
+                    yield None
+                    return
+                cached = lane[session.key] = CachedAgent(agent, session)
+            yield cached.agent
+            return
+        
+        cached = self.active_crews.get(session.key)
+        if cached is not None and cached.session is session and not cached.in_use:
+            self.active_crews.move_to_end(session.key)
+        elif cached is not None and cached.in_use:
+            # Agents keep per-run executor state, so a concurrent run of the
+            # same user gets a throwaway agent instead of sharing this one
+            yield await self.create_atlassian_agent(user_id, session.tools)
+            return
+        else:
+            agent = await self.create_atlassian_agent(user_id, session.tools)
+            if agent is None:
+                yield None
+                return
+            cached = CachedAgent(agent, session)
+            self.active_crews[session.key] = cached
+            while len(self.active_crews) > self.agent_cache_size:
+                key, oldest = next(iter(self.active_crews.items()))
+                if oldest.in_use:
+                    break
+                del self.active_crews[key]
+        
+        cached.in_use = True
         try:
-            # Create agent
-            agent = await self.create_atlassian_agent(user_id, access_token)
+            yield cached.agent
+        finally:
+            cached.in_use = False
+    
+    async def _run_crew(self, user_id: str, query: str, access_token: str) -> Optional[Any]:
+        """Run a single-task crew for the query; None if no agent could be built"""
+        if self.crew_pool is not None:
+            return await self.crew_pool.run(user_id, query, access_token)
+        return await self.run_crew(user_id, query, access_token, timeout=self.crew_timeout)
+    
+    async def run_crew(self, user_id: str, query: str, access_token: str, timeout: Optional[float] = None) -> Optional[Any]:
+        """Run the crew in this process (crew workers call this directly, without
+        a timeout, since the pool kills them instead)"""
+        async with AsyncExitStack() as leases:
+            # Lease the user's MCP session for the whole run so it is not
+            # evicted while the crew is still calling its tools
+            session = await leases.enter_async_context(self.mcp_pool.session(user_id, access_token))
+            emit("mcp_ready", {"tools": len(session.tools), "catalog_version": session.catalog_version})
+            
+            agent = await leases.enter_async_context(self._lease_agent(user_id, session))
             if not agent:
-                return {
-                    "success": False,
-                    "error": "Failed to create Atlassian agent. Please check your authentication.",
-                    "query": query,
-                    "timestamp": datetime.now().isoformat()
-                }
+                return None
+            
+            from crewai import Task, Crew
             
-            # Create task
+            # Only the task is specific to this query
             task = Task(
                 description=query,
                 agent=agent,
@@ -97,54 +275,265 @@ class CrewService:
                 llm=self.llm
             )
             
-            # Create crew
+            # Crew is a thin per-run container around the cached agent
             crew = Crew(
                 agents=[agent],
                 tasks=[task],
                 verbose=False,  # Set to False for web deployment
+                step_callback=step_callback,
             )
             
-            # Execute
-            result = await asyncio.create_task(
-                asyncio.to_thread(crew.kickoff)
-            )
+            # Execute on the scheduler's bounded pool
+            kickoff = self.scheduler.submit(run_profiled, crew.kickoff)
+            try:
+                with stage("crew_kickoff"):
+                    return await asyncio.wait_for(asyncio.wrap_future(kickoff), timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError) as error:
+                if not kickoff.done():
+                    # The thread can't be stopped and keeps using the agent and
+                    # session, so both stay leased until it really finishes
+                    self._release_when_done(kickoff, leases.pop_all())
+                if isinstance(error, asyncio.TimeoutError):
+                    raise CrewTimeout(f"Timed out after {timeout:.0f}s") from None
+                raise
+    
+    def _release_when_done(self, kickoff: Future, leases: AsyncExitStack):
+        """Close a cancelled run's leases once its crew thread has finished"""
+        loop = asyncio.get_running_loop()
+        
+        def release():
+            task = asyncio.ensure_future(leases.aclose())
+            self._releasing.add(task)
+            task.add_done_callback(self._releasing.discard)
+        
+        def finished(_: Future):
+            try:
+                loop.call_soon_threadsafe(release)
+            except RuntimeError:
+                # The loop is gone; there is nothing left to hand them back to
+                pass
+        
+        kickoff.add_done_callback(finished)
+    
+    def _catalog_version(self, user_id: str, access_token: str) -> Optional[str]:
+        """Tool catalog version of the user's live MCP session, if there is one"""
+        if self.crew_pool is not None:
+            return self.crew_pool.catalog_version(user_id, access_token)
+        session = self.mcp_pool.sessions.get((user_id, token_fingerprint(access_token)))
+        return session.catalog_version if session is not None else None
+    
+    def _similar_answer(self, user_id: str, query: str, access_token: str, version: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Earlier answer to a paraphrase of the query, from the semantic cache"""
+        if not self.semantic_cache.enabled:
+            return None
+        if asks_to_write(query):
+            # "Create a bug for ..." must run again, never replay an earlier answer
+            return None
+        if not self.semantic_cache.has_user(user_id):
+            # First lookup since start: index the user's recent answered queries.
+            # Runs that wrote are skipped whatever this process remembers.
+            records, _ = self.history.page(user_id, self.semantic_cache.max_entries)
+            self.semantic_cache.seed(user_id, (
+                (record.query, record.text(), record.timestamp)
+                for record in records if record.success and not record.wrote
+            ))
+        answer = self.semantic_cache.lookup(user_id, query, version)
+        if answer is not None and self.semantic_cache.mode == "refresh":
+            self._refresh_in_background(user_id, query, access_token)
+            answer["refreshing"] = True
+        return answer
+    
+    def _refresh_in_background(self, user_id: str, query: str, access_token: str):
+        """Re-run a query answered from the cache; the fresh answer replaces the cached one"""
+        key = (user_id, normalize_query(query))
+        if key in self._refreshing:
+            return
+        
+        async def refresh():
+            try:
+                await self.execute_query(user_id, query, access_token, use_cache=False)
+            except SchedulerOverloaded:
+                # Busy; the cached answer stands until the next ask
+                pass
+            finally:
+                self._refreshing.pop(key, None)
+        
+        self._refreshing[key] = asyncio.create_task(refresh())
+    
+    async def execute_query(
+        self, 
+        user_id: str, 
+        query: str, 
+        access_token: str,
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """Execute Atlassian query for user (use_cache=False skips cached answers)"""
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            route = self.fast_path.route(query)
+            if route is not None:
+                direct = await self._answer_directly(user_id, query, access_token, route)
+                if direct is not None:
+                    outcome = "fast_path"
+                    return direct
             
-            # Store in history
-            history_entry = {
-                "query": query,
-                "result": str(result),
-                "timestamp": datetime.now().isoformat(),
-                "success": True
-            }
+            # Write requests always run: no cache answers them or stores their answer
+            writes = asks_to_write(query)
+            if use_cache and not writes:
+                version = self._catalog_version(user_id, access_token)
+                cached = self.result_cache.get(user_id, query, version)
+                if cached is None:
+                    cached = self._similar_answer(user_id, query, access_token, version)
+                if cached is not None:
+                    outcome = "cached"
+                    self.history.append(user_id, query, cached["result"], success=True)
+                    return cached
             
-            if user_id not in self.user_histories:
-                self.user_histories[user_id] = []
+            tools_used: List[str] = []
+            versions: List[str] = []
             
-            self.user_histories[user_id].append(history_entry)
+            def track(event: str, data: Dict[str, Any]):
+                if event == "tool_start":
+                    tools_used.append(data["tool"])
+                elif event == "mcp_ready":
+                    versions.append(data["catalog_version"])
             
-            # Keep only last 50 queries per user
-            if len(self.user_histories[user_id]) > 50:
-                self.user_histories[user_id] = self.user_histories[user_id][-50:]
+            with observing(track):
+                response = await self._execute_query(user_id, query, access_token, tools_used)
+            outcome = "success" if response["success"] else "error"
+            
+            if any(is_write_tool(name) for name in tools_used):
+                # The run changed Jira/Confluence data, so earlier answers may be stale
+                self.result_cache.invalidate_user(user_id)
+                self.semantic_cache.invalidate_user(user_id)
+            elif response["success"] and not writes:
+                version = versions[-1] if versions else None
+                self.result_cache.put(user_id, query, response, version)
+                self.semantic_cache.add(user_id, query, response, version)
+            return response
+        except SchedulerOverloaded:
+            outcome = "rejected"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            QUERIES.inc(outcome=outcome)
+            QUERY_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+    
+    async def execute_batch(
+        self,
+        user_id: str,
+        items: List[BatchItem],
+        access_token: str,
+        concurrency: Optional[int] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Run a batch of queries over one MCP session, yielding each result as it finishes"""
+        concurrency = max(1, min(concurrency or self.batch_concurrency, self.batch_concurrency, len(items)))
+        pending = deque(items)
+        results: asyncio.Queue = asyncio.Queue()
+        
+        async def run_item(item: BatchItem) -> Dict[str, Any]:
+            timings = RequestTimings()
+            started = time.perf_counter()
+            try:
+                with observing(timings.listener):
+                    response = await self.execute_query(user_id, item.query, access_token, use_cache=use_cache)
+            except SchedulerOverloaded as e:
+                response = {"success": False, "error": str(e), "retry_after": e.retry_after, "query": item.query}
+            except Exception as e:
+                response = {"success": False, "error": str(e), "query": item.query}
+            return {
+                "index": item.index,
+                "id": item.id,
+                **response,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "timings": timings.stages
+            }
+        
+        async def lane():
+            _lane_agents.set({})
+            while pending:
+                item = pending.popleft()
+                await results.put(await run_item(item))
+        
+        async with AsyncExitStack() as stack:
+            if self.crew_pool is None and any(self.fast_path.route(item.query) is None for item in items):
+                # Hold the user's MCP session for the whole batch: it is spawned
+                # once and can't be evicted between items
+                try:
+                    await stack.enter_async_context(self.mcp_pool.session(user_id, access_token))
+                except Exception as e:
+                    print(f"Could not open an MCP session for the batch of user {user_id}: {e}")
+            # Lanes may run side by side even past CREW_PER_USER_CONCURRENCY
+            _batch_lanes.set(concurrency)
+            lanes = [asyncio.create_task(lane()) for _ in range(concurrency)]
+            try:
+                for _ in range(len(items)):
+                    yield await results.get()
+            finally:
+                # Also reached when the client goes away mid-stream
+                for task in lanes:
+                    task.cancel()
+                await asyncio.gather(*lanes, return_exceptions=True)
+    
+    async def _answer_directly(self, user_id: str, query: str, access_token: str, route: FastPathRoute) -> Optional[Dict[str, Any]]:
+        """Answer a plain lookup with REST calls; None to fall back to the agent"""
+        with stage("fast_path"):
+            try:
+                result_text = await self.fast_path.answer(route, access_token)
+            except Exception as e:
+                FAST_PATH_QUERIES.inc(route=route.kind, outcome="fallback")
+                print(f"Fast path {route.kind} lookup failed, falling back to the agent: {e}")
+                return None
+        if result_text is None:
+            FAST_PATH_QUERIES.inc(route=route.kind, outcome="fallback")
+            return None
+        FAST_PATH_QUERIES.inc(route=route.kind, outcome="answered")
+        self.history.append(user_id, query, result_text, success=True)
+        return {
+            "success": True,
+            "result": result_text,
+            "query": query,
+            "timestamp": datetime.now().isoformat(),
+            "fast_path": route.kind
+        }
+    
+    async def _execute_query(self, user_id: str, query: str, access_token: str, tools_used: List[str]) -> Dict[str, Any]:
+        # tools_used fills in as the crew runs; history records whether it wrote
+        try:
+            # Wait for a crew slot; raises SchedulerOverloaded when the queue is full
+            async with self.scheduler.slot(user_id, limit=_batch_lanes.get()):
+                emit("started", {"timestamp": datetime.now().isoformat()})
+                result = await self._run_crew(user_id, query, access_token)
+            
+            if result is None:
+                return {
+                    "success": False,
+                    "error": "Failed to create Atlassian agent. Please check your authentication.",
+                    "query": query,
+                    "timestamp": datetime.now().isoformat()
+                }
+            
+            # Store in history
+            result_text = str(result)
+            self.history.append(user_id, query, result_text, success=True,
+                                wrote=any(is_write_tool(name) for name in tools_used))
             
             return {
                 "success": True,
-                "result": str(result),
+                "result": result_text,
                 "query": query,
                 "timestamp": datetime.now().isoformat()
             }
-            
+        
+        except SchedulerOverloaded:
+            raise
         except Exception as e:
-            error_entry = {
-                "query": query,
-                "error": str(e),
-                "timestamp": datetime.now().isoformat(),
-                "success": False
-            }
-            
-            if user_id not in self.user_histories:
-                self.user_histories[user_id] = []
-            
-            self.user_histories[user_id].append(error_entry)
+            self.history.append(user_id, query, str(e), success=False,
+                                wrote=any(is_write_tool(name) for name in tools_used))
             
             return {
                 "success": False,
@@ -155,26 +544,57 @@ class CrewService:
     
     def get_user_history(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         """Get user's query history"""
-        if user_id not in self.user_histories:
-            return []
-        
-        history = self.user_histories[user_id]
-        return history[-limit:] if len(history) > limit else history
+        records, _ = self.history.page(user_id, limit)
+        return [record.to_dict() for record in records]
+    
+    def get_history_page(self, user_id: str, limit: int = 20, cursor: Optional[int] = None) -> Dict[str, Any]:
+        """Get one page of history, oldest first, older than the cursor"""
+        records, next_cursor = self.history.page(user_id, limit, before=cursor)
+        return {
+            "history": [record.to_dict() for record in records],
+            "next_cursor": next_cursor
+        }
     
     def clear_user_history(self, user_id: str) -> bool:
         """Clear user's query history"""
-        if user_id in self.user_histories:
-            del self.user_histories[user_id]
-            return True
-        return False
+        return self.history.clear(user_id)
     
     def get_stats(self) -> Dict[str, Any]:
         """Get service statistics"""
-        total_users = len(self.user_histories)
-        total_queries = sum(len(history) for history in self.user_histories.values())
-        
         return {
-            "total_users": total_users,
-            "total_queries": total_queries,
-            "active_crews": len(self.active_crews)
+            "total_users": self.history.count_users(),
+            "total_queries": int(QUERIES.total()),
+            "queries_by_outcome": {
+                outcome: int(QUERIES.value(outcome=outcome))
+                for outcome in ("success", "cached", "fast_path", "error", "rejected", "cancelled")
+            },
+            "latency": {stage: histogram.summary() for stage, histogram in STAGES.items()},
+            "active_crews": len(self.active_crews),
+            "mcp_pool": self.mcp_pool.get_stats(),
+            "tool_catalog": self.tool_catalog.get_stats(),
+            "result_cache": self.result_cache.get_stats(),
+            "tool_cache": {
+                result: int(TOOL_CACHE_LOOKUPS.value(result=result)) for result in ("hit", "miss")
+            },
+            "semantic_cache": self.semantic_cache.get_stats(),
+            "fast_path": self.fast_path.get_stats(),
+            "crew_pool": self.crew_pool.get_stats() if self.crew_pool is not None else None,
+            "scheduler": self.scheduler.get_stats()
         }
+    
+    async def drain(self, timeout: float):
+        """Wait for in-flight crew runs before shutting down"""
+        stats = self.scheduler.get_stats()
+        if stats["active"] or stats["queue_depth"]:
+            print(f"Draining {stats['active']} running and {stats['queue_depth']} queued crew runs...")
+            if not await self.scheduler.drain(timeout):
+                print(f"Crew runs still active after {timeout:.0f}s; shutting down anyway")
+    
+    async def shutdown(self):
+        """Release MCP sessions held by the service"""
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        if self.crew_pool is not None:
+            await self.crew_pool.shutdown()
+        await self.mcp_pool.shutdown()
+        self.scheduler.shutdown()
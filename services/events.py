@@ -0,0 +1,160 @@
+import json
+import time
+import asyncio
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Tuple, AsyncIterator, Awaitable
+from services.scheduler import SchedulerOverloaded
+from services.metrics import TOOL_CALL_SECONDS
+
+# Listeners for the run executing in the current context. The crew thread
+# inherits the context it was started from, so events raised inside tools
+# reach the request that started the run and no other.
+_observers: ContextVar[Tuple[Callable[[str, Dict[str, Any]], None], ...]] = ContextVar(
+    "run_observers", default=()
+)
+
+MAX_EVENT_TEXT = 2000
+
+@contextmanager
+def observing(listener: Callable[[str, Dict[str, Any]], None]):
+    """Deliver run events raised in this context to a listener"""
+    token = _observers.set(_observers.get() + (listener,))
+    try:
+        yield
+    finally:
+        _observers.reset(token)
+
+def emit(event: str, data: Dict[str, Any]):
+    """Send an event to every listener of the current run"""
+    for listener in _observers.get():
+        try:
+            listener(event, data)
+        except Exception as e:
+            print(f"Run event listener failed: {e}")
+
+@contextmanager
+def stage(name: str):
+    """Time a stage of the current run and report it as a "stage" event"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        emit("stage", {"stage": name, "duration_ms": round((time.perf_counter() - started) * 1000, 1)})
+
+def _truncate(value: Any) -> str:
+    text = str(value)
+    return text if len(text) <= MAX_EVENT_TEXT else text[:MAX_EVENT_TEXT] + "..."
+
+def _instrumented(name: str, original: Callable) -> Callable:
+    @functools.wraps(original)
+    def _run(*args, **kwargs):
+        emit("tool_start", {"tool": name, "input": _truncate(kwargs or args)})
+        started = time.perf_counter()
+        success = False
+        try:
+            result = original(*args, **kwargs)
+            success = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            TOOL_CALL_SECONDS.observe(elapsed, tool=name, outcome="success" if success else "error")
+            emit("tool_end", {
+                "tool": name,
+                "duration_ms": round(elapsed * 1000, 1),
+                "success": success
+            })
+    _run.instrumented = True
+    return _run
+
+def instrument_tools(tools: List[Any]) -> List[Any]:
+    """Wrap tools so each call reports its name, timing and outcome"""
+    for tool in tools:
+        if getattr(tool._run, "instrumented", False):
+            continue
+        # crewai tools are pydantic models; bypass field validation so the
+        # instance attribute shadows the class's _run
+        object.__setattr__(tool, "_run", _instrumented(tool.name, tool._run))
+    return tools
+
+def step_callback(step: Any):
+    """crewai step callback that forwards agent steps to the current run"""
+    data: Dict[str, Any] = {"type": type(step).__name__}
+    for attr in ("thought", "tool", "tool_input", "result", "output"):
+        value = getattr(step, attr, None)
+        if value:
+            data[attr] = _truncate(value)
+    emit("step", data)
+
+class ClientDisconnected(Exception):
+    """The client went away before its run finished"""
+
+async def until_disconnected(run: Awaitable[Any], is_disconnected: Callable[[], Awaitable[bool]], poll: float = 1.0) -> Any:
+    """Await a run, cancelling it as soon as is_disconnected() reports the client gone"""
+    task = asyncio.ensure_future(run)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def stream_query(crew_service, user_id: str, query: str, access_token: str, use_cache: bool = True) -> AsyncIterator[str]:
+    """Run a query and yield its progress as Server-Sent Events"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    def listener(event: str, data: Dict[str, Any]):
+        # Tool and step events arrive on the crew thread
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+    
+    async def run():
+        with observing(listener):
+            try:
+                result = await crew_service.execute_query(
+                    user_id=user_id,
+                    query=query,
+                    access_token=access_token,
+                    use_cache=use_cache
+                )
+            except SchedulerOverloaded as e:
+                result = {
+                    "success": False,
+                    "error": str(e),
+                    "retry_after": e.retry_after,
+                    "query": query,
+                    "timestamp": datetime.now().isoformat()
+                }
+            except Exception as e:
+                result = {
+                    "success": False,
+                    "error": f"Query execution failed: {str(e)}",
+                    "query": query,
+                    "timestamp": datetime.now().isoformat()
+                }
+        queue.put_nowait(("result", result))
+        queue.put_nowait(None)
+    
+    task = asyncio.create_task(run())
+    # Flush something immediately so the client sees the request was accepted
+    yield format_sse("accepted", {"query": query, "timestamp": datetime.now().isoformat()})
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield format_sse(*item)
+    finally:
+        # Client went away before the run finished
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,221 @@
+import os
+import re
+import asyncio
+from typing import Dict, Any, Optional, List
+from services.atlassian_api import AtlassianAPI, get_atlassian_api
+from services.jira_mirror import jira_datetime
+from services.metrics import REGISTRY
+
+FAST_PATH_QUERIES = REGISTRY.counter(
+    "atlas_fast_path_total", "Queries routed past the agent, by route and outcome", ("route", "outcome")
+)
+
+_KEY = r"[A-Z][A-Z0-9_]+-\d+"
+_END = r"\s*[?.!]*\s*$"
+
+# "show PROJ-12", "what is PROJ-12?", "details for tickets PROJ-1 and PROJ-2"
+ISSUE_LOOKUP = re.compile(
+    r"^\s*(?i:(?:please\s+)?(?:show|get|open|view|display|fetch|look\s*up|describe)(?:\s+me)?\s+"
+    r"|what(?:'s|\s+is|\s+are)\s+|details\s+(?:of|for|on)\s+)?"
+    r"(?i:(?:the\s+)?(?:jira\s+)?(?:issues?|tickets?|bugs?|stor(?:y|ies)|tasks?)\s+)?"
+    rf"({_KEY}(?:\s*(?:,|&|(?i:and))\s*{_KEY})*)" + _END
+)
+EXPLICIT_JQL = re.compile(r"^\s*(?i:jql)\s*[:>]\s*(.+?)\s*$", re.S)
+EXPLICIT_CQL = re.compile(r"^\s*(?i:cql)\s*[:>]\s*(.+?)\s*$", re.S)
+_JQL_CLAUSE = (
+    r"^\s*(?i:project|assignee|reporter|status|statusCategory|sprint|labels|issuetype|type|priority|"
+    r"resolution|key|issuekey|created|updated|resolved|duedate|summary|text)"
+    r"\s*(?:=|!=|~|!~|>=|<=|>|<|\b(?i:not\s+)?(?i:in)\b|\b(?i:is(?:\s+not)?)\b)\s*"
+)
+# A query that is JQL, e.g. 'status = "In Progress"' or "project = PROJ AND status = Done".
+# English like "status is blocked on PROJ-12, why?" also starts with a field and
+# an operator, so the value must be quoted, a list or EMPTY, or JQL keywords follow.
+BARE_JQL = re.compile(
+    _JQL_CLAUSE + r"(?:[\"'(]|(?:EMPTY|NULL)\b|.*\b(?:AND|OR|ORDER\s+BY)\b)", re.S
+)
+# ...and the whole query must parse as clauses joined by AND/OR, so prose after
+# a JQL-looking start ("status in (open) means what?") goes to the agent
+_JQL_FIELD = r"(?:[A-Za-z][\w.]*|\"[^\"]+\")"
+_JQL_VALUE = r"(?:\"[^\"]*\"|'[^']*'|\w[\w.-]*\([^()]*\)|[\w.:/@+-]+)"
+_JQL_TERM = (
+    rf"(?:(?i:NOT)\s+)?{_JQL_FIELD}\s*(?:(?:!=|!~|>=|<=|=|~|>|<)\s*{_JQL_VALUE}"
+    r"|\s(?i:not\s+)?(?i:in)\s*\([^()]*\)|\s(?i:is(?:\s+not)?)\s+(?i:EMPTY|NULL)\b)"
+)
+_JQL_ORDER = rf"{_JQL_FIELD}(?:\s+(?i:ASC|DESC))?"
+JQL_SHAPE = re.compile(
+    rf"^\s*{_JQL_TERM}(?:\s+(?i:AND|OR)\s+{_JQL_TERM})*"
+    rf"(?:\s+(?i:ORDER\s+BY)\s+{_JQL_ORDER}(?:\s*,\s*{_JQL_ORDER})*)?\s*$"
+)
+# A sprint or page name: quoted, or unquoted words that don't start another
+# clause, so "page called Onboarding and summarize it" is left to the agent
+_NAME = (
+    r"(?:\"([^\"]+)\"|'([^']+)'|"
+    r"((?:(?![,;:]|\s(?i:and|or|then|but|so|which|that|who|where|what|why|how|to|with|for|from|in|on|by|plus)\b).)+?))"
+)
+SPRINT_ISSUES = re.compile(
+    r"^\s*(?i:(?:show|list|get|find)\s+(?:me\s+)?)?(?i:(?:all\s+)?(?:the\s+)?(?:issues|tickets)\s+in\s+sprint\s+)"
+    + _NAME + _END
+)
+PAGE_TITLED = re.compile(
+    r"^\s*(?i:(?:show|find|get|open)\s+(?:me\s+)?)?(?i:(?:the\s+)?(?:confluence\s+)?page\s+(?:titled|called|named)\s+)"
+    + _NAME + _END
+)
+
+def _name(match: "re.Match") -> str:
+    """The quoted or bare name a SPRINT_ISSUES or PAGE_TITLED match captured"""
+    return next(group for group in match.groups() if group is not None).strip()
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _adf_text(node: Any) -> str:
+    """Plain text of an Atlassian Document Format body"""
+    if not isinstance(node, dict):
+        return ""
+    if node.get("type") == "text":
+        return node.get("text", "")
+    parts = [_adf_text(child) for child in node.get("content", [])]
+    separator = "\n" if node.get("type") in ("doc", "bulletList", "orderedList", "table") else ""
+    return separator.join(part for part in parts if part)
+
+class FastPathRoute:
+    """A query the router can answer with direct REST calls"""
+    
+    __slots__ = ("kind", "value")
+    
+    def __init__(self, kind: str, value: Any):
+        # kind: "issue" (value: list of keys), "jql" or "cql" (value: the query)
+        self.kind = kind
+        self.value = value
+
+class FastPathRouter:
+    """Answers plain lookups (issue keys, explicit JQL or CQL) with one REST round trip.
+    
+    Anything it doesn't recognise, and any lookup that fails or finds nothing,
+    goes to the agent.
+    """
+    
+    def __init__(self, api: Optional[AtlassianAPI] = None):
+        self._api = api
+        self.enabled = os.getenv("FAST_PATH_MODE", "on").lower() != "off"
+        self.max_results = int(os.getenv("FAST_PATH_MAX_RESULTS", "50"))
+        self.site_url = os.getenv("ATLASSIAN_SITE_URL", "").rstrip("/")
+    
+    @property
+    def api(self) -> AtlassianAPI:
+        if self._api is None:
+            self._api = get_atlassian_api()
+        return self._api
+    
+    def route(self, query: str) -> Optional[FastPathRoute]:
+        """The fast path for a query, or None to use the agent"""
+        if not self.enabled:
+            return None
+        match = ISSUE_LOOKUP.match(query)
+        if match:
+            keys = list(dict.fromkeys(re.findall(_KEY, match.group(1))))
+            return FastPathRoute("issue", keys)
+        match = EXPLICIT_JQL.match(query)
+        if match:
+            return FastPathRoute("jql", match.group(1))
+        match = EXPLICIT_CQL.match(query)
+        if match:
+            return FastPathRoute("cql", match.group(1))
+        match = SPRINT_ISSUES.match(query)
+        if match:
+            sprint = _name(match)
+            return FastPathRoute("jql", f"sprint = {sprint if sprint.isdigit() else _quote(sprint)} ORDER BY rank")
+        match = PAGE_TITLED.match(query)
+        if match:
+            return FastPathRoute("cql", f"type = page AND title = {_quote(_name(match))}")
+        if BARE_JQL.match(query) and JQL_SHAPE.match(query):
+            return FastPathRoute("jql", query.strip())
+        return None
+    
+    async def answer(self, route: FastPathRoute, access_token: str) -> Optional[str]:
+        """Run the lookup; None when a search finds nothing, raises on any API
+        error, so the caller can fall back to the agent either way"""
+        if route.kind == "issue":
+            issues = await asyncio.gather(*(self._issue(key, access_token) for key in route.value))
+            return "\n\n".join(issues)
+        if route.kind == "jql":
+            return await self._search_issues(route.value, access_token)
+        return await self._search_pages(route.value, access_token)
+    
+    def _browse_url(self, key: str) -> str:
+        return f"{self.site_url}/browse/{key}" if self.site_url else key
+    
+    @staticmethod
+    def _name(fields: Dict[str, Any], field: str, attr: str = "name") -> str:
+        value = fields.get(field)
+        return value.get(attr, "") if isinstance(value, dict) else ""
+    
+    async def _issue(self, key: str, access_token: str) -> str:
+        data = await self.api.get_json(self.api.jira_url(f"/rest/api/3/issue/{key}"), access_token, {
+            "fields": "summary,status,assignee,reporter,priority,issuetype,labels,created,updated,description"
+        })
+        fields = data.get("fields", {})
+        lines = [
+            f"{data.get('key', key)}: {fields.get('summary', '')}",
+            f"Type: {self._name(fields, 'issuetype')} | Status: {self._name(fields, 'status')} | "
+            f"Priority: {self._name(fields, 'priority') or 'None'}",
+            f"Assignee: {self._name(fields, 'assignee', 'displayName') or 'Unassigned'} | "
+            f"Reporter: {self._name(fields, 'reporter', 'displayName') or 'None'}",
+        ]
+        if fields.get("labels"):
+            lines.append(f"Labels: {', '.join(fields['labels'])}")
+        lines.append(f"Created: {jira_datetime(fields.get('created'))} UTC | Updated: {jira_datetime(fields.get('updated'))} UTC")
+        lines.append(f"Link: {self._browse_url(data.get('key', key))}")
+        description = _adf_text(fields.get("description")).strip()
+        if description:
+            if len(description) > 1500:
+                description = description[:1500] + "..."
+            lines.extend(["", description])
+        return "\n".join(lines)
+    
+    async def _search_issues(self, jql: str, access_token: str) -> Optional[str]:
+        data = await self.api.get_json(self.api.jira_url("/rest/api/3/search/jql"), access_token, {
+            "jql": jql,
+            "fields": "summary,status,assignee,priority,issuetype",
+            "maxResults": self.max_results
+        })
+        issues: List[Dict[str, Any]] = data.get("issues", [])
+        if not issues:
+            # Maybe the route misread the question; let the agent try
+            return None
+        more = not data.get("isLast", True)
+        header = f"{len(issues)}{'+' if more else ''} issue(s) match: {jql}"
+        lines = [header]
+        for issue in issues:
+            fields = issue.get("fields", {})
+            assignee = self._name(fields, "assignee", "displayName") or "Unassigned"
+            lines.append(
+                f"- {issue['key']} [{self._name(fields, 'status')}] {fields.get('summary', '')} ({assignee})"
+            )
+        if more:
+            lines.append(f"Showing the first {len(issues)}; narrow the JQL to see the rest.")
+        return "\n".join(lines)
+    
+    async def _search_pages(self, cql: str, access_token: str) -> Optional[str]:
+        data = await self.api.get_json(self.api.confluence_url("/wiki/rest/api/search"), access_token, {
+            "cql": cql, "limit": self.max_results
+        })
+        results: List[Dict[str, Any]] = data.get("results", [])
+        if not results:
+            return None
+        base = data.get("_links", {}).get("base", "")
+        lines = [f"{len(results)} result(s) for: {cql}"]
+        for result in results:
+            title = result.get("title") or result.get("content", {}).get("title", "")
+            lines.append(f"- {title} - {base}{result.get('url', '')}")
+            excerpt = " ".join(re.sub(r"@@@(?:end)?hl@@@", "", result.get("excerpt", "")).split())
+            if excerpt:
+                lines.append(f"  {excerpt[:200]}")
+        return "\n".join(lines)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "answered": {kind: int(FAST_PATH_QUERIES.value(route=kind, outcome="answered")) for kind in ("issue", "jql", "cql")},
+            "fell_back": {kind: int(FAST_PATH_QUERIES.value(route=kind, outcome="fallback")) for kind in ("issue", "jql", "cql")},
+        }
@@ -0,0 +1,290 @@
+import os
+import time
+import zlib
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Deque, Tuple
+from urllib.parse import urlparse
+from services.sweeper import ExpirySweeper, get_sweeper
+
+# Result bodies longer than this are stored zlib-compressed
+COMPRESS_THRESHOLD = int(os.getenv("HISTORY_COMPRESS_THRESHOLD", "1024"))
+
+class HistoryRecord:
+    """One query outcome, stored compactly"""
+    
+    __slots__ = ("seq", "timestamp", "success", "query", "body", "compressed", "wrote")
+    
+    def __init__(self, seq: int, timestamp: float, success: bool, query: str, body: bytes, compressed: bool,
+                 wrote: bool = False):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.success = success
+        self.query = query
+        self.body = body
+        self.compressed = compressed
+        # The run called a write tool; its answer must never be replayed
+        self.wrote = wrote
+    
+    @staticmethod
+    def pack(text: str) -> Tuple[bytes, bool]:
+        """Encode a result body, compressing it when large"""
+        raw = text.encode("utf-8")
+        if len(raw) > COMPRESS_THRESHOLD:
+            packed = zlib.compress(raw, 6)
+            if len(packed) < len(raw):
+                return packed, True
+        return raw, False
+    
+    def text(self) -> str:
+        body = zlib.decompress(self.body) if self.compressed else self.body
+        return body.decode("utf-8")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.seq,
+            "query": self.query,
+            "result" if self.success else "error": self.text(),
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(),
+            "success": self.success
+        }
+
+class HistoryStore(ABC):
+    """Per-user query history capped at max_entries records"""
+    
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_entries = max_entries or int(os.getenv("HISTORY_MAX_ENTRIES", "50"))
+        # Histories of users who stop using the service expire like sessions
+        self.ttl = ttl or float(os.getenv("HISTORY_TTL", "604800"))
+    
+    @abstractmethod
+    def append(self, user_id: str, query: str, text: str, success: bool, wrote: bool = False) -> HistoryRecord:
+        """Record a query outcome as the user's newest entry"""
+    
+    @abstractmethod
+    def page(self, user_id: str, limit: int, before: Optional[int] = None) -> Tuple[List[HistoryRecord], Optional[int]]:
+        """Up to limit records older than the cursor, oldest first, plus the next cursor"""
+    
+    @abstractmethod
+    def clear(self, user_id: str) -> bool:
+        """Drop the user's history; True if there was one"""
+    
+    @abstractmethod
+    def count_users(self) -> int:
+        """Number of users with a history"""
+    
+    @abstractmethod
+    def count_records(self) -> int:
+        """Number of records across every user"""
+    
+    def purge_expired(self) -> int:
+        return 0
+
+class MemoryHistoryStore(HistoryStore):
+    """Ring buffer per user; appends are O(1) and never copy the history"""
+    
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 sweeper: Optional[ExpirySweeper] = None):
+        super().__init__(max_entries, ttl)
+        self.histories: Dict[str, Deque[HistoryRecord]] = {}
+        self.next_seq: Dict[str, int] = {}
+        self.last_append: Dict[str, float] = {}
+        self.total = 0
+        self.sweeper = sweeper or get_sweeper()
+        self.sweeper.register("history", self._expire)
+    
+    def _expire(self, user_id: str) -> Optional[float]:
+        """Sweeper callback: drop the history of a user idle past the TTL"""
+        last = self.last_append.get(user_id)
+        if last is None:
+            return None
+        if time.time() - last < self.ttl:
+            return last + self.ttl
+        self.clear(user_id)
+        return None
+    
+    def append(self, user_id: str, query: str, text: str, success: bool, wrote: bool = False) -> HistoryRecord:
+        history = self.histories.get(user_id)
+        if history is None:
+            history = self.histories[user_id] = deque(maxlen=self.max_entries)
+        seq = self.next_seq.get(user_id, 0) + 1
+        self.next_seq[user_id] = seq
+        body, compressed = HistoryRecord.pack(text)
+        record = HistoryRecord(seq, time.time(), success, query, body, compressed, wrote)
+        if len(history) < self.max_entries:
+            self.total += 1
+        history.append(record)
+        self.last_append[user_id] = record.timestamp
+        self.sweeper.schedule("history", user_id, record.timestamp + self.ttl)
+        return record
+    
+    def page(self, user_id: str, limit: int, before: Optional[int] = None) -> Tuple[List[HistoryRecord], Optional[int]]:
+        history = self.histories.get(user_id)
+        if not history or limit <= 0:
+            return [], None
+        # Walk back from the newest record; stops after limit matches
+        newest_first = []
+        for record in reversed(history):
+            if before is not None and record.seq >= before:
+                continue
+            newest_first.append(record)
+            if len(newest_first) > limit:
+                break
+        has_more = len(newest_first) > limit
+        records = newest_first[:limit][::-1]
+        return records, (records[0].seq if has_more else None)
+    
+    def clear(self, user_id: str) -> bool:
+        history = self.histories.pop(user_id, None)
+        self.last_append.pop(user_id, None)
+        self.sweeper.cancel("history", user_id)
+        # next_seq is kept so cursors handed out earlier stay valid
+        if history is None:
+            return False
+        self.total -= len(history)
+        return True
+    
+    def count_users(self) -> int:
+        return len(self.histories)
+    
+    def count_records(self) -> int:
+        return self.total
+
+class SQLiteHistoryStore(HistoryStore):
+    """History that survives restarts and is shared by every worker on the host"""
+    
+    def __init__(self, path: str, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "user_id TEXT NOT NULL, seq INTEGER NOT NULL, ts REAL NOT NULL, "
+            "success INTEGER NOT NULL, query TEXT NOT NULL, body BLOB NOT NULL, "
+            "compressed INTEGER NOT NULL, wrote INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (user_id, seq))"
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(history)")]
+        if "wrote" not in columns:
+            # Databases created before the column existed
+            conn.execute("ALTER TABLE history ADD COLUMN wrote INTEGER NOT NULL DEFAULT 0")
+        # Per-user sequence counter and last activity: seq keeps counting after
+        # clear() so old cursors stay valid, and expiry drops whole idle histories
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS history_users ("
+            "user_id TEXT PRIMARY KEY, next_seq INTEGER NOT NULL, last_append REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS history_users_last_append ON history_users (last_append)")
+        # Databases created before the counters existed
+        conn.execute(
+            "INSERT OR IGNORE INTO history_users (user_id, next_seq, last_append) "
+            "SELECT user_id, MAX(seq), MAX(ts) FROM history GROUP BY user_id"
+        )
+        conn.execute("DROP INDEX IF EXISTS history_ts")
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def _record(row) -> HistoryRecord:
+        seq, ts, success, query, body, compressed, wrote = row
+        return HistoryRecord(seq, ts, bool(success), query, bytes(body), bool(compressed), bool(wrote))
+    
+    def append(self, user_id: str, query: str, text: str, success: bool, wrote: bool = False) -> HistoryRecord:
+        body, compressed = HistoryRecord.pack(text)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT next_seq FROM history_users WHERE user_id = ?", (user_id,)).fetchone()
+            seq = (row[0] if row else 0) + 1
+            record = HistoryRecord(seq, time.time(), success, query, body, compressed, wrote)
+            conn.execute(
+                "INSERT OR REPLACE INTO history_users (user_id, next_seq, last_append) VALUES (?, ?, ?)",
+                (user_id, seq, record.timestamp)
+            )
+            conn.execute(
+                "INSERT INTO history (user_id, seq, ts, success, query, body, compressed, wrote) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id, seq, record.timestamp, int(success), query, body, int(compressed), int(wrote))
+            )
+            conn.execute(
+                "DELETE FROM history WHERE user_id = ? AND seq <= ?",
+                (user_id, seq - self.max_entries)
+            )
+            conn.execute("COMMIT")
+            return record
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def page(self, user_id: str, limit: int, before: Optional[int] = None) -> Tuple[List[HistoryRecord], Optional[int]]:
+        if limit <= 0:
+            return [], None
+        rows = self._connect().execute(
+            "SELECT seq, ts, success, query, body, compressed, wrote FROM history "
+            "WHERE user_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (user_id, before if before is not None else 2 ** 62, limit + 1)
+        ).fetchall()
+        has_more = len(rows) > limit
+        records = [self._record(row) for row in rows[:limit]][::-1]
+        return records, (records[0].seq if has_more else None)
+    
+    def clear(self, user_id: str) -> bool:
+        # next_seq is kept so cursors handed out earlier stay valid
+        cursor = self._connect().execute("DELETE FROM history WHERE user_id = ?", (user_id,))
+        return cursor.rowcount > 0
+    
+    def count_users(self) -> int:
+        return self._connect().execute("SELECT COUNT(DISTINCT user_id) FROM history").fetchone()[0]
+    
+    def count_records(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM history").fetchone()[0]
+    
+    def purge_expired(self) -> int:
+        """Drop the histories of users idle past the TTL, as the memory store does"""
+        # Uses the last_append index, so only idle users are visited; their
+        # last_append is then cleared so later purges skip them
+        cutoff = time.time() - self.ttl
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "DELETE FROM history WHERE user_id IN "
+                "(SELECT user_id FROM history_users WHERE last_append < ?)",
+                (cutoff,)
+            )
+            conn.execute("UPDATE history_users SET last_append = NULL WHERE last_append < ?", (cutoff,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount
+
+def create_history_store(url: Optional[str] = None) -> HistoryStore:
+    """Build a history store from a URL: memory:// or sqlite:///path/to/history.db"""
+    url = url or os.getenv("HISTORY_STORE_URL") or os.getenv("STATE_STORE_URL", "memory://")
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryHistoryStore()
+    if parsed.scheme == "sqlite":
+        path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else parsed.path
+        return SQLiteHistoryStore(path or "history.db")
+    raise ValueError(f"Unsupported HISTORY_STORE_URL scheme: {parsed.scheme!r}")
+
+_history_store: Optional[HistoryStore] = None
+
+def get_history_store() -> HistoryStore:
+    """Process-wide history store configured by HISTORY_STORE_URL"""
+    global _history_store
+    if _history_store is None:
+        _history_store = create_history_store()
+    return _history_store
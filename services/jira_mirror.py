@@ -0,0 +1,672 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, List, Tuple, Set
+from services.atlassian_api import AtlassianAPI
+from services.store import KeyValueStore, get_store
+
+# JQL compares dates in minutes and in the syncing user's time zone, so each
+# sync re-reads a day before the cursor; re-mirroring an issue is idempotent
+SYNC_OVERLAP = timedelta(days=1)
+
+# Jira sites put sprints in a custom field; this is its id on most cloud sites
+SPRINT_FIELD = os.getenv("JIRA_SPRINT_FIELD", "customfield_10020")
+# Priority names from highest to lowest, covering both default Jira schemes
+PRIORITY_ORDER = [
+    name.strip() for name in os.getenv(
+        "JIRA_PRIORITY_ORDER", "Highest,Blocker,Critical,High,Major,Medium,Minor,Low,Trivial,Lowest"
+    ).split(",") if name.strip()
+]
+
+ISSUE_COLUMNS = (
+    "key", "project", "project_name", "summary", "status", "status_category",
+    "assignee", "assignee_id", "reporter", "reporter_id", "priority", "issuetype",
+    "resolution", "created", "updated", "resolved", "duedate"
+)
+
+class JQLError(ValueError):
+    """JQL outside the subset the mirror can evaluate"""
+
+def jira_datetime(value: Optional[str]) -> Optional[str]:
+    """Jira timestamp or date as 'YYYY-MM-DD HH:MM:SS' UTC, which sorts as text"""
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z"):
+        try:
+            parsed = datetime.strptime(value, fmt)
+            return parsed.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    return value[:10] + " 00:00:00"
+
+_TOKEN = re.compile(
+    r'\s*(?:(?P<string>"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')'
+    r'|(?P<op>!=|!~|>=|<=|=|>|<|~|\(|\)|,)'
+    r'|(?P<word>[\w.\-+@:/]+(?:\(\s*\))?))'
+)
+_KEYWORDS = {"AND", "OR", "NOT", "IN", "IS", "EMPTY", "NULL", "ORDER", "BY", "ASC", "DESC"}
+_RELATIVE = re.compile(r"^([+-]?\d+)([wdhm])$")
+_FUNCTION = re.compile(r"^\w+\(\s*\)$")
+_UNITS = {"w": "weeks", "d": "days", "h": "hours", "m": "minutes"}
+
+# Single-valued text fields: JQL name -> column(s) matched
+_TEXT_FIELDS = {
+    "project": ("project", "project_name"),
+    "status": ("status",),
+    "statuscategory": ("status_category",),
+    "assignee": ("assignee", "assignee_id"),
+    "reporter": ("reporter", "reporter_id"),
+    "priority": ("priority",),
+    "issuetype": ("issuetype",),
+    "type": ("issuetype",),
+    "resolution": ("resolution",),
+    "key": ("key",),
+    "issuekey": ("key",),
+}
+_DATE_FIELDS = {
+    "created": "created", "createddate": "created",
+    "updated": "updated", "updateddate": "updated",
+    "resolved": "resolved", "resolutiondate": "resolved",
+    "due": "duedate", "duedate": "duedate",
+}
+def _priority_rank() -> str:
+    """SQL expression ranking PRIORITY_ORDER, the highest priority largest"""
+    cases = []
+    for rank, name in enumerate(reversed(PRIORITY_ORDER), 1):
+        quoted = "'" + name.lower().replace("'", "''") + "'"
+        cases.append(f"WHEN {quoted} THEN {rank}")
+    return f"CASE lower(priority) {' '.join(cases)} END"
+
+_SORT_COLUMNS = {
+    **{name: columns[0] for name, columns in _TEXT_FIELDS.items()},
+    **_DATE_FIELDS,
+    "key": "project, key_num", "issuekey": "project, key_num",
+    "summary": "summary",
+    # Jira sorts priorities by rank, not by name; DESC puts the highest first
+    "priority": _priority_rank(),
+}
+_SPRINT_STATES = {"opensprints()": "active", "closedsprints()": "closed", "futuresprints()": "future"}
+
+def _tokenize(jql: str) -> List[Tuple[str, str]]:
+    tokens, pos = [], 0
+    jql = jql.strip()
+    while pos < len(jql):
+        match = _TOKEN.match(jql, pos)
+        if not match or match.end() == pos:
+            raise JQLError(f"Unexpected character at position {pos}: {jql[pos:pos + 10]!r}")
+        pos = match.end()
+        if match.group("string") is not None:
+            raw = match.group("string")[1:-1]
+            tokens.append(("value", re.sub(r"\\(.)", r"\1", raw)))
+        elif match.group("op") is not None:
+            tokens.append(("op", match.group("op")))
+        else:
+            word = match.group("word")
+            if word.upper() in _KEYWORDS:
+                tokens.append(("keyword", word.upper()))
+            else:
+                tokens.append(("word", word))
+    return tokens
+
+def _date_value(value: str, now: Optional[datetime] = None) -> str:
+    """A JQL date value as 'YYYY-MM-DD HH:MM:SS' UTC"""
+    now = now or datetime.now(timezone.utc)
+    lowered = value.lower().replace(" ", "")
+    relative = _RELATIVE.match(lowered)
+    if relative:
+        moment = now + timedelta(**{_UNITS[relative.group(2)]: int(relative.group(1))})
+    elif lowered == "now()":
+        moment = now
+    elif lowered == "startofday()":
+        moment = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif lowered == "startofweek()":
+        day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        # Jira weeks start on Sunday
+        moment = day - timedelta(days=(day.weekday() + 1) % 7)
+    elif lowered == "startofmonth()":
+        moment = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif lowered == "startofyear()":
+        moment = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    else:
+        for fmt in ("%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M", "%Y-%m-%d", "%Y/%m/%d"):
+            try:
+                moment = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            raise JQLError(f"Unsupported date value: {value!r}")
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+class _Parser:
+    """Compiles a JQL subset into a SQL WHERE clause and ORDER BY over the mirror"""
+    
+    def __init__(self, jql: str):
+        self.tokens = _tokenize(jql)
+        self.pos = 0
+        self.params: List[Any] = []
+    
+    def _peek(self, offset: int = 0) -> Tuple[str, str]:
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else ("end", "")
+    
+    def _take(self) -> Tuple[str, str]:
+        token = self._peek()
+        self.pos += 1
+        return token
+    
+    def _accept(self, kind: str, value: Optional[str] = None) -> bool:
+        token = self._peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.pos += 1
+            return True
+        return False
+    
+    def _expect(self, kind: str, value: Optional[str] = None):
+        if not self._accept(kind, value):
+            raise JQLError(f"Expected {value or kind} but found {self._peek()[1] or 'end of query'!r}")
+    
+    def parse(self) -> Tuple[str, str, List[Any]]:
+        where = "1"
+        if self._peek() != ("keyword", "ORDER") and self._peek()[0] != "end":
+            where = self._or()
+        order = ""
+        if self._accept("keyword", "ORDER"):
+            self._expect("keyword", "BY")
+            order = self._order_by()
+        if self._peek()[0] != "end":
+            raise JQLError(f"Unexpected {self._peek()[1]!r}")
+        return where, order, self.params
+    
+    def _or(self) -> str:
+        parts = [self._and()]
+        while self._accept("keyword", "OR"):
+            parts.append(self._and())
+        return parts[0] if len(parts) == 1 else "(" + " OR ".join(parts) + ")"
+    
+    def _and(self) -> str:
+        parts = [self._not()]
+        while self._accept("keyword", "AND"):
+            parts.append(self._not())
+        return parts[0] if len(parts) == 1 else "(" + " AND ".join(parts) + ")"
+    
+    def _not(self) -> str:
+        if self._accept("keyword", "NOT"):
+            return f"NOT {self._not()}"
+        if self._accept("op", "("):
+            inner = self._or()
+            self._expect("op", ")")
+            return inner
+        return self._clause()
+    
+    def _value(self) -> str:
+        kind, value = self._take()
+        if kind not in ("value", "word"):
+            raise JQLError(f"Expected a value but found {value or 'end of query'!r}")
+        return value
+    
+    def _values(self) -> List[str]:
+        kind, value = self._peek()
+        if kind == "word" and _FUNCTION.match(value):
+            # A list function such as openSprints()
+            self.pos += 1
+            return [value]
+        self._expect("op", "(")
+        values = [self._value()]
+        while self._accept("op", ","):
+            values.append(self._value())
+        self._expect("op", ")")
+        return values
+    
+    def _operator(self) -> str:
+        if self._accept("keyword", "IS"):
+            negated = self._accept("keyword", "NOT")
+            if not (self._accept("keyword", "EMPTY") or self._accept("keyword", "NULL")):
+                raise JQLError("Expected EMPTY after IS")
+            return "IS NOT EMPTY" if negated else "IS EMPTY"
+        if self._accept("keyword", "NOT"):
+            self._expect("keyword", "IN")
+            return "NOT IN"
+        if self._accept("keyword", "IN"):
+            return "IN"
+        kind, value = self._take()
+        if kind != "op" or value in ("(", ")", ","):
+            raise JQLError(f"Expected an operator but found {value or 'end of query'!r}")
+        return value
+    
+    def _clause(self) -> str:
+        kind, field = self._take()
+        if kind not in ("word", "value"):
+            raise JQLError(f"Expected a field but found {field or 'end of query'!r}")
+        name = field.lower()
+        op = self._operator()
+        if op in ("IN", "NOT IN"):
+            values = self._values()
+        elif op in ("IS EMPTY", "IS NOT EMPTY"):
+            values = []
+        else:
+            values = [self._value()]
+        
+        if name in _TEXT_FIELDS:
+            return self._text_clause(_TEXT_FIELDS[name], op, values)
+        if name in _DATE_FIELDS:
+            return self._date_clause(_DATE_FIELDS[name], op, values)
+        if name in ("labels", "label"):
+            return self._multi_clause("issue_labels", ("label",), op, values)
+        if name == "sprint":
+            return self._sprint_clause(op, values)
+        if name in ("summary", "text"):
+            if op not in ("~", "!~"):
+                raise JQLError(f"{field} supports only ~ and !~")
+            # % and _ in the text are literal, not LIKE wildcards
+            escaped = re.sub(r"([\\%_])", r"\\\1", values[0])
+            self.params.append(f"%{escaped}%")
+            return f"issues.summary {'NOT ' if op == '!~' else ''}LIKE ? ESCAPE '\\'"
+        raise JQLError(f"Field {field!r} is not mirrored")
+    
+    def _match(self, columns: Tuple[str, ...], values: List[str]) -> str:
+        """Any column equals any value, ignoring case"""
+        marks = ", ".join("?" * len(values))
+        tests = []
+        for column in columns:
+            tests.append(f"{column} COLLATE NOCASE IN ({marks})")
+            self.params.extend(values)
+        return tests[0] if len(tests) == 1 else "(" + " OR ".join(tests) + ")"
+    
+    def _text_clause(self, columns: Tuple[str, ...], op: str, values: List[str]) -> str:
+        columns = tuple(f"issues.{column}" for column in columns)
+        for value in values:
+            if _FUNCTION.match(value):
+                # currentUser() and friends depend on who asks; the mirror is shared
+                raise JQLError(f"{value} is not supported by the local mirror")
+        if op == "IS EMPTY":
+            return f"{columns[0]} IS NULL"
+        if op == "IS NOT EMPTY":
+            return f"{columns[0]} IS NOT NULL"
+        if op in ("=", "IN"):
+            return self._match(columns, values)
+        if op in ("!=", "NOT IN"):
+            # Like Jira, != never matches issues where the field is empty
+            return f"({columns[0]} IS NOT NULL AND NOT {self._match(columns, values)})"
+        raise JQLError(f"Operator {op} is not supported for this field")
+    
+    def _date_clause(self, column: str, op: str, values: List[str]) -> str:
+        column = f"issues.{column}"
+        if op == "IS EMPTY":
+            return f"{column} IS NULL"
+        if op == "IS NOT EMPTY":
+            return f"{column} IS NOT NULL"
+        if op not in ("=", "!=", ">", ">=", "<", "<="):
+            raise JQLError(f"Operator {op} is not supported for dates")
+        self.params.append(_date_value(values[0]))
+        return f"{column} {op} ?"
+    
+    def _multi_clause(self, table: str, columns: Tuple[str, ...], op: str, values: List[str]) -> str:
+        """Fields holding several values per issue, kept in their own table"""
+        if op == "IS EMPTY":
+            return f"NOT EXISTS (SELECT 1 FROM {table} m WHERE m.key = issues.key)"
+        if op == "IS NOT EMPTY":
+            return f"EXISTS (SELECT 1 FROM {table} m WHERE m.key = issues.key)"
+        if op not in ("=", "IN", "!=", "NOT IN"):
+            raise JQLError(f"Operator {op} is not supported for this field")
+        match = self._match(tuple(f"m.{column}" for column in columns), values)
+        exists = f"EXISTS (SELECT 1 FROM {table} m WHERE m.key = issues.key AND {match})"
+        return exists if op in ("=", "IN") else f"NOT {exists}"
+    
+    def _sprint_clause(self, op: str, values: List[str]) -> str:
+        states = [_SPRINT_STATES.get(value.lower().replace(" ", "")) for value in values]
+        if states and all(states):
+            self.params.extend(states)
+            marks = ", ".join("?" * len(states))
+            exists = f"EXISTS (SELECT 1 FROM issue_sprints m WHERE m.key = issues.key AND m.state IN ({marks}))"
+            if op in ("=", "IN"):
+                return exists
+            if op in ("!=", "NOT IN"):
+                return f"NOT {exists}"
+            raise JQLError(f"Operator {op} is not supported for sprints")
+        return self._multi_clause("issue_sprints", ("name", "sprint_id"), op, values)
+    
+    def _order_by(self) -> str:
+        terms = []
+        while True:
+            kind, field = self._take()
+            column = _SORT_COLUMNS.get(field.lower()) if kind in ("word", "value") else None
+            if column is None:
+                raise JQLError(f"Cannot order by {field!r}")
+            direction = "ASC"
+            if self._accept("keyword", "DESC"):
+                direction = "DESC"
+            else:
+                self._accept("keyword", "ASC")
+            terms.extend(f"{part} {direction}" for part in column.split(", "))
+            if not self._accept("op", ","):
+                return ", ".join(terms)
+
+def compile_jql(jql: str) -> Tuple[str, str, List[Any]]:
+    """SQL WHERE clause, ORDER BY terms and parameters for a JQL query"""
+    return _Parser(jql).parse()
+
+# group_by name -> (FROM/JOIN clause, grouped column)
+_GROUPS = {
+    **{name: ("issues", f"issues.{columns[0]}") for name, columns in _TEXT_FIELDS.items() if name not in ("key", "issuekey")},
+    "labels": ("issues JOIN issue_labels m ON m.key = issues.key", "m.label"),
+    "sprint": ("issues JOIN issue_sprints m ON m.key = issues.key", "m.name"),
+}
+
+class JiraMirror:
+    """Local SQLite copy of Jira issues, queried with a JQL subset"""
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("JIRA_MIRROR_PATH", "jira_mirror.db")
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS issues ("
+            "key TEXT PRIMARY KEY, key_num INTEGER, project TEXT NOT NULL, project_name TEXT, "
+            "summary TEXT, status TEXT, status_category TEXT, assignee TEXT, assignee_id TEXT, "
+            "reporter TEXT, reporter_id TEXT, priority TEXT, issuetype TEXT, resolution TEXT, "
+            "created TEXT, updated TEXT, resolved TEXT, duedate TEXT)"
+        )
+        for column in ("project", "status", "assignee", "updated", "created"):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS issues_{column} ON issues ({column} COLLATE NOCASE)")
+        conn.execute("CREATE TABLE IF NOT EXISTS issue_labels (key TEXT NOT NULL, label TEXT NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS issue_labels_key ON issue_labels (key)")
+        conn.execute("CREATE INDEX IF NOT EXISTS issue_labels_label ON issue_labels (label COLLATE NOCASE)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS issue_sprints ("
+            "key TEXT NOT NULL, sprint_id TEXT, name TEXT, state TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS issue_sprints_key ON issue_sprints (key)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_state ("
+            "project TEXT PRIMARY KEY, cursor TEXT, synced_at REAL)"
+        )
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def row_from_issue(issue: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten a Jira REST issue into the mirror's columns"""
+        fields = issue.get("fields", {})
+        
+        def name(field: str, attr: str = "name") -> Optional[str]:
+            value = fields.get(field)
+            return value.get(attr) if isinstance(value, dict) else None
+        
+        key = issue["key"]
+        project_key, _, number = key.rpartition("-")
+        sprints = [
+            {"sprint_id": str(sprint.get("id")), "name": sprint.get("name"), "state": sprint.get("state")}
+            for sprint in (fields.get(SPRINT_FIELD) or []) if isinstance(sprint, dict)
+        ]
+        return {
+            "key": key,
+            "key_num": int(number) if number.isdigit() else 0,
+            "project": name("project", "key") or project_key,
+            "project_name": name("project"),
+            "summary": fields.get("summary"),
+            "status": name("status"),
+            "status_category": (fields.get("status") or {}).get("statusCategory", {}).get("name"),
+            "assignee": name("assignee", "displayName"),
+            "assignee_id": name("assignee", "accountId"),
+            "reporter": name("reporter", "displayName"),
+            "reporter_id": name("reporter", "accountId"),
+            "priority": name("priority"),
+            "issuetype": name("issuetype"),
+            "resolution": name("resolution"),
+            "created": jira_datetime(fields.get("created")),
+            "updated": jira_datetime(fields.get("updated")),
+            "resolved": jira_datetime(fields.get("resolutiondate")),
+            "duedate": jira_datetime(fields.get("duedate")),
+            "labels": list(fields.get("labels") or []),
+            "sprints": sprints,
+        }
+    
+    def upsert(self, rows: List[Dict[str, Any]]):
+        """Add or replace issues flattened by row_from_issue"""
+        columns = ("key_num",) + ISSUE_COLUMNS
+        insert = f"INSERT OR REPLACE INTO issues ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in rows:
+                conn.execute(insert, tuple(row.get(column) for column in columns))
+                conn.execute("DELETE FROM issue_labels WHERE key = ?", (row["key"],))
+                conn.executemany(
+                    "INSERT INTO issue_labels (key, label) VALUES (?, ?)",
+                    [(row["key"], label) for label in row["labels"]]
+                )
+                conn.execute("DELETE FROM issue_sprints WHERE key = ?", (row["key"],))
+                conn.executemany(
+                    "INSERT INTO issue_sprints (key, sprint_id, name, state) VALUES (?, ?, ?, ?)",
+                    [(row["key"], s["sprint_id"], s["name"], s["state"]) for s in row["sprints"]]
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def remove_missing(self, project: str, keep: Set[str]) -> int:
+        """Drop the project's issues whose keys a full sync didn't see; returns how many"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            gone = [
+                (key,) for (key,) in conn.execute("SELECT key FROM issues WHERE project = ?", (project,))
+                if key not in keep
+            ]
+            for table in ("issue_labels", "issue_sprints", "issues"):
+                conn.executemany(f"DELETE FROM {table} WHERE key = ?", gone)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(gone)
+    
+    def search(self, jql: str, limit: int = 50) -> Dict[str, Any]:
+        """Issues matching the JQL, plus the total number of matches"""
+        where, order, params = compile_jql(jql)
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM issues WHERE {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {', '.join(ISSUE_COLUMNS)} FROM issues WHERE {where} "
+            f"ORDER BY {order or 'updated DESC'} LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        issues = [dict(zip(ISSUE_COLUMNS, row)) for row in rows]
+        if issues:
+            by_key = {issue["key"]: issue for issue in issues}
+            for issue in issues:
+                issue["labels"], issue["sprints"] = [], []
+            marks = ", ".join("?" * len(by_key))
+            for key, label in conn.execute(f"SELECT key, label FROM issue_labels WHERE key IN ({marks})", list(by_key)):
+                by_key[key]["labels"].append(label)
+            for key, sprint in conn.execute(f"SELECT key, name FROM issue_sprints WHERE key IN ({marks})", list(by_key)):
+                by_key[key]["sprints"].append(sprint)
+        return {"total": total, "issues": issues}
+    
+    def count(self, jql: str, group_by: Optional[str] = None) -> Dict[str, Any]:
+        """Number of matching issues, optionally per value of a field"""
+        where, _, params = compile_jql(jql)
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM issues WHERE {where}", params).fetchone()[0]
+        if not group_by:
+            return {"total": total}
+        group = _GROUPS.get(group_by.lower())
+        if group is None:
+            raise JQLError(f"Cannot group by {group_by!r}; use one of {', '.join(sorted(_GROUPS))}")
+        source, column = group
+        rows = conn.execute(
+            f"SELECT {column}, COUNT(DISTINCT issues.key) AS n FROM {source} WHERE {where} "
+            f"GROUP BY {column} ORDER BY n DESC",
+            params
+        ).fetchall()
+        return {"total": total, "group_by": group_by, "groups": {value or "(none)": n for value, n in rows}}
+    
+    def get_cursor(self, project: str) -> Optional[str]:
+        row = self._connect().execute("SELECT cursor FROM sync_state WHERE project = ?", (project,)).fetchone()
+        return row[0] if row else None
+    
+    def set_cursor(self, project: str, cursor: Optional[str]):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO sync_state (project, cursor, synced_at) VALUES (?, ?, ?)",
+            (project, cursor, time.time())
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        projects = {
+            row[0]: {"issues": row[1]}
+            for row in conn.execute("SELECT project, COUNT(*) FROM issues GROUP BY project")
+        }
+        for project, cursor, synced_at in conn.execute("SELECT project, cursor, synced_at FROM sync_state"):
+            projects.setdefault(project, {"issues": 0}).update({
+                "cursor": cursor,
+                "synced_at": datetime.fromtimestamp(synced_at).isoformat() if synced_at else None
+            })
+        return {"issues": sum(p["issues"] for p in projects.values()), "projects": projects}
+
+class JiraSync:
+    """Keeps the mirror up to date with the configured projects.
+    
+    Uses the OAuth token of the SYNC_USER_ID service account; only give it
+    projects every team member may browse, since anyone signed in can query
+    the mirror. Incremental syncs can't see deletions, so a full sync every
+    JIRA_FULL_SYNC_INTERVAL seconds drops issues that are gone upstream.
+    """
+    
+    def __init__(self, mirror: JiraMirror, api: AtlassianAPI, oauth_service, projects: Optional[List[str]] = None,
+                 store: Optional[KeyValueStore] = None):
+        self.mirror = mirror
+        self.api = api
+        self.oauth_service = oauth_service
+        self.store = store or get_store()
+        configured = os.getenv("JIRA_SYNC_PROJECTS", "")
+        self.projects = projects if projects is not None else [p.strip() for p in configured.split(",") if p.strip()]
+        self.interval = float(os.getenv("JIRA_SYNC_INTERVAL", "600"))
+        self.full_interval = float(os.getenv("JIRA_FULL_SYNC_INTERVAL", "86400"))
+        self.page_size = 100
+        self.fields = ",".join([
+            "summary", "status", "assignee", "reporter", "priority", "issuetype", "resolution",
+            "created", "updated", "resolutiondate", "duedate", "labels", "project", SPRINT_FIELD
+        ])
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._manual: set = set()
+        self.last_error: Optional[str] = None
+    
+    async def sync_project(self, project: str, access_token: str, full: bool = False) -> int:
+        """Mirror issues updated since the project's cursor; returns how many.
+        
+        A full sync re-reads every issue and then removes the ones it didn't see.
+        """
+        cursor = None if full else self.mirror.get_cursor(project)
+        seen: Set[str] = set()
+        jql = f'project = "{project}"'
+        if cursor:
+            since = datetime.strptime(cursor, "%Y-%m-%d %H:%M:%S") - SYNC_OVERLAP
+            jql += f' AND updated >= "{since.strftime("%Y-%m-%d %H:%M")}"'
+        jql += " ORDER BY updated ASC"
+        
+        url = self.api.jira_url("/rest/api/3/search/jql")
+        page_token, synced, newest = None, 0, cursor
+        while True:
+            params = {"jql": jql, "fields": self.fields, "maxResults": self.page_size}
+            if page_token:
+                params["nextPageToken"] = page_token
+            data = await self.api.get_json(url, access_token, params)
+            rows = [JiraMirror.row_from_issue(issue) for issue in data.get("issues", [])]
+            if rows:
+                await asyncio.to_thread(self.mirror.upsert, rows)
+                synced += len(rows)
+                seen.update(row["key"] for row in rows)
+                updated = [row["updated"] for row in rows if row["updated"]]
+                if updated:
+                    newest = max([newest or ""] + updated)
+            page_token = data.get("nextPageToken")
+            if data.get("isLast", True) or not page_token or not rows:
+                break
+        if full:
+            removed = await asyncio.to_thread(self.mirror.remove_missing, project, seen)
+            if removed:
+                print(f"Removed {removed} issues no longer in Jira project {project}")
+        self.mirror.set_cursor(project, newest)
+        return synced
+    
+    async def sync(self, full: bool = False) -> Dict[str, int]:
+        """Sync every configured project with the service account's token"""
+        async with self._lock:
+            token = await self.oauth_service.get_sync_token()
+            if token is None:
+                self.last_error = "SYNC_USER_ID is not set or has no valid token"
+                return {}
+            access_token = token["access_token"]
+            synced = {}
+            for project in self.projects:
+                try:
+                    synced[project] = await self.sync_project(project, access_token, full)
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = f"{project}: {e}"
+                    print(f"Jira sync of {project} failed: {e}")
+            return synced
+    
+    def sync_soon(self, full: bool = False):
+        """Start a sync without waiting for it"""
+        task = asyncio.create_task(self.sync(full))
+        # The loop only keeps weak references to tasks
+        self._manual.add(task)
+        task.add_done_callback(self._manual.discard)
+    
+    async def _sync_forever(self):
+        while True:
+            # Every server worker runs this loop; the lease lets one of them sync per interval
+            if self.store.add("jira-sync", os.getpid(), ttl=self.interval):
+                # ...and a second lease makes one sync per full interval a full one
+                full = self.store.add("jira-full-sync", os.getpid(), ttl=self.full_interval)
+                try:
+                    await self.sync(full=full)
+                except Exception as e:
+                    print(f"Background Jira sync failed: {e}")
+            await asyncio.sleep(self.interval)
+    
+    def start(self):
+        """Sync in the background every JIRA_SYNC_INTERVAL seconds"""
+        if self.projects and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._sync_forever())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "configured_projects": self.projects,
+            "interval": self.interval,
+            "last_error": self.last_error,
+            **self.mirror.get_stats()
+        }
+
+_mirror: Optional[JiraMirror] = None
+
+def get_jira_mirror() -> JiraMirror:
+    global _mirror
+    if _mirror is None:
+        _mirror = JiraMirror()
+    return _mirror
@@ -0,0 +1,354 @@
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Deque
+from services.scheduler import SchedulerOverloaded
+from services.store import KeyValueStore, get_store
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+class Job:
+    """A query submitted for background execution"""
+    
+    def __init__(self, user_id: str, query: str, access_token: str):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.query = query
+        self.access_token = access_token
+        self.status = QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        # Monotonic deadline after which a finished job is forgotten
+        self.expires_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+    
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "Job":
+        """A job as another worker saved it to the shared store"""
+        job = cls(record["user_id"], record["query"], "")
+        job.job_id = record["job_id"]
+        job.status = record["status"]
+        job.result = record.get("result")
+        for field in ("created_at", "started_at", "finished_at"):
+            if record.get(field):
+                setattr(job, field, datetime.fromisoformat(record[field]))
+        return job
+    
+    def to_record(self) -> Dict[str, Any]:
+        return {**self.to_dict(), "user_id": self.user_id, "result": self.result}
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "query": self.query,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+class JobService:
+    """Runs queries on a bounded pool of background workers.
+    
+    A job runs in the server worker that accepted it, but its status and
+    result are saved to the shared store, so any worker can report or cancel
+    it. A worker picks up cancellations made elsewhere within JOB_CANCEL_POLL
+    seconds.
+    
+    Queued jobs wait per user and workers take them round-robin, skipping
+    users already running as many jobs as the crew scheduler lets them, so
+    one user's backlog can't hold every worker.
+    """
+    
+    def __init__(self, crew_service, workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, result_ttl: Optional[float] = None,
+                 store: Optional[KeyValueStore] = None, max_pending_per_user: Optional[int] = None):
+        self.crew_service = crew_service
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "8"))
+        self.max_pending = max_pending or int(os.getenv("JOB_MAX_PENDING", "100"))
+        self.max_pending_per_user = max_pending_per_user or int(os.getenv("JOB_MAX_PENDING_PER_USER", "10"))
+        # Jobs a user may run at once; more would only wait for a crew slot
+        self.per_user_limit = crew_service.scheduler.per_user_limit
+        self.result_ttl = result_ttl or float(os.getenv("JOB_RESULT_TTL", "3600"))
+        self.cancel_poll = float(os.getenv("JOB_CANCEL_POLL", "2"))
+        self.store = store or get_store()
+        # Jobs accepted by this worker
+        self.jobs: Dict[str, Job] = {}
+        # user_id -> queued jobs; dict order is the round-robin order
+        self._queues: "OrderedDict[str, Deque[Job]]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._changed: Optional[asyncio.Condition] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self.accepting = True
+    
+    def _condition(self) -> asyncio.Condition:
+        # Created lazily so the service can be constructed outside a running loop
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+    
+    def _ensure_workers(self):
+        if not self._worker_tasks:
+            self._worker_tasks = [
+                asyncio.create_task(self._worker()) for _ in range(self.workers)
+            ]
+    
+    def _take(self) -> Optional[Job]:
+        """Next queued job of the next user below their running limit"""
+        for _ in range(len(self._queues)):
+            user_id, jobs = next(iter(self._queues.items()))
+            self._queues.move_to_end(user_id)
+            if self._running.get(user_id, 0) >= self.per_user_limit:
+                continue
+            job = jobs.popleft()
+            if not jobs:
+                del self._queues[user_id]
+            self._running[user_id] = self._running.get(user_id, 0) + 1
+            return job
+        return None
+    
+    async def _worker(self):
+        changed = self._condition()
+        while True:
+            async with changed:
+                job = self._take()
+                while job is None:
+                    await changed.wait()
+                    job = self._take()
+            try:
+                if job.status != QUEUED or self._cancelled_elsewhere(job):
+                    continue
+                job.task = asyncio.create_task(self._execute(job))
+                watcher = asyncio.create_task(self._watch(job))
+                try:
+                    await job.task
+                except asyncio.CancelledError:
+                    if job.status != CANCELLED:
+                        raise
+                finally:
+                    watcher.cancel()
+            finally:
+                remaining = self._running.get(job.user_id, 1) - 1
+                if remaining:
+                    self._running[job.user_id] = remaining
+                else:
+                    self._running.pop(job.user_id, None)
+                async with changed:
+                    changed.notify_all()
+    
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"job:{job_id}"
+    
+    def _save(self, job: Job):
+        record = job.to_record()
+        
+        def apply(saved: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            # A cancel from another worker wins over a run that finished anyway
+            if saved is not None and saved["status"] == CANCELLED and job.status != CANCELLED:
+                return saved
+            return record
+        
+        self.store.update(self._key(job.job_id), apply, ttl=self.result_ttl)
+    
+    def _cancelled_elsewhere(self, job: Job) -> bool:
+        """Apply a cancel that another worker saved for this worker's job"""
+        saved = self.store.get(self._key(job.job_id))
+        if saved is None or saved["status"] != CANCELLED:
+            return False
+        self.cancel(job.user_id, job.job_id)
+        return True
+    
+    async def _watch(self, job: Job):
+        while job.status not in FINISHED_STATES:
+            await asyncio.sleep(self.cancel_poll)
+            if self._cancelled_elsewhere(job):
+                return
+    
+    async def _execute(self, job: Job):
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        self._save(job)
+        try:
+            result = await self.crew_service.execute_query(
+                user_id=job.user_id,
+                query=job.query,
+                access_token=job.access_token
+            )
+        except SchedulerOverloaded as e:
+            result = {
+                "success": False,
+                "error": str(e),
+                "query": job.query,
+                "timestamp": datetime.now().isoformat()
+            }
+        except asyncio.CancelledError:
+            self._finish(job, CANCELLED, None)
+            raise
+        except Exception as e:
+            result = {
+                "success": False,
+                "error": f"Query execution failed: {str(e)}",
+                "query": job.query,
+                "timestamp": datetime.now().isoformat()
+            }
+        self._finish(job, SUCCEEDED if result.get("success") else FAILED, result)
+    
+    def _finish(self, job: Job, status: str, result: Optional[Dict[str, Any]]):
+        job.status = status
+        job.result = result
+        job.finished_at = datetime.now()
+        job.expires_at = time.monotonic() + self.result_ttl
+        # The token is only needed while the job runs
+        job.access_token = ""
+        self._save(job)
+    
+    def purge_expired(self) -> int:
+        """Forget finished jobs whose results have outlived the TTL"""
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.expires_at is not None and job.expires_at <= now
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+        return len(expired)
+    
+    def pending_count(self, user_id: Optional[str] = None) -> int:
+        return sum(
+            1 for job in self.jobs.values()
+            if job.status in (QUEUED, RUNNING) and (user_id is None or job.user_id == user_id)
+        )
+    
+    async def submit(self, user_id: str, query: str, access_token: str) -> Job:
+        """Queue a query and return its job immediately"""
+        if not self.accepting:
+            raise SchedulerOverloaded("Server is shutting down", retry_after=30)
+        self._ensure_workers()
+        self.purge_expired()
+        pending = self.pending_count()
+        if pending >= self.max_pending:
+            raise SchedulerOverloaded(
+                f"Server busy: {pending} jobs already pending",
+                retry_after=30
+            )
+        pending = self.pending_count(user_id)
+        if pending >= self.max_pending_per_user:
+            raise SchedulerOverloaded(
+                f"You already have {pending} jobs pending",
+                retry_after=30
+            )
+        job = Job(user_id, query, access_token)
+        self.jobs[job.job_id] = job
+        self._save(job)
+        self.store.update(
+            f"jobs:{user_id}", lambda ids: [job.job_id] + (ids or []), ttl=self.result_ttl
+        )
+        self._queues.setdefault(user_id, deque()).append(job)
+        async with self._condition():
+            self._condition().notify()
+        return job
+    
+    def get_job(self, user_id: str, job_id: str) -> Optional[Job]:
+        """Look up one of the user's jobs, whichever worker accepted it"""
+        job = self.jobs.get(job_id)
+        if job is not None and job.expires_at is not None and job.expires_at <= time.monotonic():
+            del self.jobs[job_id]
+            job = None
+        if job is None:
+            saved = self.store.get(self._key(job_id))
+            job = Job.from_record(saved) if saved is not None else None
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+    
+    def list_jobs(self, user_id: str) -> List[Job]:
+        """List the user's known jobs, newest first"""
+        self.purge_expired()
+        ids = self.store.get(f"jobs:{user_id}") or []
+        jobs = []
+        for job_id in ids:
+            job = self.get_job(user_id, job_id)
+            if job is not None:
+                jobs.append(job)
+        if len(jobs) < len(ids):
+            # Drop the ids of jobs whose records have expired
+            live = {job.job_id for job in jobs}
+            self.store.update(
+                f"jobs:{user_id}", lambda ids: [i for i in ids or [] if i in live] or None, ttl=self.result_ttl
+            )
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+    
+    def cancel(self, user_id: str, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job"""
+        job = self.get_job(user_id, job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        if job_id not in self.jobs:
+            # Another worker runs it; it notices the saved status and stops
+            def apply(saved: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+                if saved is None or saved["status"] in FINISHED_STATES:
+                    return saved
+                return {**saved, "status": CANCELLED, "finished_at": datetime.now().isoformat()}
+            
+            saved = self.store.update(self._key(job_id), apply, ttl=self.result_ttl)
+            return Job.from_record(saved) if saved is not None else None
+        if job.status == QUEUED:
+            queued = self._queues.get(user_id)
+            if queued and job in queued:
+                queued.remove(job)
+                if not queued:
+                    del self._queues[user_id]
+            self._finish(job, CANCELLED, None)
+        elif job.task is not None:
+            # The crew thread can't be interrupted; its result is discarded
+            job.status = CANCELLED
+            self._save(job)
+            job.task.cancel()
+        return job
+    
+    async def shutdown(self, drain_timeout: float = 0):
+        """Stop the workers, giving outstanding jobs drain_timeout seconds to finish"""
+        self.accepting = False
+        if drain_timeout and self.pending_count():
+            changed = self._condition()
+            
+            async def drained():
+                async with changed:
+                    await changed.wait_for(lambda: not self._queues and not self._running)
+            
+            try:
+                await asyncio.wait_for(drained(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                print(f"Jobs still pending after {drain_timeout:.0f}s; cancelling them")
+        for job in self.jobs.values():
+            if job.status in (QUEUED, RUNNING):
+                self.cancel(job.user_id, job.job_id)
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get job statistics"""
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "max_pending_per_user": self.max_pending_per_user,
+            "queued_users": len(self._queues),
+            "jobs": counts,
+        }
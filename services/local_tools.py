@@ -0,0 +1,60 @@
+import json
+from typing import Any, List, Optional, Type
+from pydantic import BaseModel, Field
+from crewai.tools import BaseTool
+from services.confluence_index import ConfluenceIndex
+from services.jira_mirror import JiraMirror, JQLError
+
+class LocalConfluenceSearchInput(BaseModel):
+    query: str = Field(..., description="Words to search page titles and bodies for")
+    space: Optional[str] = Field(None, description="Confluence space key to restrict the search to")
+    limit: int = Field(5, description="Maximum number of pages to return")
+
+class LocalConfluenceSearchTool(BaseTool):
+    name: str = "searchLocalConfluenceIndex"
+    description: str = (
+        "Full-text search over a local copy of the synced Confluence spaces. "
+        "Answers in milliseconds; try it first for questions like 'find the runbook for X', "
+        "then fetch a page with the Confluence tools if you need its full content."
+    )
+    args_schema: Type[BaseModel] = LocalConfluenceSearchInput
+    index: Any = None
+    
+    def _run(self, query: str, space: Optional[str] = None, limit: int = 5) -> str:
+        results = self.index.search(query, space=space, limit=max(1, min(limit, 20)))
+        if not results:
+            return "No matching pages in the local Confluence index."
+        return json.dumps(results)
+
+class LocalJiraQueryInput(BaseModel):
+    jql: str = Field(..., description="JQL using project, status, statusCategory, assignee, reporter, priority, "
+                                      "issuetype, labels, sprint, summary ~, created/updated/resolved/due dates and ORDER BY")
+    group_by: Optional[str] = Field(None, description="Count issues per status, assignee, priority, issuetype, labels or sprint instead of listing them")
+    limit: int = Field(20, description="Maximum number of issues to list")
+
+class LocalJiraQueryTool(BaseTool):
+    name: str = "queryLocalJiraMirror"
+    description: str = (
+        "Runs JQL against a local mirror of the synced Jira projects and returns matching issues "
+        "or counts grouped by a field. Answers in milliseconds over thousands of issues; use it for "
+        "listings, counts and reports instead of paging through Jira search results."
+    )
+    args_schema: Type[BaseModel] = LocalJiraQueryInput
+    mirror: Any = None
+    
+    def _run(self, jql: str, group_by: Optional[str] = None, limit: int = 20) -> str:
+        try:
+            if group_by:
+                return json.dumps(self.mirror.count(jql, group_by))
+            return json.dumps(self.mirror.search(jql, limit=max(1, min(limit, 100))))
+        except JQLError as e:
+            return f"The local mirror can't evaluate this JQL ({e}); use the Jira search tool instead."
+
+def build_local_tools(index: Optional[ConfluenceIndex], mirror: Optional[JiraMirror] = None) -> List[BaseTool]:
+    """Agent tools backed by local indexes; none if nothing is synced"""
+    tools: List[BaseTool] = []
+    if index is not None:
+        tools.append(LocalConfluenceSearchTool(index=index))
+    if mirror is not None:
+        tools.append(LocalJiraQueryTool(mirror=mirror))
+    return tools
@@ -0,0 +1,384 @@
+import os
+import time
+import asyncio
+import shlex
+import hashlib
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, Tuple, Callable
+from services.events import instrument_tools, stage
+from services.metrics import MCP_ACQUIRE_SECONDS, MCP_SPAWN_SECONDS
+from services.sweeper import ExpirySweeper, get_sweeper
+from services.tool_catalog import catalog_version
+from services.tool_cache import ToolCallCache, cache_tools
+
+if TYPE_CHECKING:
+    from crewai_tools.adapters.mcp_adapter import MCPServerAdapter
+    from mcp import StdioServerParameters
+
+# npm package spec for mcp-remote; pin a version (mcp-remote@x.y.z) to skip
+# the registry lookup npx -y does on every spawn
+MCP_REMOTE_PACKAGE = os.getenv("MCP_REMOTE_PACKAGE", "mcp-remote")
+
+class MCPPoolExhausted(Exception):
+    """Raised when every pooled MCP session is busy and none frees up in time"""
+
+def token_fingerprint(access_token: str) -> str:
+    """Short, non-reversible identifier for an access token"""
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:16]
+
+def build_server_params(access_token: str) -> "StdioServerParameters":
+    """Build the mcp-remote launch parameters for a user's token"""
+    # mcp is imported on first spawn so the web tier can start without it
+    from mcp import StdioServerParameters
+    command = os.getenv("MCP_SERVER_COMMAND")
+    if command:
+        # Local stand-in such as benchmarks/fake_mcp_server.py; it reads the
+        # token from the environment like the real server's headers
+        command, *args = shlex.split(command)
+        return StdioServerParameters(
+            command=command,
+            args=args,
+            env={"ATLASSIAN_ACCESS_TOKEN": access_token, **os.environ},
+            timeout_seconds=120
+        )
+    return StdioServerParameters(
+        command="npx.cmd",
+        args=[
+            "-y", MCP_REMOTE_PACKAGE,
+            "https://mcp.atlassian.com/v1/sse",
+            "-v",
+            "--header", f"Authorization=Bearer {access_token}"
+        ],
+        env={
+            "UV_PYTHON": "3.12",
+            "ATLASSIAN_ACCESS_TOKEN": access_token,
+            **os.environ
+        },
+        timeout_seconds=120
+    )
+
+def mcp_remote_prefetch_args() -> Optional[List[str]]:
+    """Command that installs mcp-remote into the npx cache without starting it.
+    
+    npx caches per package spec, so later "npx -y mcp-remote" spawns start
+    from the cache. None when MCP_SERVER_COMMAND replaces mcp-remote.
+    """
+    if os.getenv("MCP_SERVER_COMMAND"):
+        return None
+    return ["npx.cmd", "-y", "--package", MCP_REMOTE_PACKAGE, "--", "node", "--version"]
+
+class PooledSession:
+    """A running mcp-remote subprocess and the tools it exposes"""
+    
+    def __init__(
+        self,
+        user_id: str,
+        fingerprint: str,
+        adapter: "MCPServerAdapter",
+        tools: List[Any],
+        tool_cache: Optional[ToolCallCache] = None
+    ):
+        self.user_id = user_id
+        self.fingerprint = fingerprint
+        self.adapter = adapter
+        self.tools = tools
+        self.tool_cache = tool_cache
+        # Lets cached answers tell when the user's tools have changed
+        self.catalog_version = catalog_version(getattr(tool, "name", "") for tool in tools)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.in_use = 0
+        self.retired = False
+    
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.user_id, self.fingerprint)
+    
+    def is_healthy(self, max_age: float) -> bool:
+        """Check the session is still usable"""
+        if self.retired or not self.tools:
+            return False
+        if max_age and time.monotonic() - self.created_at > max_age:
+            return False
+        # mcpadapt drives the MCP client from a background thread; if it has
+        # died the subprocess pipe is gone and every tool call would fail.
+        runner = getattr(getattr(self.adapter, "_adapter", None), "thread", None)
+        if runner is not None and hasattr(runner, "is_alive"):
+            return runner.is_alive()
+        return True
+
+class MCPSessionPool:
+    """Pool of MCP sessions keyed by user and token fingerprint"""
+    
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        max_age: Optional[float] = None,
+        acquire_timeout: Optional[float] = None,
+        sweeper: Optional[ExpirySweeper] = None,
+    ):
+        self.max_size = max_size or int(os.getenv("MCP_POOL_MAX_SIZE", "20"))
+        self.idle_timeout = idle_timeout or float(os.getenv("MCP_POOL_IDLE_TIMEOUT", "600"))
+        self.max_age = max_age if max_age is not None else float(os.getenv("MCP_POOL_MAX_AGE", "3600"))
+        self.acquire_timeout = acquire_timeout or float(os.getenv("MCP_POOL_ACQUIRE_TIMEOUT", "30"))
+        self.sessions: Dict[Tuple[str, str], PooledSession] = {}
+        self._spawning: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._changed: Optional[asyncio.Condition] = None
+        self._tasks: set = set()
+        self._closed = False
+        # Idle sessions are closed by the shared expiry sweeper
+        self.sweeper = sweeper or get_sweeper()
+        self.sweeper.register("mcp", self._expire)
+        # Callbacks run when a session is closed, for state tied to its lifetime
+        self.on_close: List[Callable[[PooledSession], None]] = []
+        self.spawned = 0
+        self.reused = 0
+        self.evicted = 0
+    
+    def _condition(self) -> asyncio.Condition:
+        # Created lazily so the pool can be constructed outside a running loop
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+    
+    def _spawn(self, user_id: str, access_token: str) -> PooledSession:
+        """Start mcp-remote and wait for its tool list (blocking)"""
+        from crewai_tools.adapters.mcp_adapter import MCPServerAdapter
+        adapter = MCPServerAdapter(build_server_params(access_token))
+        try:
+            with MCP_SPAWN_SECONDS.time():
+                tools = list(adapter.__enter__())
+        except Exception:
+            self._close_adapter(adapter)
+            raise
+        # Repeated read calls within and across the user's runs skip MCP.
+        # The cache sits inside the instrumentation so hits still report
+        # tool_start/tool_end and a tool latency sample.
+        tool_cache = ToolCallCache()
+        tools = instrument_tools(cache_tools(tools, tool_cache))
+        return PooledSession(user_id, token_fingerprint(access_token), adapter, tools, tool_cache)
+    
+    @staticmethod
+    def _close_adapter(adapter: "MCPServerAdapter"):
+        try:
+            adapter.__exit__(None, None, None)
+        except Exception as e:
+            print(f"Error closing MCP session: {e}")
+    
+    async def _close(self, session: PooledSession):
+        session.retired = True
+        self.evicted += 1
+        for callback in self.on_close:
+            try:
+                callback(session)
+            except Exception as e:
+                print(f"MCP session close callback failed: {e}")
+        await asyncio.to_thread(self._close_adapter, session.adapter)
+    
+    def _expiry_deadline(self, session: PooledSession) -> float:
+        """Epoch time at which an idle session should next be checked"""
+        now = time.monotonic()
+        due = session.last_used + self.idle_timeout
+        if self.max_age:
+            due = min(due, session.created_at + self.max_age)
+        return time.time() + max(due - now, 0)
+    
+    async def _expire(self, key: Tuple[str, str]) -> Optional[float]:
+        """Sweeper callback: close the session if it has gone idle or stale"""
+        session = self.sessions.get(key)
+        if session is None:
+            return None
+        if session.in_use:
+            return time.time() + self.idle_timeout
+        idle = time.monotonic() - session.last_used > self.idle_timeout
+        if not idle and session.is_healthy(self.max_age):
+            return self._expiry_deadline(session)
+        del self.sessions[key]
+        await self._close(session)
+        async with self._condition():
+            self._condition().notify_all()
+        return None
+    
+    def _pop_evictable(self, user_id: Optional[str] = None, keep: Optional[Tuple[str, str]] = None) -> List[PooledSession]:
+        """Detach idle sessions that are stale, unhealthy or superseded"""
+        now = time.monotonic()
+        victims = []
+        for key, session in list(self.sessions.items()):
+            if key == keep or session.in_use:
+                continue
+            superseded = user_id is not None and session.user_id == user_id
+            idle = now - session.last_used > self.idle_timeout
+            if superseded or idle or not session.is_healthy(self.max_age):
+                victims.append(self.sessions.pop(key))
+        return victims
+    
+    def _pop_lru(self) -> Optional[PooledSession]:
+        idle = [s for s in self.sessions.values() if not s.in_use]
+        if not idle:
+            return None
+        victim = min(idle, key=lambda s: s.last_used)
+        return self.sessions.pop(victim.key)
+    
+    async def acquire(self, user_id: str, access_token: str) -> PooledSession:
+        """Lease a session for the user, spawning one if needed"""
+        with MCP_ACQUIRE_SECONDS.time(), stage("mcp_acquire"):
+            return await self._acquire(user_id, access_token)
+    
+    async def _acquire(self, user_id: str, access_token: str) -> PooledSession:
+        if self._closed:
+            raise RuntimeError("MCP session pool is shut down")
+        key = (user_id, token_fingerprint(access_token))
+        changed = self._condition()
+        deadline = time.monotonic() + self.acquire_timeout
+        
+        while True:
+            session = self.sessions.get(key)
+            if session is not None:
+                if session.is_healthy(self.max_age):
+                    session.in_use += 1
+                    session.last_used = time.monotonic()
+                    self.reused += 1
+                    return session
+                if not session.in_use:
+                    del self.sessions[key]
+                    await self._close(session)
+                    continue
+            
+            pending = self._spawning.get(key)
+            if pending is not None:
+                # Another request is already starting this session
+                await asyncio.shield(pending)
+                continue
+            
+            # A new token for the user supersedes their older sessions
+            victims = self._pop_evictable(user_id=user_id, keep=key)
+            while len(self.sessions) + len(self._spawning) >= self.max_size:
+                lru = self._pop_lru()
+                if lru is None:
+                    break
+                victims.append(lru)
+            for victim in victims:
+                await self._close(victim)
+            
+            if len(self.sessions) + len(self._spawning) < self.max_size:
+                break
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise MCPPoolExhausted(f"All {self.max_size} MCP sessions are busy")
+            async with changed:
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+        
+        future = asyncio.get_running_loop().create_future()
+        self._spawning[key] = future
+        # The thread keeps starting mcp-remote even if the caller is cancelled
+        spawn = asyncio.ensure_future(asyncio.to_thread(self._spawn, user_id, access_token))
+        try:
+            session = await asyncio.shield(spawn)
+        except asyncio.CancelledError:
+            spawn.add_done_callback(lambda task: self._adopt(key, future, task))
+            raise
+        except BaseException:
+            self._spawn_finished(key, future)
+            raise
+        self.spawned += 1
+        session.in_use = 1
+        self.sessions[key] = session
+        self._spawn_finished(key, future)
+        return session
+    
+    def _spawn_finished(self, key: Tuple[str, str], future: asyncio.Future):
+        del self._spawning[key]
+        future.set_result(None)
+        self._track(self._notify())
+    
+    def _adopt(self, key: Tuple[str, str], future: asyncio.Future, spawn: asyncio.Future):
+        """Keep or close a session whose caller was cancelled while it spawned"""
+        self._spawn_finished(key, future)
+        if spawn.cancelled() or spawn.exception() is not None:
+            return
+        session = spawn.result()
+        self.spawned += 1
+        if self._closed or key in self.sessions:
+            self._track(self._close(session))
+            return
+        self.sessions[key] = session
+        self.sweeper.schedule("mcp", key, self._expiry_deadline(session))
+    
+    def _track(self, coro):
+        # Keep a reference so the task is not garbage collected mid-run
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _notify(self):
+        async with self._condition():
+            self._condition().notify_all()
+    
+    async def release(self, session: PooledSession):
+        """Return a leased session to the pool"""
+        session.in_use = max(session.in_use - 1, 0)
+        session.last_used = time.monotonic()
+        if session.in_use == 0:
+            self.sweeper.schedule("mcp", session.key, self._expiry_deadline(session))
+        if session.in_use == 0 and (self._closed or not session.is_healthy(self.max_age)):
+            if self.sessions.get(session.key) is session:
+                del self.sessions[session.key]
+            if not session.retired:
+                await self._close(session)
+        async with self._condition():
+            self._condition().notify_all()
+    
+    @asynccontextmanager
+    async def session(self, user_id: str, access_token: str):
+        """Lease a session for the duration of a block"""
+        session = await self.acquire(user_id, access_token)
+        try:
+            yield session
+        finally:
+            await self.release(session)
+    
+    async def evict_idle(self) -> int:
+        """Close sessions idle longer than the timeout or failing health checks"""
+        victims = self._pop_evictable()
+        for victim in victims:
+            await self._close(victim)
+        if victims:
+            async with self._condition():
+                self._condition().notify_all()
+        return len(victims)
+    
+    async def evict_user(self, user_id: str) -> int:
+        """Close every idle session belonging to a user"""
+        victims = [
+            self.sessions.pop(key) for key, s in list(self.sessions.items())
+            if s.user_id == user_id and not s.in_use
+        ]
+        for victim in victims:
+            await self._close(victim)
+        return len(victims)
+    
+    async def shutdown(self):
+        """Close every session"""
+        self._closed = True
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        for session in sessions:
+            self.sweeper.cancel("mcp", session.key)
+        await asyncio.gather(*(self._close(s) for s in sessions), return_exceptions=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics"""
+        return {
+            "size": len(self.sessions),
+            "max_size": self.max_size,
+            "in_use": sum(1 for s in self.sessions.values() if s.in_use),
+            "spawning": len(self._spawning),
+            "spawned": self.spawned,
+            "reused": self.reused,
+            "evicted": self.evicted,
+        }
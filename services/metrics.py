@@ -0,0 +1,240 @@
+import time
+import bisect
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple, Callable, Sequence, Optional
+
+# Seconds; spans a cached token check up to a multi-minute crew run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Metric(ABC):
+    """A named metric, optionally split by labels"""
+    
+    kind = "untyped"
+    # Called with (name, method, value, labels) on every update, see MetricsRegistry.relay_to
+    relay: Optional[Callable[[str, str, float, Dict[str, Any]], None]] = None
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        # Updated from crew threads as well as the event loop
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines for the metric's current values"""
+    
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+class Counter(Metric):
+    """Monotonic count"""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        if self.relay is not None:
+            self.relay(self.name, "inc", amount, labels)
+    
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+    
+    def total(self) -> float:
+        """Sum over every label combination"""
+        with self._lock:
+            return sum(self._values.values())
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+class Gauge(Metric):
+    """Current value read from a callback at scrape time"""
+    
+    kind = "gauge"
+    
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        super().__init__(name, help)
+        self.read = read
+    
+    def samples(self) -> List[str]:
+        try:
+            return [f"{self.name} {_number(self.read())}"]
+        except Exception as e:
+            print(f"Metric {self.name} failed: {e}")
+            return []
+
+class Histogram(Metric):
+    """Distribution of durations in fixed buckets"""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (non-cumulative, last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        if not self.labelnames:
+            # Export zeros before the first observation
+            self._series[()] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+        if self.relay is not None:
+            self.relay(self.name, "observe", value, labels)
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def summary(self) -> Dict[str, Any]:
+        """Count, total and mean over every label combination"""
+        with self._lock:
+            count = sum(series[2] for series in self._series.values())
+            total = sum(series[1] for series in self._series.values())
+        return {
+            "count": count,
+            "total_seconds": round(total, 3),
+            "avg_seconds": round(total / count, 3) if count else 0.0,
+        }
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                labels = _labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Every metric exposed at /metrics"""
+    
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.relay: Optional[Callable[[str, str, float, Dict[str, Any]], None]] = None
+    
+    def _register(self, metric: Metric) -> Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None and not isinstance(metric, Gauge):
+            return existing
+        metric.relay = self.relay
+        # Gauges are re-bound to the latest service instance
+        self.metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+    
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+    
+    def gauge(self, name: str, help: str, read: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, help, read))
+    
+    def relay_to(self, send: Callable[[str, str, float, Dict[str, Any]], None]):
+        """Pass every counter and histogram update to send as well, so a crew
+        worker's metrics reach the server's registry (see record)"""
+        self.relay = send
+        for metric in self.metrics.values():
+            metric.relay = send
+    
+    def record(self, name: str, method: str, value: float, labels: Dict[str, Any]):
+        """Apply an update relayed from another process"""
+        metric = self.metrics.get(name)
+        if isinstance(metric, (Counter, Histogram)):
+            getattr(metric, method)(value, **labels)
+    
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+QUERIES = REGISTRY.counter(
+    "atlas_queries_total", "Queries handled, by outcome", ("outcome",)
+)
+QUERY_SECONDS = REGISTRY.histogram(
+    "atlas_query_duration_seconds", "End-to-end query time, including the scheduler queue", ("outcome",)
+)
+TOKEN_SECONDS = REGISTRY.histogram(
+    "atlas_token_validation_seconds", "Time to produce a valid OAuth token for a request"
+)
+TOKEN_REFRESH_SECONDS = REGISTRY.histogram(
+    "atlas_token_refresh_seconds", "OAuth token refresh calls, by outcome", ("outcome",)
+)
+MCP_ACQUIRE_SECONDS = REGISTRY.histogram(
+    "atlas_mcp_acquire_seconds", "Time to lease a pooled MCP session, including spawns and waits"
+)
+MCP_SPAWN_SECONDS = REGISTRY.histogram(
+    "atlas_mcp_spawn_seconds", "Time to start mcp-remote and list its tools"
+)
+AGENT_BUILD_SECONDS = REGISTRY.histogram(
+    "atlas_agent_build_seconds", "Time to build a CrewAI agent"
+)
+LLM_SECONDS = REGISTRY.histogram(
+    "atlas_llm_call_seconds", "LLM completion calls made by the crew"
+)
+TOOL_CALL_SECONDS = REGISTRY.histogram(
+    "atlas_tool_call_seconds", "MCP tool calls, by tool and outcome", ("tool", "outcome")
+)
+
+# Stage histograms summarised by /atlassian/stats
+STAGES = {
+    "token_validation": TOKEN_SECONDS,
+    "token_refresh": TOKEN_REFRESH_SECONDS,
+    "mcp_acquire": MCP_ACQUIRE_SECONDS,
+    "mcp_spawn": MCP_SPAWN_SECONDS,
+    "agent_build": AGENT_BUILD_SECONDS,
+    "llm_call": LLM_SECONDS,
+    "tool_call": TOOL_CALL_SECONDS,
+    "query": QUERY_SECONDS,
+}
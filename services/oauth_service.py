@@ -1,75 +1,220 @@
 import os
 import json
+import time
 import asyncio
-from datetime import datetime, timedelta
+import weakref
+from datetime import datetime
 from typing import Optional, Dict, Any
 from atlassian_oauth import AtlassianOAuthClient
+from services.store import KeyValueStore, get_store
+from services.metrics import TOKEN_SECONDS, TOKEN_REFRESH_SECONDS
+
+# Atlassian access tokens live for an hour; used when a token omits expires_in
+DEFAULT_TOKEN_LIFETIME = 3600
 
 class OAuthService:
-    def __init__(self):
+    def __init__(self, store: Optional[KeyValueStore] = None):
         self.oauth_client = AtlassianOAuthClient()
-        self.user_tokens: Dict[str, Dict[str, Any]] = {}
+        # Per-user OAuth state lives in the shared store under "oauth:<user_id>"
+        # so a login started on one worker can finish on another
+        self.store = store or get_store()
+        # Abandoned logins and idle sessions are dropped by the store's TTL
+        self.login_ttl = float(os.getenv("OAUTH_LOGIN_TTL", "600"))
+        self.session_ttl = float(os.getenv("OAUTH_SESSION_TTL", "86400"))
+        # Refresh this many seconds before expiry
+        self.refresh_skew = float(os.getenv("TOKEN_REFRESH_SKEW", "120"))
+        # Background refresh picks up tokens expiring within this window
+        self.proactive_window = float(os.getenv("TOKEN_PROACTIVE_REFRESH_WINDOW", "300"))
+        self.refresh_interval = float(os.getenv("TOKEN_REFRESH_CHECK_INTERVAL", "60"))
+        # Held only by refreshes in progress and their waiters, so a user's
+        # lock goes away once nobody is using it
+        self._refresh_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # Session whose token syncs the shared Confluence index and Jira mirror
+        self.sync_user_id = os.getenv("SYNC_USER_ID") or None
+        self._refresher: Optional[asyncio.Task] = None
+    
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"oauth:{user_id}"
+    
+    def get_user_session(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get the stored OAuth state for a user"""
+        return self.store.get(self._key(user_id))
     
     async def get_authorization_url(self, user_id: str) -> tuple[str, str]:
         """Get authorization URL for a specific user"""
         auth_url, state, oauth_session = self.oauth_client.get_authorization_url()
         
-        # Store OAuth session state for this user
-        self.user_tokens[user_id] = {
-            "oauth_session": oauth_session,
+        # Store OAuth session state for this user. The OAuth2Session itself
+        # can't be shared between workers; it is rebuilt from the state.
+        self.store.set(self._key(user_id), {
             "state": state,
             "auth_url": auth_url,
-            "timestamp": datetime.now()
-        }
+            "timestamp": time.time()
+        }, ttl=self.login_ttl)
         
         return auth_url, state
     
     async def handle_oauth_callback(self, user_id: str, code: str, state: str) -> Dict[str, Any]:
         """Handle OAuth callback and exchange code for token"""
-        if user_id not in self.user_tokens:
+        user_session = self.get_user_session(user_id)
+        if not user_session:
             raise Exception("No OAuth session found for user")
         
-        user_session = self.user_tokens[user_id]
-        
         # State validation is handled by the router/main app
         # We'll just verify the session exists and exchange the code
         
         # Exchange code for token
-        oauth_session = user_session["oauth_session"]
+        oauth_session = self.oauth_client.restore_session(user_session["state"])
         token = await self.oauth_client.get_access_token(code, oauth_session)
         
         # Store token for user
-        self.user_tokens[user_id] = {
+        self.store.set(self._key(user_id), {
             **user_session,
             "token": token,
-            "token_timestamp": datetime.now()
-        }
+            "token_timestamp": time.time(),
+            "expires_at": self.token_expires_at(token)
+        }, ttl=self.session_ttl)
         
         return token
     
-    async def get_valid_token(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """Get valid token for user (refresh if needed)"""
-        if user_id not in self.user_tokens or "token" not in self.user_tokens[user_id]:
-            return None
-        
-        user_session = self.user_tokens[user_id]
-        token = user_session["token"]
+    @staticmethod
+    def token_expires_at(token: Dict[str, Any], issued_at: Optional[float] = None) -> float:
+        """Epoch seconds at which the token expires"""
+        if token.get("expires_at"):
+            return float(token["expires_at"])
+        lifetime = float(token.get("expires_in") or DEFAULT_TOKEN_LIFETIME)
+        return (issued_at or time.time()) + lifetime
+    
+    def _needs_refresh(self, user_session: Dict[str, Any], skew: float) -> bool:
+        return time.time() >= user_session["expires_at"] - skew
+    
+    def _store_token(self, user_id: str, token: Dict[str, Any]):
+        now = time.time()
         
-        # Check if token needs refresh (simplified - you might want more sophisticated logic)
-        token_age = datetime.now() - user_session.get("token_timestamp", datetime.now())
+        def apply(current: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            # The user may have logged out while the refresh was in flight
+            if current is None:
+                return None
+            return {
+                **current,
+                "token": token,
+                "token_timestamp": now,
+                "expires_at": self.token_expires_at(token, now)
+            }
         
-        if token_age > timedelta(hours=1):  # Refresh if token is older than 1 hour
+        self.store.update(self._key(user_id), apply, ttl=self.session_ttl)
+    
+    async def _wait_for_peer_refresh(self, user_id: str, user_session: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Another worker holds the refresh lease; use its result"""
+        # The current token is still good, so there's no need to wait
+        if time.time() < user_session["expires_at"]:
+            return user_session["token"]
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            await asyncio.sleep(0.25)
+            current = self.get_user_session(user_id)
+            if not current or "token" not in current:
+                return None
+            if current["expires_at"] > user_session["expires_at"]:
+                return current["token"]
+        return None
+    
+    async def refresh_user_token(self, user_id: str, skew: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Refresh the user's token unless another request already has"""
+        skew = self.refresh_skew if skew is None else skew
+        lock = self._refresh_locks.get(user_id)
+        if lock is None:
+            lock = self._refresh_locks[user_id] = asyncio.Lock()
+        async with lock:
+            user_session = self.get_user_session(user_id)
+            if not user_session or "token" not in user_session:
+                return None
+            # Whoever held the lock before us may have refreshed already
+            if not self._needs_refresh(user_session, skew):
+                return user_session["token"]
+            
+            # The lock above covers this worker; the lease covers the others.
+            # Atlassian rotates refresh tokens, so two refreshes would race.
+            lease = f"oauth-refresh:{user_id}"
+            if not self.store.add(lease, os.getpid(), ttl=30):
+                return await self._wait_for_peer_refresh(user_id, user_session)
+            
+            token = user_session["token"]
+            started = time.perf_counter()
             try:
-                refreshed_token = self.oauth_client.refresh_token(token)
-                self.user_tokens[user_id]["token"] = refreshed_token
-                self.user_tokens[user_id]["token_timestamp"] = datetime.now()
+                # The refresh is a blocking HTTP call; keep it off the event loop
+                refreshed_token = await asyncio.to_thread(
+                    self.oauth_client.refresh_token, token, False
+                )
+                TOKEN_REFRESH_SECONDS.observe(time.perf_counter() - started, outcome="success")
+                self._store_token(user_id, refreshed_token)
                 return refreshed_token
             except Exception as e:
-                # Refresh failed, user needs to re-authenticate
+                TOKEN_REFRESH_SECONDS.observe(time.perf_counter() - started, outcome="error")
                 print(f"Token refresh failed for user {user_id}: {e}")
+                # Keep serving the current token until it actually expires
+                if time.time() < user_session["expires_at"]:
+                    return token
                 return None
+            finally:
+                self.store.delete(lease)
+    
+    async def get_valid_token(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get valid token for user (refresh if needed)"""
+        with TOKEN_SECONDS.time():
+            return await self._valid_token(user_id)
+    
+    async def _valid_token(self, user_id: str) -> Optional[Dict[str, Any]]:
+        user_session = self.get_user_session(user_id)
+        if not user_session or "token" not in user_session:
+            return None
         
-        return token
+        if self._needs_refresh(user_session, self.refresh_skew):
+            return await self.refresh_user_token(user_id)
+        
+        return user_session["token"]
+    
+    async def get_sync_token(self) -> Optional[Dict[str, Any]]:
+        """A valid token of the SYNC_USER_ID service account, for shared syncs"""
+        if self.sync_user_id is None:
+            return None
+        return await self.get_valid_token(self.sync_user_id)
+    
+    async def _refresh_expiring(self):
+        """Refresh tokens that will expire within the proactive window"""
+        for key in self.store.keys("oauth:"):
+            user_id = key[len("oauth:"):]
+            session = self.store.get(key)
+            if (
+                session and "token" in session
+                and session["token"].get("refresh_token")
+                and self._needs_refresh(session, self.proactive_window)
+            ):
+                await self.refresh_user_token(user_id, skew=self.proactive_window)
+    
+    async def _refresh_forever(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self._refresh_expiring()
+            except Exception as e:
+                print(f"Background token refresh failed: {e}")
+    
+    def start(self):
+        """Start refreshing tokens in the background shortly before they expire"""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_forever())
+    
+    async def stop(self):
+        """Stop the background refresher"""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
     
     async def is_user_authenticated(self, user_id: str) -> bool:
         """Check if user is authenticated"""
@@ -82,24 +227,22 @@ class OAuthService:
         if not token:
             return None
         
+        user_session = self.get_user_session(user_id) or {}
         # You can implement user info retrieval here
         # For now, return basic info
         return {
             "user_id": user_id,
             "authenticated": True,
-            "token_expires_at": self.user_tokens[user_id].get("token_timestamp")
+            "token_expires_at": datetime.fromtimestamp(
+                user_session.get("expires_at", self.token_expires_at(token))
+            ).isoformat()
         }
     
-    def cleanup_expired_sessions(self):
+    def cleanup_expired_sessions(self) -> int:
         """Clean up expired user sessions"""
-        current_time = datetime.now()
-        expired_users = []
-        
-        for user_id, session in self.user_tokens.items():
-            session_age = current_time - session.get("timestamp", current_time)
-            if session_age > timedelta(hours=24):  # Clean sessions older than 24 hours
-                expired_users.append(user_id)
-        
-        for user_id in expired_users:
-            del self.user_tokens[user_id]
-            print(f"Cleaned expired session for user: {user_id}")
+        # Logins expire after OAUTH_LOGIN_TTL and sessions after OAUTH_SESSION_TTL.
+        # The store indexes keys by expiry, so this only touches expired ones.
+        removed = self.store.purge_expired()
+        if removed:
+            print(f"Cleaned {removed} expired sessions")
+        return removed
@@ -0,0 +1,95 @@
+import os
+import hmac
+import time
+import uuid
+import cProfile
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+class RunProfile(cProfile.Profile):
+    """Profile of one run, plus the stats of a crew worker process that ran it"""
+    
+    def __init__(self):
+        super().__init__()
+        self.worker_stats: Optional[Dict[Any, Any]] = None
+    
+    def create_stats(self):
+        super().create_stats()
+        if self.worker_stats:
+            self.stats.update(self.worker_stats)
+
+# Profiler for the run executing in the current context; the crew thread
+# inherits it through the copied context
+_active: ContextVar[Optional[RunProfile]] = ContextVar("run_profiler", default=None)
+
+def is_admin(admin_token: Optional[str]) -> bool:
+    """Profiling is allowed only with the ADMIN_TOKEN; unset disables it"""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected or not admin_token:
+        return False
+    return hmac.compare_digest(expected.encode("utf-8"), admin_token.encode("utf-8"))
+
+@contextmanager
+def capturing() -> Iterator[RunProfile]:
+    """Profile crew work started in this context"""
+    profile = RunProfile()
+    token = _active.set(profile)
+    try:
+        yield profile
+    finally:
+        _active.reset(token)
+
+def active() -> Optional[RunProfile]:
+    """The profile capturing the current context, if any"""
+    return _active.get()
+
+def run_profiled(func: Callable, *args) -> Any:
+    """Call func, under the current run's profiler if one is capturing"""
+    profile = _active.get()
+    if profile is None:
+        return func(*args)
+    try:
+        profile.enable()
+    except ValueError as e:
+        # Only one profiler may be active per interpreter on Python 3.12+
+        print(f"Profiling skipped: {e}")
+        return func(*args)
+    try:
+        return func(*args)
+    finally:
+        profile.disable()
+
+class ProfileStore:
+    """Keeps the most recent profiles as pstats files for download"""
+    
+    def __init__(self, directory: Optional[str] = None, max_files: Optional[int] = None):
+        self.directory = Path(directory or os.getenv("PROFILE_DIR", "profiles"))
+        self.max_files = max_files or int(os.getenv("PROFILE_MAX_FILES", "20"))
+    
+    def save(self, profile: cProfile.Profile) -> str:
+        """Write a profile and return its id"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        profile.dump_stats(str(self.directory / f"{profile_id}.prof"))
+        # Oldest first: ids start with the capture time
+        files = sorted(self.directory.glob("*.prof"))
+        for stale in files[:max(len(files) - self.max_files, 0)]:
+            stale.unlink(missing_ok=True)
+        return profile_id
+    
+    def path(self, profile_id: str) -> Optional[Path]:
+        """File for a profile id, or None if unknown"""
+        if not all(c.isalnum() or c == "-" for c in profile_id):
+            return None
+        path = self.directory / f"{profile_id}.prof"
+        return path if path.is_file() else None
+
+_profile_store: Optional[ProfileStore] = None
+
+def get_profile_store() -> ProfileStore:
+    global _profile_store
+    if _profile_store is None:
+        _profile_store = ProfileStore()
+    return _profile_store
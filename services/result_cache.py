@@ -0,0 +1,92 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+def normalize_query(query: str) -> str:
+    """Case, spacing and trailing punctuation don't change the question"""
+    return " ".join(query.lower().split()).rstrip("?.!; ")
+
+class CachedResult:
+    __slots__ = ("response", "catalog_version", "stored_at", "expires_at")
+    
+    def __init__(self, response: Dict[str, Any], catalog_version: Optional[str], ttl: float):
+        self.response = response
+        self.catalog_version = catalog_version
+        self.stored_at = time.time()
+        self.expires_at = time.monotonic() + ttl
+
+class ResultCache:
+    """LRU cache of successful query answers per user.
+    
+    Keyed by user and normalized query; an entry only matches while the
+    user's tool catalog version is the one it was answered with.
+    """
+    
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = float(os.getenv("RESULT_CACHE_TTL", "300")) if ttl is None else ttl
+        self.max_entries = max_entries or int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000"))
+        self.entries: "OrderedDict[Tuple[str, str], CachedResult]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+    
+    def get(self, user_id: str, query: str, catalog_version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Cached response for the query, or None.
+        
+        catalog_version is the version of the user's live MCP session, or
+        None when there is none and the tools are not known to have changed.
+        """
+        if not self.enabled:
+            return None
+        key = (user_id, normalize_query(query))
+        entry = self.entries.get(key)
+        if entry is None or time.monotonic() >= entry.expires_at or (
+            catalog_version is not None and entry.catalog_version != catalog_version
+        ):
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return {
+            **entry.response,
+            "query": query,
+            "cached": True,
+            "cached_at": datetime.fromtimestamp(entry.stored_at).isoformat(),
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def put(self, user_id: str, query: str, response: Dict[str, Any], catalog_version: Optional[str]):
+        if not self.enabled:
+            return
+        key = (user_id, normalize_query(query))
+        self.entries[key] = CachedResult(dict(response), catalog_version, self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop a user's answers, e.g. after one of their runs changed data"""
+        keys = [key for key in self.entries if key[0] == user_id]
+        for key in keys:
+            del self.entries[key]
+        self.invalidations += 1
+        return len(keys)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,197 @@
+import os
+import time
+import asyncio
+import contextvars
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Callable, Deque
+
+class SchedulerOverloaded(Exception):
+    """Raised when the crew queue is full; carries a Retry-After hint"""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Waiter:
+    def __init__(self, user_id: str, future: asyncio.Future, limit: int):
+        self.user_id = user_id
+        self.future = future
+        self.limit = limit
+        self.enqueued_at = time.monotonic()
+
+class CrewScheduler:
+    """Bounded crew runner with per-user limits and round-robin queueing"""
+    
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        per_user_limit: Optional[int] = None,
+        max_queue_depth: Optional[int] = None,
+    ):
+        self.max_concurrency = max_concurrency or int(os.getenv("CREW_MAX_CONCURRENCY", "4"))
+        self.per_user_limit = per_user_limit or int(os.getenv("CREW_PER_USER_CONCURRENCY", "1"))
+        self.max_queue_depth = max_queue_depth if max_queue_depth is not None else int(os.getenv("CREW_MAX_QUEUE_DEPTH", "50"))
+        # Crew runs get their own bounded pool instead of the loop's default
+        # executor, so they can't starve other to_thread users
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="crew"
+        )
+        # user_id -> waiters; dict order is the round-robin order
+        self.queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self.active: Dict[str, int] = {}
+        self.total_active = 0
+        self.queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+    
+    def _grant(self, waiter: _Waiter):
+        self.active[waiter.user_id] = self.active.get(waiter.user_id, 0) + 1
+        self.total_active += 1
+        waiter.future.set_result(None)
+    
+    def _dispatch(self):
+        """Hand free slots to queued users, one request per user per turn"""
+        skipped = 0
+        while self.queues and self.total_active < self.max_concurrency and skipped < len(self.queues):
+            user_id, waiters = next(iter(self.queues.items()))
+            self.queues.move_to_end(user_id)
+            if self.active.get(user_id, 0) >= waiters[0].limit:
+                skipped += 1
+                continue
+            waiter = waiters.popleft()
+            self.queue_depth -= 1
+            if not waiters:
+                del self.queues[user_id]
+            if waiter.future.done():
+                # Cancelled while queued
+                continue
+            skipped = 0
+            self._grant(waiter)
+    
+    def _release(self, user_id: str):
+        self.total_active -= 1
+        remaining = self.active.get(user_id, 1) - 1
+        if remaining:
+            self.active[user_id] = remaining
+        else:
+            self.active.pop(user_id, None)
+        self._dispatch()
+    
+    def _discard(self, waiter: _Waiter):
+        waiters = self.queues.get(waiter.user_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self.queue_depth -= 1
+            if not waiters:
+                del self.queues[waiter.user_id]
+    
+    def _retry_after(self) -> int:
+        avg_run = self.total_run / self.completed if self.completed else 30.0
+        waves = (self.queue_depth + self.max_concurrency) / self.max_concurrency
+        return max(1, int(avg_run * waves))
+    
+    async def _admit(self, user_id: str, limit: int):
+        if (
+            not self.queues
+            and self.total_active < self.max_concurrency
+            and self.active.get(user_id, 0) < limit
+        ):
+            self.active[user_id] = self.active.get(user_id, 0) + 1
+            self.total_active += 1
+            return
+        
+        if self.queue_depth >= self.max_queue_depth:
+            self.rejected += 1
+            raise SchedulerOverloaded(
+                f"Server busy: {self.queue_depth} queries already queued",
+                retry_after=self._retry_after()
+            )
+        
+        waiter = _Waiter(user_id, asyncio.get_running_loop().create_future(), limit)
+        self.queues.setdefault(user_id, deque()).append(waiter)
+        self.queue_depth += 1
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                self._discard(waiter)
+            else:
+                # The slot was granted just as we were cancelled; give it back
+                self._release(user_id)
+            raise
+        finally:
+            waited = time.monotonic() - waiter.enqueued_at
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+    
+    @asynccontextmanager
+    async def slot(self, user_id: str, limit: Optional[int] = None):
+        """Hold one of the user's crew slots for the duration of a block.
+        
+        limit raises the user's concurrency above per_user_limit for this
+        request (a batch running several lanes), up to max_concurrency.
+        """
+        await self._admit(user_id, max(self.per_user_limit, min(limit or 0, self.max_concurrency)))
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.completed += 1
+            self.total_run += time.monotonic() - started
+            self._release(user_id)
+    
+    def submit(self, func: Callable, *args) -> Future:
+        """Start blocking crew work on the scheduler's bounded thread pool.
+        
+        The returned future completes when the thread does, even if whoever
+        awaited it (through asyncio.wrap_future) has been cancelled.
+        """
+        ctx = contextvars.copy_context()
+        return self.executor.submit(ctx.run, func, *args)
+    
+    async def run_in_thread(self, func: Callable, *args) -> Any:
+        """Run blocking crew work on the scheduler's bounded thread pool"""
+        return await asyncio.wrap_future(self.submit(func, *args))
+    
+    def oldest_wait(self) -> float:
+        """Seconds the longest-queued request has been waiting"""
+        now = time.monotonic()
+        heads = [waiters[0].enqueued_at for waiters in self.queues.values() if waiters]
+        return now - min(heads) if heads else 0.0
+    
+    async def drain(self, timeout: float) -> bool:
+        """Wait for queued and running crews to finish; False on timeout"""
+        deadline = time.monotonic() + timeout
+        while self.total_active or self.queue_depth:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.1)
+        return True
+    
+    def shutdown(self):
+        """Stop accepting work on the crew thread pool"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get scheduler statistics"""
+        admitted = self.completed + self.total_active
+        return {
+            "active": self.total_active,
+            "max_concurrency": self.max_concurrency,
+            "per_user_limit": self.per_user_limit,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "queued_users": len(self.queues),
+            "oldest_wait_seconds": round(self.oldest_wait(), 3),
+            "avg_wait_seconds": round(self.total_wait / admitted, 3) if admitted else 0.0,
+            "max_wait_seconds": round(self.max_wait, 3),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,223 @@
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, Iterable, Tuple
+from services.result_cache import normalize_query
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Issue keys, project keys, numbers and quoted text must match exactly:
+# "status of PROJ-12" and "status of PROJ-13" are close as text but
+# different questions
+_IDENTIFIER = re.compile(r"[A-Za-z][A-Za-z0-9]+-\d+|\b[A-Z][A-Z0-9]{1,9}\b|\d+|\"[^\"]+\"|'[^']+'")
+
+def identifiers(query: str) -> frozenset:
+    return frozenset(match.upper() for match in _IDENTIFIER.findall(query))
+
+# Words a paraphrase may add, drop or swap without changing the question.
+# Negations and time words ("not", "this", "last") are deliberately absent.
+_FILLER = frozenset("""
+    a an the of for in on at to from by with about and or me my i we our us you your it its
+    is are was were be been do does did can could would will shall should may might please
+    show list get give find tell display fetch what which who whom whose how where when
+    all any there that those these them some have has had just kindly
+""".split())
+
+# "isn't", "don't", "can't" -> "not"
+_CONTRACTION = re.compile(r"n't\b")
+
+def content_words(query: str) -> frozenset:
+    """Words that carry the question's meaning, lightly stemmed.
+    
+    Two queries are only treated as paraphrases when these match exactly,
+    so "assigned"/"unassigned", "this week"/"last week" and "mobile"/"web"
+    stay different questions however similar their vectors are.
+    """
+    words = re.findall(r"\w+", _CONTRACTION.sub(" not", query.lower()))
+    return frozenset(
+        word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "is", "us")) else word
+        for word in words if word not in _FILLER
+    )
+
+class HashingVectorizer:
+    """Local, stateless text embedding: hashed word and character n-grams"""
+    
+    def __init__(self, dimensions: int = 1024, ngram: int = 3):
+        self.dimensions = dimensions
+        self.ngram = ngram
+    
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"\w+", normalize_query(text))
+        joined = f" {' '.join(words)} "
+        grams = [joined[i:i + self.ngram] for i in range(len(joined) - self.ngram + 1)]
+        return [f"w:{word}" for word in words] + grams
+    
+    def transform(self, text: str) -> "np.ndarray":
+        """Unit-length vector; dot products are cosine similarities"""
+        # Imported on first use: the cache is off by default, and the web
+        # tier shouldn't load numpy for it
+        import numpy as np
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in self._features(text):
+            # crc32 rather than hash(): stable across processes and restarts
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class SemanticEntry:
+    __slots__ = ("query", "identifiers", "content", "response", "catalog_version", "stored_at")
+    
+    def __init__(self, query: str, response: Dict[str, Any], catalog_version: Optional[str], stored_at: float):
+        self.query = query
+        self.identifiers = identifiers(query)
+        self.content = content_words(query)
+        self.response = response
+        self.catalog_version = catalog_version
+        self.stored_at = stored_at
+
+class UserIndex:
+    """One user's recent answers and their query vectors, one row each"""
+    
+    def __init__(self, dimensions: int):
+        import numpy as np
+        self.vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self.entries: List[SemanticEntry] = []
+    
+    def add(self, vector: "np.ndarray", entry: SemanticEntry, max_entries: int):
+        import numpy as np
+        self.vectors = np.vstack([self.vectors, vector])
+        self.entries.append(entry)
+        if len(self.entries) > max_entries:
+            drop = len(self.entries) - max_entries
+            self.vectors = self.vectors[drop:]
+            self.entries = self.entries[drop:]
+
+class SemanticCache:
+    """Answers paraphrases of a user's recent queries from earlier runs.
+    
+    mode "serve" returns the earlier answer; "refresh" returns it and runs
+    the query again in the background; "off" (the default) disables the cache.
+    A hit needs a high cosine similarity and the same identifiers and
+    content words, so only rewordings of the same question match.
+    """
+    
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        ttl: Optional[float] = None,
+        mode: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        max_users: Optional[int] = None
+    ):
+        self.threshold = threshold or float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+        self.ttl = float(os.getenv("SEMANTIC_CACHE_TTL", "3600")) if ttl is None else ttl
+        self.mode = (mode or os.getenv("SEMANTIC_CACHE_MODE", "off")).lower()
+        if self.mode not in ("serve", "refresh", "off"):
+            raise ValueError(f"Unsupported SEMANTIC_CACHE_MODE: {self.mode!r}")
+        self.max_entries = max_entries or int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "200"))
+        self.max_users = max_users or int(os.getenv("SEMANTIC_CACHE_MAX_USERS", "1000"))
+        self.vectorizer = HashingVectorizer()
+        self.users: "OrderedDict[str, UserIndex]" = OrderedDict()
+        # When each user's answers were last invalidated by a write, so that
+        # seeding from history doesn't bring back answers from before it
+        self.invalidated_at: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off" and self.ttl > 0
+    
+    def has_user(self, user_id: str) -> bool:
+        return user_id in self.users
+    
+    def _index(self, user_id: str) -> UserIndex:
+        index = self.users.get(user_id)
+        if index is None:
+            index = self.users[user_id] = UserIndex(self.vectorizer.dimensions)
+            while len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+        self.users.move_to_end(user_id)
+        return index
+    
+    def add(
+        self,
+        user_id: str,
+        query: str,
+        response: Dict[str, Any],
+        catalog_version: Optional[str] = None,
+        stored_at: Optional[float] = None
+    ):
+        if not self.enabled:
+            return
+        entry = SemanticEntry(query, dict(response), catalog_version, stored_at or time.time())
+        self._index(user_id).add(self.vectorizer.transform(query), entry, self.max_entries)
+    
+    def seed(self, user_id: str, answered: Iterable[Tuple[str, str, float]]):
+        """Index (query, result, timestamp) answers, e.g. from the user's history"""
+        index = self._index(user_id)
+        since = max(time.time() - self.ttl, self.invalidated_at.get(user_id, 0))
+        for query, result, timestamp in answered:
+            if timestamp > since:
+                entry = SemanticEntry(query, {"success": True, "result": result}, None, timestamp)
+                index.add(self.vectorizer.transform(query), entry, self.max_entries)
+    
+    def lookup(self, user_id: str, query: str, catalog_version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The earlier answer most similar to the query, if above the threshold"""
+        index = self.users.get(user_id)
+        if not self.enabled or index is None or not index.entries:
+            self.misses += 1
+            return None
+        import numpy as np
+        scores = index.vectors @ self.vectorizer.transform(query)
+        wanted = identifiers(query)
+        content = content_words(query)
+        now = time.time()
+        for row in np.argsort(scores)[::-1]:
+            if scores[row] < self.threshold:
+                break
+            entry = index.entries[row]
+            if now - entry.stored_at >= self.ttl or entry.identifiers != wanted or entry.content != content:
+                continue
+            if catalog_version is not None and entry.catalog_version not in (None, catalog_version):
+                continue
+            self.hits += 1
+            return {
+                **entry.response,
+                "query": query,
+                "cached": True,
+                "cached_at": datetime.fromtimestamp(entry.stored_at).isoformat(),
+                "similar_to": entry.query,
+                "similarity": round(float(scores[row]), 3),
+                "timestamp": datetime.now().isoformat()
+            }
+        self.misses += 1
+        return None
+    
+    def invalidate_user(self, user_id: str):
+        """Forget a user's answers, e.g. after one of their runs changed data"""
+        if user_id in self.users:
+            self.users[user_id] = UserIndex(self.vectorizer.dimensions)
+        now = time.time()
+        self.invalidated_at[user_id] = now
+        if len(self.invalidated_at) > self.max_users:
+            # Older invalidations no longer matter once past the TTL
+            self.invalidated_at = {
+                uid: at for uid, at in self.invalidated_at.items() if now - at < self.ttl
+            }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return {
+            "mode": self.mode,
+            "threshold": self.threshold,
+            "users": len(self.users),
+            "entries": sum(len(index.entries) for index in self.users.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
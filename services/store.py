@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import sqlite3
+import heapq
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+class KeyValueStore(ABC):
+    """Shared state for tokens and sessions.
+    
+    Values must be JSON-serializable. Every method is atomic with respect to
+    other workers using the same backend, so any worker can serve any user.
+    """
+    
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """The value stored under key, or None if absent or expired"""
+    
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a value, expiring after ttl seconds if given"""
+    
+    @abstractmethod
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set key only if it is absent (or expired); True if it was set"""
+    
+    @abstractmethod
+    def update(self, key: str, fn: Callable[[Optional[Any]], Optional[Any]], ttl: Optional[float] = None) -> Optional[Any]:
+        """Atomically replace the value with fn(old); None deletes the key"""
+    
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Remove key; True if it existed"""
+    
+    @abstractmethod
+    def keys(self, prefix: str = "") -> List[str]:
+        """Live keys starting with prefix"""
+    
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Remove expired keys; returns how many were removed"""
+
+class MemoryStore(KeyValueStore):
+    """Process-local store; only correct with a single worker"""
+    
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._lock = threading.Lock()
+        # Expiry index so purge_expired only visits keys that are due
+        self._expiry: List[Tuple[float, str]] = []
+        self._next_check: Dict[str, float] = {}
+    
+    def _live(self, key: str, now: float) -> Optional[Tuple[Any, Optional[float]]]:
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= now:
+            del self._data[key]
+            return None
+        return item
+    
+    def _put(self, key: str, value: Any, deadline: Optional[float]):
+        self._data[key] = (value, deadline)
+        if deadline is None:
+            return
+        pending = self._next_check.get(key)
+        # Extending a TTL needs no new index entry: the pending check
+        # finds the later deadline and re-queues the key then
+        if pending is None or deadline < pending:
+            self._next_check[key] = deadline
+            heapq.heappush(self._expiry, (deadline, key))
+    
+    @staticmethod
+    def _deadline(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl else None
+    
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._live(key, time.time())
+            return item[0] if item else None
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._put(key, value, self._deadline(ttl))
+    
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._live(key, time.time()) is not None:
+                return False
+            self._put(key, value, self._deadline(ttl))
+            return True
+    
+    def update(self, key: str, fn: Callable[[Optional[Any]], Optional[Any]], ttl: Optional[float] = None) -> Optional[Any]:
+        with self._lock:
+            item = self._live(key, time.time())
+            value = fn(item[0] if item else None)
+            if value is None:
+                self._data.pop(key, None)
+            else:
+                # Without a new TTL the key keeps its current expiry
+                deadline = self._deadline(ttl) if ttl else (item[1] if item else None)
+                self._put(key, value, deadline)
+            return value
+    
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+    
+    def keys(self, prefix: str = "") -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [
+                key for key, (_, deadline) in self._data.items()
+                if key.startswith(prefix) and (deadline is None or deadline > now)
+            ]
+    
+    def purge_expired(self) -> int:
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                deadline, key = heapq.heappop(self._expiry)
+                if self._next_check.get(key) != deadline:
+                    continue
+                del self._next_check[key]
+                item = self._data.get(key)
+                if item is None or item[1] is None:
+                    continue
+                if item[1] <= now:
+                    del self._data[key]
+                    removed += 1
+                else:
+                    self._next_check[key] = item[1]
+                    heapq.heappush(self._expiry, (item[1], key))
+        return removed
+
+class SQLiteStore(KeyValueStore):
+    """Store shared by every worker on one host through a SQLite file"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires_at)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: transactions are opened explicitly below
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def _deadline(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl else None
+    
+    def get(self, key: str) -> Optional[Any]:
+        row = self._connect().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), self._deadline(ttl))
+        )
+    
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires_at <= ?", (key, time.time()))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), self._deadline(ttl))
+            )
+            conn.execute("COMMIT")
+            return cursor.rowcount == 1
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def update(self, key: str, fn: Callable[[Optional[Any]], Optional[Any]], ttl: Optional[float] = None) -> Optional[Any]:
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock up front, so the read below
+        # can't be interleaved with another worker's update
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+            value = fn(json.loads(row[0]) if row else None)
+            if value is None:
+                conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            else:
+                deadline = self._deadline(ttl) if ttl else (row[1] if row else None)
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), deadline)
+                )
+            conn.execute("COMMIT")
+            return value
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def delete(self, key: str) -> bool:
+        cursor = self._connect().execute("DELETE FROM kv WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+    
+    def keys(self, prefix: str = "") -> List[str]:
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = self._connect().execute(
+            "SELECT key FROM kv WHERE key LIKE ? ESCAPE '\\' AND (expires_at IS NULL OR expires_at > ?)",
+            (escaped + "%", time.time())
+        ).fetchall()
+        return [row[0] for row in rows]
+    
+    def purge_expired(self) -> int:
+        cursor = self._connect().execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+def create_store(url: Optional[str] = None) -> KeyValueStore:
+    """Build a store from a URL: memory:// or sqlite:///path/to/state.db"""
+    url = url or os.getenv("STATE_STORE_URL", "memory://")
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryStore()
+    if parsed.scheme == "sqlite":
+        # sqlite:///state.db -> state.db, sqlite:////var/lib/app/state.db -> absolute
+        path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else parsed.path
+        return SQLiteStore(path or "state.db")
+    raise ValueError(f"Unsupported STATE_STORE_URL scheme: {parsed.scheme!r}")
+
+_store: Optional[KeyValueStore] = None
+
+def get_store() -> KeyValueStore:
+    """Process-wide store configured by STATE_STORE_URL"""
+    global _store
+    if _store is None:
+        _store = create_store()
+    return _store
@@ -0,0 +1,116 @@
+import os
+import time
+import heapq
+import asyncio
+import inspect
+from typing import Dict, Any, Optional, List, Tuple, Callable, Hashable
+
+# Handler for a due key: returns a new epoch deadline if the key is still in
+# use (it was touched since it was scheduled), or None once it is removed
+ExpiryHandler = Callable[[Hashable], Any]
+
+class ExpirySweeper:
+    """Expires keys from a deadline heap, so each sweep costs O(expired)"""
+    
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or float(os.getenv("SWEEP_INTERVAL", "30"))
+        self._heap: List[Tuple[float, int, str, Hashable]] = []
+        # Earliest deadline already in the heap for each (namespace, key)
+        self._pending: Dict[Tuple[str, Hashable], float] = {}
+        self._handlers: Dict[str, ExpiryHandler] = {}
+        self._purgers: List[Callable[[], int]] = []
+        self._seq = 0
+        self._task: Optional[asyncio.Task] = None
+        self.expired = 0
+    
+    def register(self, namespace: str, handler: ExpiryHandler):
+        """Handle due keys of a namespace"""
+        self._handlers[namespace] = handler
+    
+    def add_purger(self, purge: Callable[[], int]):
+        """Run a backend's own expiry (e.g. an indexed DELETE) on every sweep"""
+        self._purgers.append(purge)
+    
+    def schedule(self, namespace: str, key: Hashable, deadline: float):
+        """Ask for key to be checked at deadline (epoch seconds)"""
+        pending = self._pending.get((namespace, key))
+        # An earlier check is already queued; the handler will push the key
+        # back with its real deadline, so repeated touches don't grow the heap
+        if pending is not None and pending <= deadline:
+            return
+        self._pending[(namespace, key)] = deadline
+        self._seq += 1
+        heapq.heappush(self._heap, (deadline, self._seq, namespace, key))
+    
+    def cancel(self, namespace: str, key: Hashable):
+        """Forget a key; its heap entry is skipped when it comes due"""
+        self._pending.pop((namespace, key), None)
+    
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """Expire every due key and run the purgers"""
+        now = now if now is not None else time.time()
+        expired = 0
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, namespace, key = heapq.heappop(self._heap)
+            if self._pending.get((namespace, key)) != deadline:
+                # Cancelled, or superseded by an earlier entry
+                continue
+            del self._pending[(namespace, key)]
+            handler = self._handlers.get(namespace)
+            if handler is None:
+                continue
+            try:
+                next_deadline = handler(key)
+                if inspect.isawaitable(next_deadline):
+                    next_deadline = await next_deadline
+            except Exception as e:
+                print(f"Sweeper handler for {namespace} failed: {e}")
+                continue
+            if next_deadline is None:
+                expired += 1
+            else:
+                self.schedule(namespace, key, max(next_deadline, now + 1))
+        for purge in self._purgers:
+            try:
+                expired += purge()
+            except Exception as e:
+                print(f"Sweeper purge failed: {e}")
+        self.expired += expired
+        return expired
+    
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.sweep()
+    
+    def start(self):
+        """Start sweeping in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sweep_forever())
+    
+    async def stop(self):
+        """Stop the background sweeper"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get sweeper statistics"""
+        return {
+            "scheduled": len(self._pending),
+            "heap_size": len(self._heap),
+            "expired": self.expired,
+        }
+
+_sweeper: Optional[ExpirySweeper] = None
+
+def get_sweeper() -> ExpirySweeper:
+    """Process-wide sweeper started from the app lifespan"""
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = ExpirySweeper()
+    return _sweeper
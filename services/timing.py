@@ -0,0 +1,48 @@
+import re
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+class RequestTimings:
+    """Stage durations of one request, for Server-Timing and the timings field"""
+    
+    def __init__(self):
+        self.stages: List[Dict[str, Any]] = []
+    
+    def add(self, name: str, duration_ms: float, description: Optional[str] = None):
+        entry = {"stage": name, "duration_ms": round(duration_ms, 1)}
+        if description:
+            entry["description"] = description
+        self.stages.append(entry)
+    
+    @contextmanager
+    def measure(self, name: str, description: Optional[str] = None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000, description)
+    
+    def listener(self, event: str, data: Dict[str, Any]):
+        """Run event listener collecting stage and tool timings"""
+        # Appends from the crew thread are safe: list.append is atomic
+        if event == "stage":
+            self.add(data["stage"], data["duration_ms"])
+        elif event == "tool_end":
+            self.add("tool", data["duration_ms"], data["tool"])
+    
+    def header(self) -> str:
+        """Server-Timing header value; repeated stages get numbered names"""
+        seen: Dict[str, int] = {}
+        metrics = []
+        for entry in self.stages:
+            name = re.sub(r"[^A-Za-z0-9_-]", "_", entry["stage"])
+            seen[name] = seen.get(name, 0) + 1
+            if seen[name] > 1:
+                name = f"{name}-{seen[name]}"
+            metric = f"{name};dur={entry['duration_ms']}"
+            if entry.get("description"):
+                description = entry["description"].replace("\\", "\\\\").replace('"', '\\"')
+                metric += f';desc="{description}"'
+            metrics.append(metric)
+        return ", ".join(metrics)
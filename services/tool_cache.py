@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import functools
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple, Callable, Set
+from services.events import emit
+from services.metrics import REGISTRY
+from services.tool_catalog import is_write_tool
+
+TOOL_CACHE_LOOKUPS = REGISTRY.counter(
+    "atlas_tool_cache_lookups_total", "Read tool calls looked up in the per-session cache", ("result",)
+)
+
+# Tools whose results list many items, so any write may change them
+_LISTING_WORDS = ("search", "list", "jql", "cql", "query", "visible", "spaces")
+
+# MCP tools report most failures as result text rather than by raising
+_ERROR_PREFIXES = ("error", "failed", "exception", "tool execution failed")
+_ERROR_MARKERS = ('"errormessages"', '"iserror": true', '"iserror":true')
+
+def is_error_result(result: Any) -> bool:
+    """Whether a tool result reports a failure rather than data"""
+    if getattr(result, "isError", False):
+        return True
+    if not isinstance(result, str):
+        return False
+    head = result.lstrip()[:200].lower()
+    return head.startswith(_ERROR_PREFIXES) or any(marker in head for marker in _ERROR_MARKERS)
+
+def _scalars(value: Any, found: Set[str]):
+    """Collect the string forms of every scalar in an argument structure"""
+    if isinstance(value, dict):
+        for item in value.values():
+            _scalars(item, found)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _scalars(item, found)
+    elif value is not None and value != "":
+        found.add(str(value))
+
+class CachedCall:
+    __slots__ = ("result", "expires_at", "values", "listing")
+    
+    def __init__(self, result: Any, expires_at: float, values: Set[str], listing: bool):
+        self.result = result
+        self.expires_at = expires_at
+        self.values = values
+        self.listing = listing
+
+class ToolCallCache:
+    """Read-through cache of one MCP session's read tool results.
+    
+    A write tool call evicts listings (searches) and every entry that
+    shares an argument value with it, such as the issue key it edited.
+    """
+    
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = float(os.getenv("TOOL_CACHE_TTL", "120")) if ttl is None else ttl
+        self.max_entries = max_entries or int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "256"))
+        self.entries: "OrderedDict[Tuple[str, str], CachedCall]" = OrderedDict()
+        # Crew threads of concurrent runs may share the session
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(name: str, args: tuple, kwargs: Dict[str, Any]) -> Tuple[str, str]:
+        return (name, json.dumps([args, kwargs], sort_keys=True, default=str))
+    
+    def get(self, key: Tuple[str, str]) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            if time.monotonic() >= entry.expires_at:
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, entry.result
+    
+    def put(self, key: Tuple[str, str], result: Any, args: tuple, kwargs: Dict[str, Any]):
+        values: Set[str] = set()
+        _scalars([args, kwargs], values)
+        listing = any(word in key[0].lower() for word in _LISTING_WORDS)
+        with self._lock:
+            self.entries[key] = CachedCall(result, time.monotonic() + self.ttl, values, listing)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def evict_related(self, args: tuple, kwargs: Dict[str, Any]) -> int:
+        """Drop entries a write with these arguments may have changed"""
+        written: Set[str] = set()
+        _scalars([args, kwargs], written)
+        with self._lock:
+            stale = [
+                key for key, entry in self.entries.items()
+                if entry.listing or not entry.values.isdisjoint(written)
+            ]
+            for key in stale:
+                del self.entries[key]
+        return len(stale)
+    
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+    
+    def wrap(self, name: str, original: Callable) -> Callable:
+        if is_write_tool(name):
+            @functools.wraps(original)
+            def _run(*args, **kwargs):
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    # Evict even if the call failed; it may have half-applied
+                    self.evict_related(args, kwargs)
+            return _run
+        
+        @functools.wraps(original)
+        def _run(*args, **kwargs):
+            key = self._key(name, args, kwargs)
+            hit, result = self.get(key)
+            if hit:
+                TOOL_CACHE_LOOKUPS.inc(result="hit")
+                emit("tool_cached", {"tool": name})
+                return result
+            TOOL_CACHE_LOOKUPS.inc(result="miss")
+            result = original(*args, **kwargs)
+            if not is_error_result(result):
+                # A transient failure must not be replayed for the TTL
+                self.put(key, result, args, kwargs)
+            return result
+        return _run
+
+def cache_tools(tools: List[Any], cache: ToolCallCache) -> List[Any]:
+    """Route the tools' calls through the session's cache"""
+    if cache.ttl <= 0:
+        return tools
+    for tool in tools:
+        # Same pydantic bypass as instrument_tools
+        object.__setattr__(tool, "_run", cache.wrap(tool.name, tool._run))
+    return tools
@@ -0,0 +1,141 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable, Iterable
+
+# Verbs in a tool name that mark it as changing Jira/Confluence data
+# (createJiraIssue, editJiraIssue, addCommentToJiraIssue, updateConfluencePage, ...)
+WRITE_VERBS = frozenset({
+    "create", "edit", "update", "delete", "add", "transition", "move", "assign",
+    "remove", "set", "upload", "archive", "link", "post", "put", "publish",
+})
+
+def catalog_version(names: Iterable[str]) -> str:
+    """ETag identifying a set of tool names"""
+    digest = hashlib.sha1("\n".join(sorted(names)).encode("utf-8")).hexdigest()
+    return f'"{digest[:20]}"'
+
+# Leading verbs of tools that only read, even if a write verb follows (getLinkTypes)
+READ_VERBS = frozenset({"get", "search", "lookup", "fetch", "list", "read"})
+
+def is_write_tool(name: str) -> bool:
+    """Whether a tool changes data, judged by the verbs in its camelCase or snake_case name"""
+    words = [word.lower() for word in re.findall(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])", name)]
+    if not words or words[0] in READ_VERBS:
+        return False
+    return not WRITE_VERBS.isdisjoint(words)
+
+# Words that may come before an imperative ("please create ...", "can you add ...")
+REQUEST_PREFIX = re.compile(r"^(?:(?:please|kindly|can|could|would|will|you|i|we|want|need|to|help|me|go|ahead|and)\s+)*")
+
+# A write verb followed by what it acts on ("... and add a comment", "move PROJ-12 ...")
+WRITE_OBJECT = re.compile(
+    r"\b(?:" + "|".join(sorted(WRITE_VERBS)) + r")\s+(?:a|an|the|new|this|that|my|[a-z][a-z0-9]*-\d+)\b"
+)
+
+def asks_to_write(query: str) -> bool:
+    """Whether a query is phrased as a write request ("create a bug for ...", "please move PROJ-1 to Done").
+    Write verbs used as nouns or past states ("latest update on", "status was set to") don't count."""
+    text = query.lower().strip()
+    words = re.findall(r"[a-z]+", REQUEST_PREFIX.sub("", text))
+    if words and words[0] in WRITE_VERBS:
+        return True
+    return WRITE_OBJECT.search(text) is not None
+
+class CatalogEntry:
+    """Tool names for one cloud/scope combination"""
+    
+    def __init__(self, tools: List[Dict[str, str]]):
+        self.tools = tools
+        self.fetched_at = time.monotonic()
+        self.etag = catalog_version(t["name"] for t in tools)
+    
+    @property
+    def names(self) -> List[str]:
+        return [t["name"] for t in self.tools]
+
+def catalog_key(cloud_id: Optional[str], scopes: Any) -> Tuple[str, str]:
+    """Cache key: tools depend on the site and the scopes the token carries"""
+    if isinstance(scopes, str):
+        scopes = scopes.split()
+    return (cloud_id or "", " ".join(sorted(set(scopes or []))))
+
+class ToolCatalog:
+    """TTL cache of MCP tool catalogs keyed by cloud id and scope set"""
+    
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl or float(os.getenv("TOOL_CATALOG_TTL", "900"))
+        self.entries: Dict[Tuple[str, str], CatalogEntry] = {}
+        self._loading: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def _fresh(self, entry: Optional[CatalogEntry]) -> bool:
+        return entry is not None and time.monotonic() - entry.fetched_at < self.ttl
+    
+    def peek(self, key: Tuple[str, str]) -> Optional[CatalogEntry]:
+        """Return the cached catalog if it is still fresh"""
+        entry = self.entries.get(key)
+        return entry if self._fresh(entry) else None
+    
+    def version(self, key: Tuple[str, str]) -> str:
+        """ETag of the cached catalog, or empty if none is cached"""
+        entry = self.entries.get(key)
+        return entry.etag if entry else ""
+    
+    async def get(
+        self,
+        key: Tuple[str, str],
+        loader: Callable[[], Awaitable[Iterable[Any]]],
+        refresh: bool = False
+    ) -> CatalogEntry:
+        """Return the catalog for key, loading it once if stale or missing"""
+        if not refresh:
+            entry = self.peek(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+        
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            tools = await loader()
+            entry = CatalogEntry(sorted(
+                ({"name": tool.name, "description": getattr(tool, "description", "") or ""} for tool in tools),
+                key=lambda t: t["name"]
+            ))
+            # Don't cache a failed load; an empty list usually means mcp-remote failed
+            if entry.tools:
+                self.entries[key] = entry
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so asyncio doesn't warn when nobody else waited
+            future.exception()
+            raise
+        finally:
+            del self._loading[key]
+    
+    def invalidate(self, key: Optional[Tuple[str, str]] = None):
+        """Drop one catalog, or all of them"""
+        if key is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(key, None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return {
+            "entries": len(self.entries),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
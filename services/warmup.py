@@ -0,0 +1,105 @@
+import os
+import time
+import asyncio
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+
+class WarmUpStep:
+    """One named warm-up task and how it went"""
+    
+    def __init__(self, name: str, run: Callable[[], Awaitable[Any]], required: bool = True):
+        self.name = name
+        self.run = run
+        # Readiness waits for required steps only; an optional step that fails
+        # just leaves its cost to the first request that needs it
+        self.required = required
+        self.status = "pending"
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"status": self.status, "required": self.required}
+        if self.duration_ms is not None:
+            data["duration_ms"] = self.duration_ms
+        if self.error:
+            data["error"] = self.error
+        return data
+
+class WarmUp:
+    """Runs start-up work in the background so the first request doesn't pay for it"""
+    
+    def __init__(self, steps: List[WarmUpStep], enabled: Optional[bool] = None):
+        self.steps = steps
+        self.enabled = enabled if enabled is not None else os.getenv("WARMUP", "on").lower() != "off"
+        self._task: Optional[asyncio.Task] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+    
+    async def _run_step(self, step: WarmUpStep):
+        step.status = "running"
+        started = time.perf_counter()
+        try:
+            await step.run()
+            step.status = "done"
+        except asyncio.CancelledError:
+            step.status = "cancelled"
+            raise
+        except Exception as e:
+            step.status = "failed"
+            step.error = str(e) or type(e).__name__
+            print(f"Warm-up step {step.name} failed: {e}")
+        finally:
+            step.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    
+    async def _run(self):
+        # Steps run in order: later ones build on what earlier ones loaded
+        for step in self.steps:
+            await self._run_step(step)
+        self.finished_at = time.time()
+    
+    def start(self):
+        """Start warming up in the background"""
+        if not self.enabled:
+            for step in self.steps:
+                step.status = "skipped"
+            return
+        if self._task is None:
+            self.started_at = time.time()
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+    
+    @property
+    def ready(self) -> bool:
+        """Whether every required step has finished (or warm-up is disabled)"""
+        if not self.enabled:
+            return True
+        return all(step.status == "done" for step in self.steps if step.required)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "enabled": self.enabled,
+            "elapsed_seconds": round((self.finished_at or time.time()) - self.started_at, 2) if self.started_at else None,
+            "steps": {step.name: step.to_dict() for step in self.steps},
+        }
+
+async def run_command(args: List[str], timeout: float):
+    """Run a command to completion, failing on a non-zero exit or timeout"""
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except BaseException:
+        # Timed out or cancelled at shutdown
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(args[:4])} exited with {process.returncode}: {stderr.decode(errors='replace')[-300:]}")
@@ -32,4 +32,5 @@ echo - Team:  http://%LOCAL_IP%:8080
 echo ================================
 echo.
 
-python main.py
+REM Production mode: multiple workers, no auto-reload (see DEPLOY.md)
+python main.py --production
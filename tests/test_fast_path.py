@@ -0,0 +1,53 @@
+import pytest
+
+from services.fast_path import FastPathRouter
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.delenv("FAST_PATH_MODE", raising=False)
+    return FastPathRouter(api=object())
+
+def route(router, query):
+    found = router.route(query)
+    return found and (found.kind, found.value)
+
+@pytest.mark.parametrize("query, keys", [
+    ("PROJ-12", ["PROJ-12"]),
+    ("show PROJ-12", ["PROJ-12"]),
+    ("What is PROJ-12?", ["PROJ-12"]),
+    ("details for tickets PROJ-1 and PROJ-2, PROJ-1", ["PROJ-1", "PROJ-2"]),
+])
+def test_issue_lookups(router, query, keys):
+    assert route(router, query) == ("issue", keys)
+
+def test_explicit_jql_and_cql(router):
+    assert route(router, "jql: project = X") == ("jql", "project = X")
+    assert route(router, "CQL> type = page") == ("cql", "type = page")
+
+def test_sprint_and_page_names(router):
+    assert route(router, 'issues in sprint "Sprint 4"') == ("jql", 'sprint = "Sprint 4" ORDER BY rank')
+    assert route(router, "show me the issues in sprint 12") == ("jql", "sprint = 12 ORDER BY rank")
+    assert route(router, "page titled Onboarding") == ("cql", 'type = page AND title = "Onboarding"')
+
+@pytest.mark.parametrize("query", [
+    'status = "In Progress"',
+    "project = PROJ AND status = Done ORDER BY created DESC",
+    "assignee is EMPTY",
+])
+def test_bare_jql(router, query):
+    assert route(router, query) == ("jql", query)
+
+@pytest.mark.parametrize("query", [
+    "summarize PROJ-1",
+    "what is blocking PROJ-12?",
+    "find the page called Onboarding and summarize it",
+    "status is blocked on PROJ-12, why?",
+    "status in (open) means what?",
+    "how many bugs did we close last sprint?",
+])
+def test_anything_else_goes_to_the_agent(router, query):
+    assert router.route(query) is None
+
+def test_disabled(monkeypatch):
+    monkeypatch.setenv("FAST_PATH_MODE", "off")
+    assert FastPathRouter(api=object()).route("PROJ-12") is None
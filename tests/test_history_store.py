@@ -0,0 +1,50 @@
+import pytest
+
+from services.history_store import MemoryHistoryStore, SQLiteHistoryStore
+from services.sweeper import ExpirySweeper
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryHistoryStore(max_entries=5, sweeper=ExpirySweeper())
+    return SQLiteHistoryStore(str(tmp_path / "history.db"), max_entries=5)
+
+def queries(records):
+    return [record.query for record in records]
+
+def test_pages_walk_back_with_cursors(store):
+    for i in range(1, 5):
+        store.append("u", f"q{i}", f"answer {i}", success=True)
+    records, cursor = store.page("u", 2)
+    assert queries(records) == ["q3", "q4"]
+    records, cursor = store.page("u", 2, before=cursor)
+    assert queries(records) == ["q1", "q2"]
+    assert cursor is None
+
+def test_history_is_capped_per_user(store):
+    for i in range(1, 8):
+        store.append("u", f"q{i}", "answer", success=True)
+    store.append("other", "mine", "answer", success=True)
+    records, cursor = store.page("u", 10)
+    assert queries(records) == ["q3", "q4", "q5", "q6", "q7"]
+    assert cursor is None
+    assert store.count_users() == 2
+    assert store.count_records() == 6
+
+def test_cursors_stay_valid_after_clear(store):
+    first = store.append("u", "old", "answer", success=True)
+    assert store.clear("u")
+    newer = store.append("u", "new", "answer", success=True)
+    assert newer.seq > first.seq
+    records, _ = store.page("u", 10, before=newer.seq)
+    assert records == []
+    assert not store.clear("nobody")
+
+def test_large_bodies_round_trip_compressed(store):
+    text = "word " * 1000
+    store.append("u", "big", text, success=False, wrote=True)
+    (record,), _ = store.page("u", 1)
+    assert record.compressed
+    assert record.text() == text
+    assert record.wrote
+    assert record.to_dict()["error"] == text
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.jira_mirror import JiraMirror, JQLError, compile_jql
+
+def _issue(key, status="To Do", assignee=None, priority="Medium", labels=(), sprint=None, updated_days_ago=1):
+    updated = datetime.now(timezone.utc) - timedelta(days=updated_days_ago)
+    fields = {
+        "summary": f"Summary of {key}",
+        "project": {"key": key.split("-")[0], "name": "Project"},
+        "status": {"name": status, "statusCategory": {"name": "Done" if status == "Done" else "To Do"}},
+        "assignee": {"displayName": assignee, "accountId": assignee.lower()} if assignee else None,
+        "priority": {"name": priority},
+        "issuetype": {"name": "Bug"},
+        "labels": list(labels),
+        "created": "2024-01-01T09:00:00.000+0000",
+        "updated": updated.strftime("%Y-%m-%dT%H:%M:%S.000+0000"),
+    }
+    if sprint:
+        fields["customfield_10020"] = [{"id": 7, "name": sprint, "state": "active"}]
+    return JiraMirror.row_from_issue({"key": key, "fields": fields})
+
+@pytest.fixture
+def mirror(tmp_path):
+    mirror = JiraMirror(str(tmp_path / "mirror.db"))
+    mirror.upsert([
+        _issue("PROJ-1", status="Done", assignee="Ada", priority="High", labels=["backend"], updated_days_ago=30),
+        _issue("PROJ-2", status="In Progress", assignee="Ada", labels=["backend", "urgent"], sprint="Sprint 4"),
+        _issue("PROJ-10", status="To Do", priority="Highest", sprint="Sprint 4"),
+        _issue("OPS-1", status="In Progress", assignee="Grace"),
+    ])
+    return mirror
+
+def keys(result):
+    return [issue["key"] for issue in result["issues"]]
+
+def test_compile_binds_values_as_parameters():
+    where, order, params = compile_jql('project = PROJ AND status = "In Progress"')
+    assert "PROJ" not in where and "In Progress" not in where
+    assert params == ["PROJ", "PROJ", "In Progress"]
+    assert order == ""
+
+@pytest.mark.parametrize("jql", [
+    "status was Done",
+    "project = ",
+    "assignee = currentUser()",
+    "status = Done ORDER BY",
+])
+def test_compile_rejects_unsupported_jql(jql):
+    with pytest.raises(JQLError):
+        compile_jql(jql)
+
+def test_search_filters_with_and_or(mirror):
+    assert sorted(keys(mirror.search("project = PROJ AND status != Done"))) == ["PROJ-10", "PROJ-2"]
+    assert sorted(keys(mirror.search("assignee = Grace OR priority = Highest"))) == ["OPS-1", "PROJ-10"]
+
+def test_search_is_case_insensitive(mirror):
+    assert keys(mirror.search('status = "in progress" AND project = proj')) == ["PROJ-2"]
+
+def test_search_labels_sprints_and_empty(mirror):
+    assert sorted(keys(mirror.search("labels in (urgent, missing)"))) == ["PROJ-2"]
+    assert sorted(keys(mirror.search('sprint = "Sprint 4"'))) == ["PROJ-10", "PROJ-2"]
+    assert sorted(keys(mirror.search("assignee is EMPTY"))) == ["PROJ-10"]
+
+def test_search_relative_dates(mirror):
+    assert "PROJ-1" not in keys(mirror.search("updated >= -7d"))
+    assert keys(mirror.search("project = PROJ AND updated < -7d")) == ["PROJ-1"]
+
+def test_search_orders_by_key_number_and_priority(mirror):
+    assert keys(mirror.search("project = PROJ ORDER BY key ASC")) == ["PROJ-1", "PROJ-2", "PROJ-10"]
+    assert keys(mirror.search("project = PROJ ORDER BY priority DESC"))[0] == "PROJ-10"
+
+def test_search_returns_total_past_the_limit(mirror):
+    result = mirror.search("project = PROJ", limit=1)
+    assert result["total"] == 3
+    assert len(result["issues"]) == 1
+
+def test_count_groups_by_field(mirror):
+    result = mirror.count("status != Done", group_by="assignee")
+    assert result["total"] == 3
+    assert result["groups"] == {"Ada": 1, "Grace": 1, "(none)": 1}
+    with pytest.raises(JQLError):
+        mirror.count("status = Done", group_by="color")
+
+def test_remove_missing_drops_unseen_issues(mirror):
+    assert mirror.remove_missing("PROJ", {"PROJ-1", "PROJ-2"}) == 1
+    assert keys(mirror.search("project = PROJ ORDER BY key")) == ["PROJ-1", "PROJ-2"]
+    assert mirror.count("project = OPS")["total"] == 1
@@ -0,0 +1,54 @@
+import time
+
+from services.result_cache import ResultCache
+
+RESPONSE = {"success": True, "result": "3 open bugs", "query": "open bugs?"}
+
+def test_normalized_queries_hit():
+    cache = ResultCache(ttl=60, max_entries=10)
+    cache.put("u", "Open bugs?", RESPONSE, "v1")
+    hit = cache.get("u", "  open   BUGS ", "v1")
+    assert hit["result"] == "3 open bugs"
+    assert hit["cached"] is True
+    assert hit["query"] == "  open   BUGS "
+    assert cache.get("other", "open bugs", "v1") is None
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache = ResultCache(ttl=60, max_entries=10)
+    cache.put("u", "open bugs", RESPONSE, None)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert cache.get("u", "open bugs") is None
+    assert not cache.entries
+
+def test_catalog_version_change_misses():
+    cache = ResultCache(ttl=60, max_entries=10)
+    cache.put("u", "open bugs", RESPONSE, "v1")
+    assert cache.get("u", "open bugs", "v2") is None
+    cache.put("u", "open bugs", RESPONSE, "v1")
+    # No live session: the catalog is not known to have changed
+    assert cache.get("u", "open bugs", None) is not None
+
+def test_invalidate_user_drops_only_their_answers():
+    cache = ResultCache(ttl=60, max_entries=10)
+    cache.put("u", "open bugs", RESPONSE, None)
+    cache.put("u", "my tasks", RESPONSE, None)
+    cache.put("other", "open bugs", RESPONSE, None)
+    assert cache.invalidate_user("u") == 2
+    assert cache.get("u", "open bugs") is None
+    assert cache.get("other", "open bugs") is not None
+
+def test_least_recently_used_is_evicted():
+    cache = ResultCache(ttl=60, max_entries=2)
+    cache.put("u", "a", RESPONSE, None)
+    cache.put("u", "b", RESPONSE, None)
+    cache.get("u", "a")
+    cache.put("u", "c", RESPONSE, None)
+    assert cache.get("u", "b") is None
+    assert cache.get("u", "a") is not None
+
+def test_zero_ttl_disables_the_cache():
+    cache = ResultCache(ttl=0)
+    cache.put("u", "a", RESPONSE, None)
+    assert not cache.enabled
+    assert cache.get("u", "a") is None
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from services.scheduler import CrewScheduler, SchedulerOverloaded
+
+async def _hold(scheduler, user_id, log, release, limit=None):
+    async with scheduler.slot(user_id, limit=limit):
+        log.append(user_id)
+        await release.wait()
+
+def test_per_user_limit_and_round_robin():
+    async def main():
+        scheduler = CrewScheduler(max_concurrency=2, per_user_limit=1, max_queue_depth=10)
+        log, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(scheduler, user, log, release)) for user in ("a", "a", "a", "b")]
+        await asyncio.sleep(0)
+        # b gets the second slot ahead of a's queued runs
+        assert log == ["a", "b"]
+        assert scheduler.get_stats()["queue_depth"] == 2
+        release.set()
+        await asyncio.gather(*tasks)
+        assert log == ["a", "b", "a", "a"]
+        assert scheduler.get_stats()["active"] == 0
+
+    asyncio.run(main())
+
+def test_batch_limit_is_capped_by_max_concurrency():
+    async def main():
+        scheduler = CrewScheduler(max_concurrency=3, per_user_limit=1, max_queue_depth=10)
+        log, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(scheduler, "a", log, release, limit=8)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert len(log) == 3
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+def test_full_queue_is_rejected():
+    async def main():
+        scheduler = CrewScheduler(max_concurrency=1, per_user_limit=1, max_queue_depth=1)
+        log, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(scheduler, user, log, release)) for user in ("a", "b")]
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerOverloaded) as error:
+            await _hold(scheduler, "c", log, release)
+        assert error.value.retry_after >= 1
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = CrewScheduler(max_concurrency=1, per_user_limit=1, max_queue_depth=10)
+        log, release = [], asyncio.Event()
+        running = asyncio.create_task(_hold(scheduler, "a", log, release))
+        queued = asyncio.create_task(_hold(scheduler, "b", log, release))
+        await asyncio.sleep(0)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert scheduler.get_stats()["queue_depth"] == 0
+        release.set()
+        await running
+        assert log == ["a"]
+        assert scheduler.get_stats()["active"] == 0
+
+    asyncio.run(main())
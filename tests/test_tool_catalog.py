@@ -0,0 +1,44 @@
+import pytest
+
+from services.tool_catalog import asks_to_write, is_write_tool
+
+@pytest.mark.parametrize("name", [
+    "createJiraIssue",
+    "editJiraIssue",
+    "transitionJiraIssue",
+    "addCommentToJiraIssue",
+    "update_confluence_page",
+])
+def test_write_tools(name):
+    assert is_write_tool(name)
+
+@pytest.mark.parametrize("name", [
+    "getJiraIssue",
+    "searchJiraIssuesUsingJql",
+    "getJiraIssueRemoteIssueLinks",
+    "lookupJiraAccountId",
+    "getLinkTypes",
+    "atlassianUserInfo",
+])
+def test_read_tools(name):
+    assert not is_write_tool(name)
+
+@pytest.mark.parametrize("query", [
+    "create a bug for the login timeout",
+    "Please assign PROJ-3 to me",
+    "can you add a comment to PROJ-1",
+    "move PROJ-12 to Done",
+    "find the outage page and add a new label",
+])
+def test_write_requests(query):
+    assert asks_to_write(query)
+
+@pytest.mark.parametrize("query", [
+    "what was the latest update on PROJ-1?",
+    "issues where status was set to Done",
+    "show me posts about onboarding",
+    "pages linked from the runbook",
+    "who was assigned to PROJ-2",
+])
+def test_questions_that_mention_write_verbs(query):
+    assert not asks_to_write(query)